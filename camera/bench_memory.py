@@ -0,0 +1,144 @@
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# Memory benchmark for the capture path: per-burst allocations, page faults and
+# steady-state RSS with a fresh array per frame (the old path) versus the
+# FramePool buffers. Fresh full-resolution arrays are mmapped and zero-filled
+# by the kernel on every frame; pooled buffers are faulted in once.
+#   python bench_memory.py --cameras 2 --bursts 20
+# Frames come from an in-memory source shaped like the Pi camera's still frames
+# and detections are drawn at random, so no camera or model is needed.
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import frame_pool
+
+class SyntheticSource:
+    """Produces full-resolution frames like Picamera2.capture_array()"""
+    def __init__(self, camera_id, shape):
+        self.camera_id = camera_id
+        self.template = np.random.randint(0, 255, shape, dtype=np.uint8)
+
+    def read(self, out=None):
+        if out is None:
+            return self.template.copy()  # capture_array() hands back a new array every time
+        np.copyto(out, self.template)
+        return out
+
+def rss_bytes(field="VmRSS"):
+    """Resident set size (or its high-water mark, VmHWM) of this process from /proc (Linux only)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def fake_detection():
+    """A detection with some probability, as (score, detection) or (None, None)"""
+    if random.random() < 0.3:
+        score = random.uniform(0.5, 1.0)
+        return score, [10, 10, 200, 200, score, random.randrange(15)]
+    return None, None
+
+def burst_unpooled(sources, num_frames):
+    """The original path: new array per read, best frame kept by reference and drawn on in place"""
+    best = {}
+    for _ in range(num_frames):
+        for source in sources:
+            frame = source.read()
+            score, detection = fake_detection()
+            if score is not None and score > best.get(source.camera_id, (None, 0, None))[1]:
+                best[source.camera_id] = (frame, score, detection)
+    for frame, score, detection in best.values():
+        frame[10:12, 10:200] = 255  # Annotation mutates the captured frame
+    return len(best)
+
+def burst_pooled(sources, pools, num_frames):
+    """The pooled path used by camera.py"""
+    best = frame_pool.BestFrames(pools)
+    for _ in range(num_frames):
+        for source in sources:
+            pool = pools[source.camera_id]
+            buffer = pool.acquire()
+            frame = source.read(out=buffer)
+            if frame is not buffer:
+                pool.release(buffer)
+                pool.adopt(frame)
+            score, detection = fake_detection()
+            best.offer(source.camera_id, frame, score, detection)
+    saved = best.take()
+    for camera_id, (frame, score, detection) in saved.items():
+        annotated = frame.copy()  # Annotation only touches a copy of the selected frame
+        pools[camera_id].release(frame)
+        annotated[10:12, 10:200] = 255
+    return len(saved)  # One allocation per copy
+
+def run(mode, args, shape):
+    random.seed(1)
+    sources = [SyntheticSource(f"cam{i}", shape) for i in range(args.cameras)]
+    pools = {source.camera_id: frame_pool.FramePool(source.camera_id) for source in sources}
+    allocations_before = sum(pool.allocations for pool in pools.values())
+
+    tracemalloc.start()
+    peaks, rss, faults = [], [], []
+    copies = 0
+    started = time.perf_counter()
+    for _ in range(args.bursts):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        faults_before = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+        if mode == "pooled":
+            copies += burst_pooled(sources, pools, args.frames)
+        else:
+            burst_unpooled(sources, args.frames)
+        faults.append(resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults_before)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        rss.append(rss_bytes())
+    elapsed = time.perf_counter() - started
+    peak_rss = rss_bytes("VmHWM")
+    tracemalloc.stop()
+
+    # Steady state: second half of the run, after the pool has filled
+    half = len(rss) // 2
+    frames = args.bursts * args.frames * args.cameras
+    if mode == "pooled":
+        allocations = sum(pool.allocations for pool in pools.values()) - allocations_before + copies
+    else:
+        allocations = frames  # One new array per read
+    print(f"{mode:<9}{frames / elapsed:>8.1f}{allocations / args.bursts:>9.1f}"
+          f"{sum(faults[half:]) / len(faults[half:]):>10.0f}{sum(peaks[half:]) / len(peaks[half:]) / 2 ** 20:>11.1f}"
+          f"{sum(rss[half:]) / len(rss[half:]) / 2 ** 20:>10.1f}{peak_rss / 2 ** 20:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare frame memory use with and without the buffer pool")
+    parser.add_argument("--cameras", type=int, default=1)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=5, help="Frames per camera per burst")
+    parser.add_argument("--width", type=int, default=2304)
+    parser.add_argument("--height", type=int, default=1296)
+    parser.add_argument("--mode", choices=["unpooled", "pooled", "both"], default="both")
+    args = parser.parse_args()
+
+    shape = (args.height, args.width, 3)
+    # Run each mode in its own process when comparing so RSS isn't shared between them
+    if args.mode == "both":
+        print(f"{args.cameras} camera(s), {args.frames} frames per burst, {args.bursts} bursts, "
+              f"{args.width}x{args.height} ({np.prod(shape) / 2 ** 20:.1f} MiB per frame)")
+        print("Per burst in steady state: array allocations, minor page faults and peak traced MiB;")
+        print("then RSS between bursts (pooled buffers stay resident) and the process's peak RSS")
+        print(f"{'mode':<9}{'fps':>8}{'allocs':>9}{'faults':>10}{'peak MiB':>11}{'RSS MiB':>10}{'max RSS':>10}")
+        import subprocess
+        for mode in ("unpooled", "pooled"):
+            subprocess.run([sys.executable, __file__, "--mode", mode, "--cameras", str(args.cameras),
+                            "--bursts", str(args.bursts), "--frames", str(args.frames),
+                            "--width", str(args.width), "--height", str(args.height)], check=True)
+    else:
+        run(args.mode, args, shape)
@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+import numpy as np
+import inference_pool
+
+# Scaling benchmark for the inference pool: throughput and per-batch latency
+# with 0 workers (predict in this process, as camera.py does by default) and
+# with 1..N worker processes fed through shared memory.
+#   python bench_workers.py --model synthetic:200 --workers 0,1,2,4
+#   python bench_workers.py --model epoch150s200.pt --imgsz 640
+# "synthetic:<ms>" burns <ms> of CPU per frame instead of running YOLO, which
+# shows the pool's own overhead (frame copy, queues) on machines without the
+# model. Throughput can only scale up to the number of CPU cores.
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run(model_path, workers, frames, batches, predict_kwargs):
+    """(frames per second, batch latencies, warm-up seconds) for one worker count"""
+    started = time.perf_counter()
+    if workers:
+        pool = inference_pool.InferencePool(model_path, workers=workers)
+        pool.start()
+        detect = lambda batch: pool.predict(batch, **predict_kwargs)
+    else:
+        pool = None
+        model = inference_pool.load_model(model_path)
+        detect = lambda batch: [result.boxes.data.tolist()
+                                for result in model.predict(source=batch, verbose=False, **predict_kwargs)]
+    try:
+        detect(frames[:1])  # First call includes lazy setup (slots, model fusing)
+        warmup = time.perf_counter() - started
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(batches):
+            batch_started = time.perf_counter()
+            results = detect(frames)
+            latencies.append(time.perf_counter() - batch_started)
+            assert len(results) == len(frames)
+        elapsed = time.perf_counter() - started
+    finally:
+        if pool:
+            pool.close()
+    return batches * len(frames) / elapsed, latencies, warmup
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure inference throughput over worker process counts")
+    parser.add_argument("--model", default="synthetic:200", help='Model path, or "synthetic:<ms>"')
+    parser.add_argument("--workers", default="0,1,2,4", help="Comma-separated worker counts; 0 is in-process")
+    parser.add_argument("--batch", type=int, default=4, help="Frames per batch (cameras times rounds)")
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--width", type=int, default=2304)
+    parser.add_argument("--height", type=int, default=1296)
+    args = parser.parse_args()
+
+    frames = [np.random.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(args.batch)]
+    predict_kwargs = {"imgsz": args.imgsz}
+    print(f"{args.model}, {args.batch} frames of {args.width}x{args.height} per batch, {args.batches} batches, "
+          f"{os.cpu_count()} CPU(s)")
+    print(f"{'workers':<9}{'fps':>8}{'speedup':>9}{'p50 s':>9}{'p95 s':>9}{'warm-up s':>11}")
+    baseline = None
+    for workers in [int(count) for count in args.workers.split(",")]:
+        fps, latencies, warmup = run(args.model, workers, frames, args.batches, predict_kwargs)
+        baseline = baseline or fps
+        print(f"{workers:<9}{fps:>8.2f}{fps / baseline:>8.2f}x{percentile(latencies, 0.5):>9.2f}"
+              f"{percentile(latencies, 0.95):>9.2f}{warmup:>11.2f}")
@@ -3,114 +3,330 @@ import torch
 from ultralytics import YOLO
 import os
 import numpy as np
-from picamera2 import Picamera2
 import time
 import asyncio
+import sys
+import socket
 
-# Load the pre-trained YOLOv8 model
-model = YOLO('epoch150s200.pt')  # You can use a larger model for better accuracy if needed
+# Shared helpers (metrics) live next to the bot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import metrics
+import profiler
+import sources
+import uplink
+import evaluate
+import frame_pool
+import writer
+import liveview
+import clips
+import thermal
+import inference_pool
+import cascade
 
-# Define the class labels for your specific dataset
-class_labels = ['Bull', 'Nilgai', 'Pig', 'Peacock', 'Squirrel', 'Jackal', 'Cat', 'Dog', 'Goat', 'Mouse', 'Insect',
-                'Person', 'Elephant', 'Monkey', 'Bird']
+# Frame sources, e.g. "picam:0" or "picam:0=north,picam:1=south,gate=video:rtsp://..." (see sources.py)
+CAMERA_SOURCES = os.environ.get('WILDDETECT_CAMERAS', 'picam:0')
+MAX_BATCH = int(os.environ.get('WILDDETECT_MAX_BATCH', '4'))  # Cameras per shared inference batch
+BATCH_BUDGET = float(os.environ.get('WILDDETECT_BATCH_BUDGET', '2.0'))  # Seconds per batch before shrinking it
+
+# Nodes without a local bot send detections to the farm's bot instead (see src/ingest.py)
+INGEST_URL = os.environ.get('WILDDETECT_INGEST_URL', '')  # e.g. http://bot-pi.local:8088/detections
+INGEST_TOKEN = os.environ.get('WILDDETECT_INGEST_TOKEN', '')
+NODE_ID = os.environ.get('WILDDETECT_NODE_ID', socket.gethostname())
+
+# Photos are encoded and written off the capture loop
+JPEG_QUALITY = int(os.environ.get('WILDDETECT_JPEG_QUALITY', str(writer.JPEG_QUALITY)))
+WRITE_WORKERS = int(os.environ.get('WILDDETECT_WRITE_WORKERS', str(writer.WORKERS)))
+WRITE_QUEUE = int(os.environ.get('WILDDETECT_WRITE_QUEUE', str(writer.QUEUE_SIZE)))
+
+# Optional MJPEG live view on the LAN (0 disables), replacing the cv2.imshow preview
+LIVEVIEW_PORT = int(os.environ.get('WILDDETECT_LIVEVIEW_PORT', '0'))
+LIVEVIEW_FPS = float(os.environ.get('WILDDETECT_LIVEVIEW_FPS', str(liveview.MAX_FPS)))
+LIVEVIEW_CAMERA = os.environ.get('WILDDETECT_LIVEVIEW_CAMERA', '')  # Camera whose raw frames are shown (default: first)
+
+# Short clips around detections from frames buffered between bursts (1 enables)
+CLIPS_ENABLED = os.environ.get('WILDDETECT_CLIPS', '0') == '1'
+CLIP_PRE_ROLL = float(os.environ.get('WILDDETECT_CLIP_PRE_ROLL', str(clips.PRE_ROLL)))
+CLIP_POST_ROLL = float(os.environ.get('WILDDETECT_CLIP_POST_ROLL', str(clips.POST_ROLL)))
+CLIP_FPS = float(os.environ.get('WILDDETECT_CLIP_FPS', str(clips.CLIP_FPS)))
+CAPTURE_INTERVAL = 20  # Seconds between detection bursts (the adaptive controller may lengthen it)
+
+# Detector settings adapt to CPU temperature, load and latency (see thermal.py)
+TARGET_LATENCY = float(os.environ.get('WILDDETECT_TARGET_LATENCY', str(thermal.TARGET_LATENCY)))  # Seconds per batch
+MAX_INTERVAL = int(os.environ.get('WILDDETECT_MAX_INTERVAL', '60'))
+SIMULATE = os.environ.get('WILDDETECT_SIMULATE', '0') == '1'
+
+# Inference in N worker processes fed through shared memory (0 runs YOLO in this process)
+INFERENCE_WORKERS = int(os.environ.get('WILDDETECT_INFERENCE_WORKERS', '0'))
+MODEL_PATH = os.environ.get('WILDDETECT_MODEL', 'epoch150s200.pt')
+
+# Optional two-stage cascade: a small presence model gates the full one (see cascade.py)
+CASCADE_MODEL = os.environ.get('WILDDETECT_CASCADE_MODEL', '')  # e.g. yolov8n.pt; empty disables
+CASCADE_MODE = os.environ.get('WILDDETECT_CASCADE_MODE', 'crop')  # crop or frame
+CASCADE_CLASSES = os.environ.get('WILDDETECT_CASCADE_CLASSES', '')  # Presence model class ids that trigger
+CASCADE_AUDIT_EVERY = int(os.environ.get('WILDDETECT_CASCADE_AUDIT_EVERY', str(cascade.AUDIT_EVERY)))
+
+# Local metrics endpoint for this process (the bot serves its own on 9100)
+METRICS_PORT = int(os.environ.get('WILDDETECT_CAMERA_METRICS_PORT', '9101'))
+
+CAPTURE_SECONDS = metrics.histogram("wilddetect_capture_seconds", "Time to capture one frame by camera")
+CAPTURE_ERRORS = metrics.counter("wilddetect_capture_errors_total", "Failed frame captures by camera")
+INFERENCE_SECONDS = metrics.histogram("wilddetect_inference_seconds", "YOLO predict time per batch")
+BATCH_FRAMES = metrics.gauge("wilddetect_batch_frames", "Frames in the last inference batch")
+BURST_SECONDS = metrics.histogram("wilddetect_burst_seconds", "Capture and inference time for one burst")
+DETECTIONS_TOTAL = metrics.counter("wilddetect_detections_total", "Best detections saved by class")
+HANDOFF_SECONDS = metrics.histogram("wilddetect_handoff_seconds", "Best frame selected to photo written for the bot")
+
+# Load the pre-trained YOLOv8 model, or start workers that each load their own copy.
+# Workers are forked, so this comes before any thread is started.
+if INFERENCE_WORKERS:
+    detector_pool = inference_pool.InferencePool(MODEL_PATH, workers=INFERENCE_WORKERS)
+    detector_pool.start(wait=False)  # Models load while the cameras open
+    model = None
+else:
+    detector_pool = None
+    model = YOLO(MODEL_PATH)  # You can use a larger model for better accuracy if needed
+
+# Class labels of the trained model, in class id order
+class_labels = evaluate.load_class_names()
 
 # Create output folder to store images of detected objects (if not already present)
 output_dir = "../ngl"
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
-# Initialize the PiCamera2 instance
-picam2 = Picamera2()
-picam2.configure(picam2.create_still_configuration())
-picam2.start()
+# Adaptive input size, burst length and interval; a simulated sensor when not on a Pi
+thermal_sensor = thermal.SimulatedSensor() if SIMULATE else thermal.SystemSensor()
+controller = thermal.AdaptiveController(thermal_sensor, target_latency=TARGET_LATENCY,
+                                        interval_bounds=(CAPTURE_INTERVAL, max(CAPTURE_INTERVAL, MAX_INTERVAL)))
+
+# Background JPEG writer shared by all cameras
+photo_writer = writer.JpegWriter(workers=WRITE_WORKERS, queue_size=WRITE_QUEUE, quality=JPEG_QUALITY)
+
+# Open the camera sources and share the model between them
+frame_sources = sources.open_sources(CAMERA_SOURCES)
+sources_by_id = {source.camera_id: source for source in frame_sources}
+multi_camera = len(frame_sources) > 1
+scheduler = sources.FairScheduler(list(sources_by_id), max_batch=MAX_BATCH, batch_budget=BATCH_BUDGET)
+
+# Capture buffers are reused between frames and bursts instead of allocated per frame
+frame_pools = {camera_id: frame_pool.FramePool(camera_id) for camera_id in sources_by_id}
+
+# Live view shows one camera's frames while someone watches, and every detection
+live_view = liveview.LiveView(max_fps=LIVEVIEW_FPS) if LIVEVIEW_PORT else None
+live_camera = LIVEVIEW_CAMERA or frame_sources[0].camera_id
+
+# Ring buffer of recent frames per camera for detection clips
+clip_recorder = clips.ClipRecorder(pre_roll=CLIP_PRE_ROLL, post_roll=CLIP_POST_ROLL, fps=CLIP_FPS) if CLIPS_ENABLED else None
 
-# Function to read frames from PiCamera2
-def read_frame_from_picamera():
+# Function to read a frame from one camera source into a pooled buffer
+def read_frame(source):
+    pool = frame_pools[source.camera_id]
+    buffer = None
     try:
-        # Capture a frame from the PiCamera2
-        frame = picam2.capture_array()
+        with CAPTURE_SECONDS.time(camera=source.camera_id):
+            buffer = pool.acquire()
+            frame = source.read(out=buffer)
+        if frame is not buffer:
+            # First frame (or a new resolution): the source allocated it, keep it for the pool
+            pool.release(buffer)
+            if frame is not None:
+                pool.adopt(frame)
+        if live_view and frame is not None and source.camera_id == live_camera and live_view.wants_frames():
+            live_view.publish(frame)
+        if clip_recorder and frame is not None:
+            clip_recorder.add(source.camera_id, frame)
         return frame
     except Exception as e:
-        print(f"Error reading frame: {e}")
+        pool.release(buffer)
+        CAPTURE_ERRORS.inc(camera=source.camera_id)
+        print(f"Error reading frame from {source.camera_id}: {e}")
         return None
 
-# Confidence threshold for detection
+# Confidence threshold for detection; per-class values from evaluate.py override it
 confidence_threshold = 0.50
+THRESHOLDS_PATH = os.environ.get('WILDDETECT_THRESHOLDS', evaluate.THRESHOLDS_PATH)
+class_thresholds = evaluate.load_thresholds(THRESHOLDS_PATH, confidence_threshold)
+if class_thresholds:
+    print(f"Loaded per-class thresholds from {THRESHOLDS_PATH}")
+# YOLO drops boxes below its own conf (0.25 by default), so ask for the lowest one we use
+predict_conf = min([confidence_threshold] + list(class_thresholds.values()))
 
-# Function to perform object detection and select the best frame
+# Function to run the full model on a batch of frames; returns the detections of each frame in order
+def full_detect(frames, **predict_kwargs):
+    global detector_pool, model
+    if detector_pool:
+        try:
+            return detector_pool.predict(frames, **predict_kwargs)
+        except inference_pool.InferencePoolError as e:
+            # Keep detecting with one in-process model rather than stopping the camera
+            print(f"Inference pool failed ({e}); running the model in this process from now on")
+            detector_pool.close()
+            detector_pool = None
+            model = YOLO(MODEL_PATH)
+    results = model.predict(source=frames, **predict_kwargs)
+    return [result.boxes.data.tolist() for result in results]
+
+# The cascade's small model runs in this process on every frame, the full one only where it fires
+cascade_detector = None
+if CASCADE_MODEL:
+    cascade_detector = cascade.Cascade(YOLO(CASCADE_MODEL), full_detect, mode=CASCADE_MODE,
+                                       presence_classes=cascade.parse_classes(CASCADE_CLASSES),
+                                       audit_every=CASCADE_AUDIT_EVERY)
+    print(f"Cascade enabled: {CASCADE_MODEL} gates {MODEL_PATH} ({CASCADE_MODE} mode)")
+
+# Function to run YOLO on a batch of frames, through the cascade when it is enabled
+def detect(frames):
+    if cascade_detector:
+        return cascade_detector.detect(frames, conf=predict_conf, imgsz=controller.imgsz)
+    return full_detect(frames, conf=predict_conf, imgsz=controller.imgsz)
+
+# Function to perform object detection and select the best frame per camera
 def process_frames_for_best_detection(num_frames=5):
-    best_frame = None
-    best_score = 0
-    best_frame_idx = -1
-    best_detection = None
+    best = frame_pool.BestFrames(frame_pools)  # camera_id -> (best_frame, best_score, best_detection)
 
-    # Capture multiple frames and evaluate them
+    # Capture multiple rounds; each round batches one frame per scheduled camera
     for i in range(num_frames):
-        frame = read_frame_from_picamera()
+        frames = []
+        camera_ids = []
+        for camera_id in scheduler.next_batch():
+            frame = read_frame(sources_by_id[camera_id])
+
+            if frame is None:
+                print(f"Error: Failed to capture image or empty frame from {camera_id}.")
+                continue
+            frames.append(frame)
+            camera_ids.append(camera_id)
 
-        if frame is None:
-            print("Error: Failed to capture image or empty frame.")
+        if not frames:
             continue
 
-        # Perform the object detection with YOLO
-        results = model.predict(source=frame)
+        # Perform the object detection with YOLO on the whole batch
+        BATCH_FRAMES.set(len(frames))
+        with INFERENCE_SECONDS.time() as timer:
+            detections = detect(frames)
+        scheduler.report(timer.elapsed)
+        controller.observe(timer.elapsed)
 
-        # Evaluate the best frame based on confidence
-        for result in results:
-            for detection in result.boxes.data.tolist():
+        # Evaluate the best frame per camera based on confidence; other frames go back to the pool
+        for camera_id, frame, frame_detections in zip(camera_ids, frames, detections):
+            frame_score, frame_detection = None, None
+            for detection in frame_detections:
                 x1, y1, x2, y2, score, class_id = detection[:6]
 
-                if score > confidence_threshold:
-                    if score > best_score:
-                        best_score = score
-                        best_frame = frame
-                        best_detection = detection
-                        best_frame_idx = i
+                if score > class_thresholds.get(class_labels[int(class_id)], confidence_threshold):
+                    if frame_score is None or score > frame_score:
+                        frame_score, frame_detection = score, detection
+            best.offer(camera_id, frame, frame_score, frame_detection)
+
+    return best.take()
+
+# Function to annotate and save one detection for the bot
+def save_detection(camera_id, best_frame, best_detection):
+    selected_at = time.perf_counter()
+
+    # Draw bounding box on a copy so the pooled capture buffer can be reused right away
+    annotated = best_frame.copy()
+    frame_pools[camera_id].release(best_frame)
+    x1, y1, x2, y2, score, class_id = best_detection[:6]
+    cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
+    label = f'{class_labels[int(class_id)].upper()} {int(score * 100)}%'
+    cv2.putText(annotated, label, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    # Save the best detected object image; with several cameras the camera id keeps names unique
+    detection_class = class_labels[int(class_id)]
+    detection_name = f'{detection_class}_{camera_id}' if multi_camera else detection_class
+    detection_filename = f'{output_dir}/{detection_name}.jpg'
 
-    return best_frame, best_score, best_detection
+    # Detection metadata; the writer puts it next to the photo before the photo itself
+    meta = {
+        "class": detection_class,
+        "camera": camera_id,
+        "score": round(score, 4),
+        "box": [int(x1), int(y1), int(x2), int(y2)],
+        "time": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+    # The clip follows once its post-roll has been captured; the bot waits for it
+    if clip_recorder:
+        meta["clip"] = f'{detection_name}.mp4'
+        clip_recorder.trigger(camera_id, f'{output_dir}/{detection_name}.mp4')
+
+    def photo_written(path, jpeg_bytes, meta):
+        HANDOFF_SECONDS.observe(time.perf_counter() - selected_at)
+        DETECTIONS_TOTAL.inc(name=detection_class, camera=camera_id)
+        print(f"Best frame saved: {path}")
+        # Send the same JPEG to a remote bot when this node has none of its own
+        if INGEST_URL:
+            uplink.post_in_background(INGEST_URL, NODE_ID, dict(meta, event_id=f"{camera_id}-{time.time_ns()}"),
+                                      jpeg_bytes, INGEST_TOKEN or None)
+
+    # Show the resulting best frame with bounding boxes and labels to live viewers
+    if live_view:
+        live_view.publish(annotated)
+
+    # Save the entire frame with drawn bounding box without waiting for the SD card
+    photo_writer.submit(detection_filename, annotated, meta=meta, on_done=photo_written)
+
+# Function to wait between bursts, buffering frames for clips when they are enabled
+def idle_capture(seconds):
+    if not clip_recorder:
+        time.sleep(seconds)
+        return
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        for source in frame_sources:
+            frame = read_frame(source)  # Buffered by read_frame; the pooled array goes straight back
+            frame_pools[source.camera_id].release(frame)
+        time.sleep(max(0.0, min(1.0 / CLIP_FPS - (time.monotonic() - started), deadline - time.monotonic())))
 
 # Function to handle automatic frame capturing every 30 seconds
 def handle_auto_capture():
     while True:  # Infinite loop for continuous frame capturing
-        print("Capturing frames every 20 seconds...")
+        print(f"Capturing frames every {controller.interval} seconds...")
+        cycle_started = time.monotonic()
         
-        # Wait for 50 seconds before capturing the next set of frames
-        time.sleep(20)
+        # Wait before capturing the next set of frames
+        idle_capture(controller.interval)
         
-        # Capture 5 frames and get the best one
-        best_frame, best_score, best_detection = process_frames_for_best_detection(num_frames=5)
+        # Capture a burst of rounds across the cameras and get the best frame per camera
+        with BURST_SECONDS.time() as burst_timer:
+            best = process_frames_for_best_detection(num_frames=controller.burst_frames)
+        thermal_sensor.record_work(burst_timer.elapsed, time.monotonic() - cycle_started)
+        controller.update()
         
-        if best_frame is not None and best_score > confidence_threshold:
-            print(f"Best detection score: {best_score:.2f}")
-            
-            # Draw bounding box on the best frame
-            x1, y1, x2, y2, score, class_id = best_detection[:6]
-            cv2.rectangle(best_frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
-            label = f'{class_labels[int(class_id)].upper()} {int(score * 100)}%'
-            cv2.putText(best_frame, label, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-            # Save the best detected object image
-            detection_class = class_labels[int(class_id)]
-            detection_filename = f'{output_dir}/{detection_class}.jpg'
-            try:
-                cv2.imwrite(detection_filename, best_frame)  # Save the entire frame with drawn bounding box
-                print(f"Best frame saved: {detection_filename}")
-            except Exception as e:
-                print(f"Error saving image {detection_filename}: {e}")
-            
-            # Display the resulting best frame with bounding boxes and labels
-            resized_frame = cv2.resize(best_frame, (640, 360))
-            cv2.imshow('YOLOv8 Best Detection', resized_frame)
-            #
-            cv2.destroyAllWindows()
+        if best:
+            for camera_id, (best_frame, best_score, best_detection) in best.items():
+                print(f"Best detection score on {camera_id}: {best_score:.2f}")
+                save_detection(camera_id, best_frame, best_detection)
 
         else:
             print("No detection found in the current frames.")
 
+# `kill -USR1 <pid>` (or the bot's /profile camera) writes a profile report to ../profiles
+camera_profiler = profiler.SignalProfiler("camera")
+camera_profiler.install()
+
 # Main loop: Run the automatic capture and detection
 try:
+    try:
+        metrics.start_http_server(METRICS_PORT)
+    except OSError as e:
+        print(f"Metrics endpoint not started: {e}")
+    if live_view:
+        try:
+            liveview.start_server(live_view, LIVEVIEW_PORT)
+        except OSError as e:
+            print(f"Live view not started: {e}")
+    
     handle_auto_capture()  # Start automatic capture and detection every 30 seconds
 
 finally:
-    # When everything is done, stop the PiCamera and destroy all OpenCV windows
-    picam2.stop()
+    # When everything is done, stop the cameras and finish pending photo writes
+    for source in frame_sources:
+        source.close()
+    photo_writer.close()
+    if detector_pool:
+        detector_pool.close()
+    if clip_recorder:
+        clip_recorder.close(timeout=10)
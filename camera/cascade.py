@@ -0,0 +1,180 @@
+import argparse
+import os
+import sys
+import time
+import cv2
+
+# Shared helpers (metrics) live next to the bot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import metrics
+import evaluate
+
+# Two-stage detection: a small, fast model (e.g. yolov8n.pt at 320 px) looks
+# for anything animal- or person-like on every frame with a low threshold, and
+# the full trained model only runs where it fires. By default the full model
+# sees an enlarged crop around the first stage's boxes, which also gives it
+# more pixels per animal than the downscaled whole frame; "frame" mode runs it
+# on the whole triggered frame instead. Every `audit_every`-th frame runs the
+# full model regardless, so a presence model that misses something is noticed
+# in the metrics.
+#   python cascade.py samples/ --presence yolov8n.pt --model epoch150s200.pt
+# compares the cascade with the full model alone on a folder of images:
+# recall of the full model's detections, trigger rate and speedup.
+
+PRESENCE_IMGSZ = 320
+PRESENCE_CONF = 0.15       # Low on purpose: a false trigger only costs one full-model run
+CROP_MARGIN = 0.5          # Grow the union of trigger boxes by this fraction of its size per side
+MIN_CROP = 320             # Pixels; tiny crops give the full model too little context
+AUDIT_EVERY = 20           # Run the full model on every n-th frame anyway (0 disables)
+
+CASCADE_FRAMES = metrics.counter("wilddetect_cascade_frames_total", "Frames through the cascade by outcome")
+CASCADE_SECONDS = metrics.histogram("wilddetect_cascade_seconds", "Cascade time per batch by stage")
+
+def crop_box(boxes, width, height, margin=CROP_MARGIN, min_size=MIN_CROP):
+    """Enlarged (x1, y1, x2, y2) pixel region around the union of boxes, clipped to the frame"""
+    x1 = min(box[0] for box in boxes)
+    y1 = min(box[1] for box in boxes)
+    x2 = max(box[2] for box in boxes)
+    y2 = max(box[3] for box in boxes)
+    grow_x = max((x2 - x1) * margin, (min_size - (x2 - x1)) / 2, 0)
+    grow_y = max((y2 - y1) * margin, (min_size - (y2 - y1)) / 2, 0)
+    return (int(max(0, x1 - grow_x)), int(max(0, y1 - grow_y)),
+            int(min(width, x2 + grow_x)), int(min(height, y2 + grow_y)))
+
+class Cascade:
+    """Presence model on every frame, full detector only on triggered frames or crops"""
+    def __init__(self, presence_model, full_detect, presence_imgsz=PRESENCE_IMGSZ, presence_conf=PRESENCE_CONF,
+                 presence_classes=None, mode="crop", margin=CROP_MARGIN, audit_every=AUDIT_EVERY):
+        """
+        Args:
+            presence_model: Loaded YOLO model for the first stage
+            full_detect: Function(frames, **predict_kwargs) -> detection lists, as camera.detect
+            presence_classes: Class ids of the presence model that count (None: any)
+            mode: "crop" to run the full model on enlarged crops, "frame" for whole frames
+        """
+        self.presence_model = presence_model
+        self.full_detect = full_detect
+        self.presence_imgsz = presence_imgsz
+        self.presence_conf = presence_conf
+        self.presence_classes = presence_classes
+        self.mode = mode
+        self.margin = margin
+        self.audit_every = audit_every
+        self.frames_seen = 0
+        self.frames_triggered = 0
+
+    def triggers(self, frames):
+        """First-stage boxes of each frame, [] where nothing was found"""
+        with CASCADE_SECONDS.time(stage="presence"):
+            results = self.presence_model.predict(source=frames, imgsz=self.presence_imgsz, conf=self.presence_conf,
+                                                  classes=self.presence_classes, verbose=False)
+        return [result.boxes.data.tolist() for result in results]
+
+    def detect(self, frames, **predict_kwargs):
+        """Full-model detections of each frame in full-frame coordinates ([] when not triggered)"""
+        detections = [[] for _ in frames]
+        inputs, targets, offsets = [], [], []
+        for index, (frame, boxes) in enumerate(zip(frames, self.triggers(frames))):
+            self.frames_seen += 1
+            audit = self.audit_every and self.frames_seen % self.audit_every == 0
+            if not boxes and not audit:
+                CASCADE_FRAMES.inc(outcome="skipped")
+                continue
+            self.frames_triggered += bool(boxes)
+            if self.mode == "crop" and boxes:
+                x1, y1, x2, y2 = crop_box(boxes, frame.shape[1], frame.shape[0], self.margin)
+                inputs.append(frame[y1:y2, x1:x2])
+                offsets.append((x1, y1))
+                CASCADE_FRAMES.inc(outcome="crop")
+            else:
+                inputs.append(frame)
+                offsets.append((0, 0))
+                CASCADE_FRAMES.inc(outcome="audit" if not boxes else "frame")
+            targets.append(index)
+        if not inputs:
+            return detections
+
+        with CASCADE_SECONDS.time(stage="full"):
+            results = self.full_detect(inputs, **predict_kwargs)
+        for index, (dx, dy), frame_detections in zip(targets, offsets, results):
+            detections[index] = [[x1 + dx, y1 + dy, x2 + dx, y2 + dy, score, class_id, *rest]
+                                 for x1, y1, x2, y2, score, class_id, *rest in frame_detections]
+        return detections
+
+def yolo_detect(model):
+    """detect() function over a YOLO model, returning plain detection lists"""
+    def detect(frames, **predict_kwargs):
+        results = model.predict(source=frames, verbose=False, **predict_kwargs)
+        return [result.boxes.data.tolist() for result in results]
+    return detect
+
+def parse_classes(text):
+    """"0,14,15" -> [0, 14, 15]; "" -> None (any class)"""
+    return [int(class_id) for class_id in text.split(",")] if text else None
+
+def agreement(reference, candidate, thresholds, default):
+    """Reference detections above their class threshold that the candidate also found (same class, IoU >= 0.5)"""
+    kept = lambda detections: [d for d in detections if d[4] > thresholds.get(int(d[5]), default)]
+    wanted, found = kept(reference), kept(candidate)
+    matched = evaluate.match_detections(
+        [(int(d[5]), d[4], *d[:4]) for d in wanted],
+        [(int(d[5]), *d[:4]) for d in found]
+    )
+    return len(wanted), sum(1 for _, _, hit in matched if hit)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the two-stage cascade with the full model alone")
+    parser.add_argument("folder", help="Sample images (labels are not needed)")
+    parser.add_argument("--model", default="epoch150s200.pt")
+    parser.add_argument("--presence", default="yolov8n.pt", help="Small first-stage model")
+    parser.add_argument("--presence-classes", default="", help="Comma-separated class ids that trigger (default any)")
+    parser.add_argument("--presence-imgsz", type=int, default=PRESENCE_IMGSZ)
+    parser.add_argument("--presence-conf", type=float, default=PRESENCE_CONF)
+    parser.add_argument("--mode", choices=["crop", "frame"], default="crop")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--thresholds", default=evaluate.THRESHOLDS_PATH)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    class_names = evaluate.load_class_names()
+    by_name = evaluate.load_thresholds(args.thresholds, 0.5)
+    thresholds = {class_id: by_name.get(name, 0.5) for class_id, name in enumerate(class_names)}
+    paths = [path for path, _ in evaluate.load_dataset(args.folder)]
+    if not paths:
+        raise SystemExit(f"No images found in {args.folder}")
+    full_detect = yolo_detect(YOLO(args.model))
+    cascade = Cascade(YOLO(args.presence), full_detect, args.presence_imgsz, args.presence_conf,
+                      parse_classes(args.presence_classes), args.mode, audit_every=0)  # Audits would flatter the recall
+    predict_conf = min(thresholds.values())
+
+    # Warm both models up on the first image, untimed
+    first = cv2.imread(paths[0])
+    full_detect([first], conf=predict_conf, imgsz=args.imgsz)
+    cascade.detect([first], conf=predict_conf, imgsz=args.imgsz)
+
+    full_seconds = cascade_seconds = 0.0
+    wanted = found = 0
+    cascade.frames_seen = cascade.frames_triggered = 0
+    print(f"Comparing on {len(paths)} images ({args.mode} mode)...")
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        started = time.perf_counter()
+        reference = full_detect([frame], conf=predict_conf, imgsz=args.imgsz)[0]
+        full_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        candidate = cascade.detect([frame], conf=predict_conf, imgsz=args.imgsz)[0]
+        cascade_seconds += time.perf_counter() - started
+        image_wanted, image_found = agreement(reference, candidate, thresholds, 0.5)
+        wanted += image_wanted
+        found += image_found
+        if image_found < image_wanted:
+            print(f"  missed {image_wanted - image_found} of {image_wanted} detections in {path}")
+
+    print(f"Trigger rate: {cascade.frames_triggered / max(cascade.frames_seen, 1):.0%} of images")
+    print(f"Recall of full-model detections: {found}/{wanted} ({found / wanted:.1%})" if wanted
+          else "The full model found nothing above threshold")
+    print(f"Time per image: full model {full_seconds / len(paths) * 1000:.0f} ms, "
+          f"cascade {cascade_seconds / len(paths) * 1000:.0f} ms, speedup {full_seconds / cascade_seconds:.2f}x")
@@ -0,0 +1,153 @@
+import collections
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+import metrics
+
+# Short video clips around detections. Recent frames of every camera are kept
+# as small JPEGs in a ring buffer bounded by time and bytes. A detection
+# triggers a clip covering pre-roll seconds before it and post-roll seconds
+# after it. Downscaling happens on the capture thread (one resize into a new
+# small array); JPEG encoding, waiting for the post-roll and writing the video
+# all happen on the recorder thread.
+
+PRE_ROLL = 5.0          # Seconds before the detection
+POST_ROLL = 5.0         # Seconds after it
+CLIP_FPS = 4            # Frames per second kept while idle
+CLIP_SIZE = (640, 360)
+CLIP_QUALITY = 75       # JPEG quality of buffered frames
+BUFFER_BYTES = 8 * 1024 * 1024  # Ring buffer limit per camera
+QUEUE_SIZE = 32         # Frames waiting to be encoded
+FOURCC = "mp4v"
+
+CLIP_FRAMES_DROPPED = metrics.counter("wilddetect_clip_frames_dropped_total", "Frames not buffered because the recorder was behind")
+CLIP_BUFFER_BYTES = metrics.gauge("wilddetect_clip_buffer_bytes", "Encoded frames held for clips by camera")
+CLIPS_WRITTEN = metrics.counter("wilddetect_clips_written_total", "Detection clips written by camera")
+CLIP_SECONDS = metrics.histogram("wilddetect_clip_write_seconds", "Time to write one clip")
+
+class FrameRing:
+    """Recent (timestamp, JPEG bytes) of one camera, bounded by age and total size"""
+    def __init__(self, max_seconds, max_bytes=BUFFER_BYTES):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.frames = collections.deque()
+        self.size = 0
+
+    def append(self, timestamp, jpeg):
+        self.frames.append((timestamp, jpeg))
+        self.size += len(jpeg)
+        while self.frames and (self.size > self.max_bytes or timestamp - self.frames[0][0] > self.max_seconds):
+            self.size -= len(self.frames.popleft()[1])
+
+    def between(self, start, end):
+        return [(timestamp, jpeg) for timestamp, jpeg in self.frames if start <= timestamp <= end]
+
+class PendingClip:
+    def __init__(self, camera_id, path, detected_at, pre_roll, post_roll):
+        self.camera_id = camera_id
+        self.path = path
+        self.start = detected_at - pre_roll
+        self.end = detected_at + post_roll
+
+class ClipRecorder:
+    """Buffers frames from the capture loop and writes clips on its own thread"""
+    def __init__(self, pre_roll=PRE_ROLL, post_roll=POST_ROLL, fps=CLIP_FPS, size=CLIP_SIZE,
+                 quality=CLIP_QUALITY, max_bytes=BUFFER_BYTES, fourcc=FOURCC):
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.fps = fps
+        self.size = size
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.fourcc = fourcc
+        self.rings = {}
+        self.pending = []
+        self.jobs = queue.Queue(maxsize=QUEUE_SIZE)
+        self.last_added = {}
+        self.thread = threading.Thread(target=self._run, name="clip-recorder", daemon=True)
+        self.thread.start()
+
+    def add(self, camera_id, frame):
+        """Buffer a captured frame (called on the capture thread; never blocks)"""
+        now = time.time()
+        # Burst frames can come faster than the clip frame rate; keep an even spacing
+        if now - self.last_added.get(camera_id, 0) < 0.5 / self.fps:
+            return
+        self.last_added[camera_id] = now
+        small = cv2.resize(frame, self.size)  # New small array, so the pooled buffer can be reused
+        try:
+            self.jobs.put_nowait(("frame", camera_id, now, small))
+        except queue.Full:
+            CLIP_FRAMES_DROPPED.inc()
+
+    def trigger(self, camera_id, path, detected_at=None):
+        """Write a clip around `detected_at` to `path` once the post-roll has been captured"""
+        clip = PendingClip(camera_id, path, detected_at or time.time(), self.pre_roll, self.post_roll)
+        try:
+            self.jobs.put(("clip", camera_id, clip.end, clip), timeout=1)
+        except queue.Full:
+            print(f"Clip recorder busy, no clip for {path}")
+
+    def close(self, timeout=None):
+        """Write clips whose post-roll is complete enough and stop the thread"""
+        self.jobs.put(("stop", None, time.time(), None))
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                kind, camera_id, timestamp, payload = self.jobs.get(timeout=1)
+            except queue.Empty:
+                # The camera stopped delivering frames; write what there is
+                overdue = [clip for clip in self.pending if time.time() > clip.end + 2]
+                for clip in overdue:
+                    self.pending.remove(clip)
+                    self._write(clip)
+                continue
+            if kind == "stop":
+                for clip in self.pending:
+                    self._write(clip)  # Shorter post-roll than asked for, but not lost
+                return
+            if kind == "clip":
+                self.pending.append(payload)
+                continue
+            ok, encoded = cv2.imencode('.jpg', payload, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                ring = self.rings.setdefault(camera_id, FrameRing(self.pre_roll + self.post_roll + 2, self.max_bytes))
+                ring.append(timestamp, encoded.tobytes())
+                CLIP_BUFFER_BYTES.set(ring.size, camera=camera_id)
+            # Clips of this camera are ready once a frame past their end has arrived
+            ready = [clip for clip in self.pending if clip.camera_id == camera_id and timestamp >= clip.end]
+            for clip in ready:
+                self.pending.remove(clip)
+                self._write(clip)
+
+    def _write(self, clip):
+        ring = self.rings.get(clip.camera_id)
+        frames = ring.between(clip.start, clip.end) if ring else []
+        if len(frames) < 2:
+            print(f"Not enough buffered frames for clip {clip.path}")
+            return
+        started = time.perf_counter()
+        directory, name = os.path.split(clip.path)
+        root, extension = os.path.splitext(name)
+        # Hidden temporary name with the same extension, so VideoWriter picks the container
+        temp_path = os.path.join(directory, f".{root}.tmp{extension}")
+        # Play back at the rate the frames were actually buffered
+        fps = max(1.0, (len(frames) - 1) / max(frames[-1][0] - frames[0][0], 1e-3))
+        video = cv2.VideoWriter(temp_path, cv2.VideoWriter_fourcc(*self.fourcc), fps, self.size)
+        try:
+            if not video.isOpened():
+                print(f"Cannot open video writer for {clip.path}")
+                return
+            for _, jpeg in frames:
+                video.write(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR))
+        finally:
+            video.release()
+        os.replace(temp_path, clip.path)
+        CLIP_SECONDS.observe(time.perf_counter() - started)
+        CLIPS_WRITTEN.inc(camera=clip.camera_id)
+        print(f"Clip saved: {clip.path} ({len(frames)} frames, {frames[-1][0] - frames[0][0]:.1f}s)")
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import time
+
+# Offline evaluation of the detector on a labelled folder (YOLO format: each
+# image has a .txt next to it or in a sibling labels/ folder, one
+# "class cx cy w h" line per object, normalized). Reports per-class
+# precision/recall/AP, mAP@0.5 and per-image latency, sweeps confidence
+# thresholds and writes the per-class thresholds camera.py loads.
+#   python evaluate.py ../dataset/val --model epoch150s200.pt --out thresholds.json
+
+THRESHOLDS_PATH = "thresholds.json"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+NAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "obj.names")
+IOU_MATCH = 0.5
+SWEEP = [round(0.05 * step, 2) for step in range(1, 20)]  # 0.05 .. 0.95
+
+def load_thresholds(path=THRESHOLDS_PATH, default=0.5):
+    """Per-class thresholds written by this tool, or {} when there is no usable file"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as thresholds_file:
+            thresholds = json.load(thresholds_file).get("classes", {})
+        return {name: float(value) for name, value in thresholds.items()}
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        print(f"Ignoring threshold file {path}, using {default} for all classes: {e}")
+        return {}
+
+def load_class_names(path=NAMES_PATH):
+    with open(path) as names_file:
+        return [line.strip() for line in names_file if line.strip()]
+
+def label_path_for(image_path):
+    """Label file next to the image, or in labels/ beside an images/ folder"""
+    base = os.path.splitext(image_path)[0] + ".txt"
+    if os.path.exists(base):
+        return base
+    folder, name = os.path.split(base)
+    parent, leaf = os.path.split(folder)
+    if leaf == "images":
+        return os.path.join(parent, "labels", name)
+    return base
+
+def load_dataset(folder):
+    """List (image_path, [(class_id, x1, y1, x2, y2) normalized]) for every labelled image"""
+    samples = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image_path = os.path.join(root, name)
+            boxes = []
+            label_path = label_path_for(image_path)
+            if os.path.exists(label_path):  # No label file means no objects
+                with open(label_path) as label_file:
+                    for line in label_file:
+                        parts = line.split()
+                        if len(parts) < 5:
+                            continue
+                        class_id, cx, cy, w, h = int(parts[0]), *map(float, parts[1:5])
+                        boxes.append((class_id, cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2))
+            samples.append((image_path, boxes))
+    return samples
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+def match_detections(predictions, truths, iou_threshold=IOU_MATCH):
+    """
+    Greedily match one image's predictions to its ground truth, per class.
+
+    Args:
+        predictions: List of (class_id, score, x1, y1, x2, y2), normalized
+        truths: List of (class_id, x1, y1, x2, y2), normalized
+        iou_threshold: Minimum IoU for a true positive
+
+    Returns:
+        List of (class_id, score, is_true_positive)
+    """
+    used = set()
+    matched = []
+    for class_id, score, *box in sorted(predictions, key=lambda prediction: -prediction[1]):
+        best, best_iou = None, iou_threshold
+        for index, (truth_class, *truth_box) in enumerate(truths):
+            if truth_class != class_id or index in used:
+                continue
+            overlap = iou(box, truth_box)
+            if overlap >= best_iou:
+                best, best_iou = index, overlap
+        if best is not None:
+            used.add(best)
+        matched.append((class_id, score, best is not None))
+    return matched
+
+def average_precision(scored, positives):
+    """All-point interpolated AP from (score, is_true_positive) pairs"""
+    if positives == 0:
+        return None
+    true_positives = 0
+    points = []
+    for rank, (_, hit) in enumerate(sorted(scored, key=lambda pair: -pair[0]), 1):
+        true_positives += hit
+        points.append((true_positives / positives, true_positives / rank))
+    ap, previous_recall = 0.0, 0.0
+    for index, (recall, _) in enumerate(points):
+        # Precision envelope: the best precision at this recall or higher
+        precision = max(p for _, p in points[index:])
+        ap += (recall - previous_recall) * precision
+        previous_recall = recall
+    return ap
+
+def precision_recall_at(scored, positives, threshold):
+    # Strictly above, exactly as camera.py accepts a detection
+    kept = [hit for score, hit in scored if score > threshold]
+    true_positives = sum(kept)
+    precision = true_positives / len(kept) if kept else 1.0
+    recall = true_positives / positives if positives else 0.0
+    return precision, recall
+
+def choose_threshold(scored, positives, beta=1.0, min_precision=None, default=0.5):
+    """Threshold with the best F-beta, or the lowest one reaching min_precision"""
+    if positives == 0:
+        return default
+    best, best_value = default, -1.0
+    for threshold in SWEEP:
+        precision, recall = precision_recall_at(scored, positives, threshold)
+        if min_precision is not None:
+            if precision >= min_precision and recall > 0:
+                return threshold
+            continue
+        if precision + recall == 0:
+            continue
+        value = (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall)
+        if value > best_value:
+            best, best_value = threshold, value
+    return best
+
+def evaluate(model, samples, class_names, imgsz=640, batch=1, min_score=SWEEP[0]):
+    """Run the model over the samples; return per-class scored matches, positives and latencies"""
+    scored = {class_id: [] for class_id in range(len(class_names))}
+    positives = {class_id: 0 for class_id in range(len(class_names))}
+    latencies = []
+    for start in range(0, len(samples), batch):
+        chunk = samples[start:start + batch]
+        started = time.perf_counter()
+        results = model.predict(source=[path for path, _ in chunk], imgsz=imgsz, conf=min_score, verbose=False)
+        elapsed = time.perf_counter() - started
+        latencies += [elapsed / len(chunk)] * len(chunk)
+        for (_, truths), result in zip(chunk, results):
+            predictions = [
+                (int(class_id), score, *box)
+                for box, score, class_id in zip(result.boxes.xyxyn.tolist(), result.boxes.conf.tolist(), result.boxes.cls.tolist())
+            ]
+            for truth in truths:
+                positives[truth[0]] = positives.get(truth[0], 0) + 1
+            for class_id, score, hit in match_detections(predictions, truths):
+                scored.setdefault(class_id, []).append((score, hit))
+    return scored, positives, latencies
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the detector and calibrate per-class thresholds")
+    parser.add_argument("folder", help="Labelled images in YOLO format")
+    parser.add_argument("--model", default="epoch150s200.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=1, help="Images per predict call")
+    parser.add_argument("--beta", type=float, default=1.0, help="F-beta to maximize (<1 favours precision: fewer false alarms)")
+    parser.add_argument("--min-precision", type=float, help="Pick the lowest threshold reaching this precision instead")
+    parser.add_argument("--default", type=float, default=0.5, help="Threshold for classes without labelled examples")
+    parser.add_argument("--out", default=THRESHOLDS_PATH, help="Threshold file to write ('' to skip)")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    class_names = load_class_names()
+    samples = load_dataset(args.folder)
+    if not samples:
+        raise SystemExit(f"No images found in {args.folder}")
+    print(f"Evaluating {args.model} on {len(samples)} images...")
+    model = YOLO(args.model)
+    model.predict(source=samples[0][0], imgsz=args.imgsz, verbose=False)  # Warm-up, not timed
+    scored, positives, latencies = evaluate(model, samples, class_names, args.imgsz, args.batch)
+
+    thresholds = {}
+    aps = []
+    print(f"\n{'class':<10}{'labels':>7}{'AP50':>7}{'thresh':>8}{'prec':>7}{'recall':>8}{'@0.50 P':>9}{'@0.50 R':>9}")
+    for class_id, name in enumerate(class_names):
+        ap = average_precision(scored[class_id], positives[class_id])
+        threshold = choose_threshold(scored[class_id], positives[class_id], args.beta, args.min_precision, args.default)
+        thresholds[name] = threshold
+        if ap is None:
+            print(f"{name:<10}{0:>7}{'-':>7}{threshold:>8.2f}")
+            continue
+        aps.append(ap)
+        precision, recall = precision_recall_at(scored[class_id], positives[class_id], threshold)
+        base_precision, base_recall = precision_recall_at(scored[class_id], positives[class_id], 0.5)
+        print(f"{name:<10}{positives[class_id]:>7}{ap:>7.3f}{threshold:>8.2f}{precision:>7.2f}{recall:>8.2f}"
+              f"{base_precision:>9.2f}{base_recall:>9.2f}")
+
+    print(f"\nmAP@0.5 over {len(aps)} labelled classes: {sum(aps) / len(aps):.3f}" if aps else "\nNo labelled objects found")
+    print(f"Latency per image (batch {args.batch}, imgsz {args.imgsz}): "
+          f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p95 {percentile(latencies, 0.95) * 1000:.0f} ms, "
+          f"mean {sum(latencies) / len(latencies) * 1000:.0f} ms")
+
+    if args.out:
+        with open(args.out, "w") as thresholds_file:
+            json.dump({
+                "model": args.model,
+                "images": len(samples),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "default": args.default,
+                "classes": thresholds,
+            }, thresholds_file, indent=2)
+        print(f"Per-class thresholds written to {args.out}")
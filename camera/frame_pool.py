@@ -0,0 +1,79 @@
+import numpy as np
+import metrics
+
+# Reusable full-resolution frame buffers. A burst captures into a small fixed
+# set of arrays per camera instead of allocating a new one for every frame;
+# only the best frame of each camera is held until it has been saved.
+
+POOL_SIZE = 2  # Per camera: the frame being captured and the current best
+
+FRAME_ALLOCATIONS = metrics.counter("wilddetect_frame_allocations_total", "Full-resolution frame arrays allocated by camera")
+POOL_FREE = metrics.gauge("wilddetect_frame_pool_free", "Idle buffers in the frame pool by camera")
+
+class FramePool:
+    """Fixed set of same-shaped frame buffers for one camera"""
+    def __init__(self, camera_id, size=POOL_SIZE):
+        self.camera_id = camera_id
+        self.size = size
+        self.shape = None
+        self.dtype = None
+        self.free = []
+        self.allocations = 0
+
+    def acquire(self):
+        """An idle buffer to capture into, or None until the frame shape is known"""
+        if self.shape is None:
+            return None
+        if self.free:
+            buffer = self.free.pop()
+        else:
+            # Every buffer is in use (e.g. a slow save still holds one); don't stall capture
+            buffer = np.empty(self.shape, self.dtype)
+            self.count_allocation()
+        POOL_FREE.set(len(self.free), camera=self.camera_id)
+        return buffer
+
+    def adopt(self, frame):
+        """Take in a frame the source allocated itself, learning the shape from it"""
+        self.count_allocation()
+        if frame.shape != self.shape or frame.dtype != self.dtype:
+            # New resolution: old buffers no longer fit
+            self.shape, self.dtype = frame.shape, frame.dtype
+            self.free = []
+
+    def release(self, frame):
+        """Return a buffer for reuse; extra or foreign-shaped arrays are left to the GC"""
+        if frame is None or frame.shape != self.shape or frame.dtype != self.dtype:
+            return
+        if len(self.free) < self.size and not any(frame is buffer for buffer in self.free):
+            self.free.append(frame)
+        POOL_FREE.set(len(self.free), camera=self.camera_id)
+
+    def count_allocation(self):
+        self.allocations += 1
+        FRAME_ALLOCATIONS.inc(camera=self.camera_id)
+
+class BestFrames:
+    """Keep the best-scoring frame per camera during a burst and recycle the rest"""
+    def __init__(self, pools):
+        self.pools = pools
+        self.best = {}  # camera_id -> (frame, score, detection)
+
+    def offer(self, camera_id, frame, score=None, detection=None):
+        """Keep the frame if it beats the camera's best so far, otherwise give it back"""
+        current = self.best.get(camera_id)
+        if score is None or (current and current[1] >= score):
+            self.pools[camera_id].release(frame)
+            return False
+        if current:
+            self.pools[camera_id].release(current[0])
+        self.best[camera_id] = (frame, score, detection)
+        return True
+
+    def take(self):
+        """The best frames; hand each one back with release() once it has been used"""
+        best, self.best = self.best, {}
+        return best
+
+    def release(self, camera_id, frame):
+        self.pools[camera_id].release(frame)
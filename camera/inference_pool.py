@@ -0,0 +1,226 @@
+import multiprocessing
+import queue
+import signal
+import time
+import types
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+# Process-pool inference: the capture process copies each frame into a
+# shared-memory slot and N worker processes, each with its own model copy,
+# run YOLO on it and send back only the detections. Results come back in
+# submission order whichever worker finishes first.
+#
+# camera.py is a script without a __main__ guard, so workers are forked (spawn
+# would re-run it); start the pool before the model is loaded and before any
+# threads exist. Slots are created on the first frame and workers attach to
+# them by name. Slots are replaced when frames grow; every task carries the
+# slot generation, and a worker closes its old attachments when it changes.
+#
+# A dead or stuck worker makes the pool raise InferencePoolError instead of
+# waiting forever. Workers are not respawned: by then the camera has threads
+# (and possibly a loaded torch) that a fork isn't safe with, so camera.py
+# closes the pool and falls back to running the model in its own process.
+#
+# A model path of "synthetic:<ms>" loads a stand-in that burns <ms> of CPU per
+# frame and detects nothing; bench_workers.py uses it to measure the pool's
+# own overhead on machines without the trained model.
+
+SLOTS_PER_WORKER = 2
+RESULT_TIMEOUT = 60  # Seconds without any result before the pool is considered stuck
+HEALTH_CHECK_SECONDS = 1  # How often workers are checked for crashes while waiting
+
+class InferencePoolError(RuntimeError):
+    """A worker died or stopped answering; the pool can't be used any more"""
+
+class SyntheticModel:
+    """CPU-bound stand-in for YOLO with the same predict() call shape"""
+    def __init__(self, milliseconds):
+        self.seconds = milliseconds / 1000
+
+    def predict(self, source, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        results = []
+        for frame in frames:
+            started = time.process_time()  # CPU time, so workers sharing a core slow each other down
+            work = np.asarray(frame[:64, :64, 0], dtype=np.float32)
+            mix = np.full((64, 64), 1 / 64, np.float32)
+            while time.process_time() - started < self.seconds:
+                work = np.tanh(work @ mix)
+            results.append(types.SimpleNamespace(boxes=types.SimpleNamespace(data=np.empty((0, 6), np.float32))))
+        return results
+
+def load_model(model_path):
+    if model_path.startswith("synthetic:"):
+        return SyntheticModel(float(model_path.split(":", 1)[1]))
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+def worker_main(worker_id, model_path, tasks, results):
+    """Worker process: load the model, then serve tasks until None"""
+    attached = {}  # Slot name -> SharedMemory of the current generation, attached on first use
+    generation = None
+    # Forked before camera.py installs its profiling handler; the default action would kill the worker
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    try:
+        model = load_model(model_path)
+        results.put(("ready", worker_id, None, None, None))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            sequence, slot_generation, slot, slot_name, shape, dtype, predict_kwargs = task
+            if slot_generation != generation:
+                # The parent unlinked the old slots; drop our mappings so their memory is freed
+                for shm in attached.values():
+                    shm.close()
+                attached, generation = {}, slot_generation
+            if slot_name not in attached:
+                attached[slot_name] = shared_memory.SharedMemory(name=slot_name)
+            frame = np.ndarray(shape, dtype=dtype, buffer=attached[slot_name].buf)
+            started = time.perf_counter()
+            try:
+                result = model.predict(source=frame, verbose=False, **predict_kwargs)[0]
+                detections = result.boxes.data.tolist()
+                error = None
+            except Exception as e:
+                detections, error = [], f"{type(e).__name__}: {e}"
+            del frame  # Drop the view before the slot can be reused or closed
+            results.put((sequence, worker_id, slot, detections, (time.perf_counter() - started, error)))
+    finally:
+        for shm in attached.values():
+            shm.close()
+
+class InferencePool:
+    """Worker processes sharing frame slots with the capture process"""
+    def __init__(self, model_path, workers=2, slots=None, start_method="fork"):
+        self.model_path = model_path
+        self.worker_count = workers
+        self.slot_count = slots or workers * SLOTS_PER_WORKER
+        self.frame_bytes = 0
+        self.generation = 0
+        self.context = multiprocessing.get_context(start_method)
+        self.slots = []
+        self.free_slots = []
+        self.processes = []
+        self.tasks = None
+        self.results = None
+        self.next_sequence = 0
+        self.next_to_deliver = 0
+        self.finished = {}  # sequence -> (detections, latency, worker_id)
+        self.worker_seconds = {}
+        self.ready = 0
+
+    def start(self, wait=True):
+        """Start the workers; with wait, return once every model has loaded"""
+        # Attaching to a slot registers it for cleanup at exit (before Python 3.13); with
+        # the tracker started here the workers share it instead of each starting one
+        # that would unlink the slots when the worker exits
+        resource_tracker.ensure_running()
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.processes = [
+            self.context.Process(
+                target=worker_main, name=f"inference-{i}", daemon=True,
+                args=(i, self.model_path, self.tasks, self.results)
+            )
+            for i in range(self.worker_count)
+        ]
+        for process in self.processes:
+            process.start()
+        self.ready = 0
+        if wait:
+            self.wait_ready()
+
+    def wait_ready(self):
+        while self.ready < self.worker_count:
+            message = self._get_result()
+            if message[0] == "ready":
+                self.ready += 1
+        print(f"Inference pool ready: {self.worker_count} workers with {self.model_path}")
+
+    def create_slots(self, frame_bytes):
+        """Shared-memory slots for frames of up to frame_bytes (replaced if frames grow)"""
+        while len(self.free_slots) < len(self.slots):
+            self._collect_one()  # Workers must be done with the old slots
+        self.release_slots()
+        self.frame_bytes = frame_bytes
+        self.generation += 1
+        self.slots = [shared_memory.SharedMemory(create=True, size=frame_bytes) for _ in range(self.slot_count)]
+        self.free_slots = list(range(self.slot_count))
+
+    def release_slots(self):
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+        self.slots = []
+        self.free_slots = []
+
+    def _get_result(self):
+        deadline = time.monotonic() + RESULT_TIMEOUT
+        while True:
+            try:
+                return self.results.get(timeout=HEALTH_CHECK_SECONDS)
+            except queue.Empty:
+                # A dead worker's frames never come back, so don't wait out the timeout
+                dead = [process.name for process in self.processes if not process.is_alive()]
+                if dead:
+                    raise InferencePoolError(f"Inference workers died: {', '.join(dead)}")
+                if time.monotonic() > deadline:
+                    raise InferencePoolError(f"No inference result for {RESULT_TIMEOUT}s")
+
+    def _collect_one(self):
+        message = self._get_result()
+        if message[0] == "ready":
+            self.ready += 1
+            return
+        sequence, worker_id, slot, detections, (latency, error) = message
+        self.free_slots.append(slot)
+        self.worker_seconds[worker_id] = self.worker_seconds.get(worker_id, 0.0) + latency
+        if error:
+            print(f"Inference worker {worker_id} failed on frame {sequence}: {error}")
+        self.finished[sequence] = (detections, latency, worker_id)
+
+    def submit(self, frame, **predict_kwargs):
+        """Copy a frame into a free slot and queue it; returns its sequence number"""
+        if self.tasks is None:
+            self.start()
+        if frame.nbytes > self.frame_bytes:
+            self.create_slots(frame.nbytes)
+        while not self.free_slots:
+            self._collect_one()  # Back-pressure: wait for a worker to hand a slot back
+        slot = self.free_slots.pop()
+        np.copyto(np.ndarray(frame.shape, frame.dtype, buffer=self.slots[slot].buf), frame)
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        self.tasks.put((sequence, self.generation, slot, self.slots[slot].name, frame.shape, frame.dtype.str, predict_kwargs))
+        return sequence
+
+    def next_result(self):
+        """Detections of the oldest undelivered frame, waiting for it if needed"""
+        if self.next_to_deliver >= self.next_sequence:
+            raise ValueError("No frames pending")
+        while self.next_to_deliver not in self.finished:
+            self._collect_one()
+        detections, _, _ = self.finished.pop(self.next_to_deliver)
+        self.next_to_deliver += 1
+        return detections
+
+    def predict(self, frames, **predict_kwargs):
+        """Detections for each frame, in order; frames run on all workers in parallel"""
+        for frame in frames:
+            self.submit(frame, **predict_kwargs)
+        return [self.next_result() for _ in frames]
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self.tasks is not None:
+            for _ in self.processes:
+                self.tasks.put(None)
+            for process in self.processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+        self.release_slots()
+        self.processes = []
+        self.tasks = None
@@ -0,0 +1,144 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+import metrics
+
+# Optional MJPEG live view in place of cv2.imshow, which needs a display.
+# The camera publishes frames (downscaled into one preallocated buffer); each
+# new frame is JPEG-encoded once, on the first request for it, and the same
+# bytes go to every viewer, at most MAX_FPS times a second. Nothing is encoded
+# while nobody is watching.
+#   http://<node>:8090/         page with the stream
+#   http://<node>:8090/stream   multipart/x-mixed-replace MJPEG
+#   http://<node>:8090/snapshot.jpg
+
+MAX_FPS = 5
+SIZE = (640, 360)
+QUALITY = 70
+KEEPALIVE_SECONDS = 5  # Resend the last frame this often so proxies keep the stream open
+BOUNDARY = "wilddetectframe"
+
+LIVEVIEW_VIEWERS = metrics.gauge("wilddetect_liveview_viewers", "Connected live-view streams")
+LIVEVIEW_ENCODES = metrics.counter("wilddetect_liveview_encodes_total", "Live-view frames encoded to JPEG")
+LIVEVIEW_SENT = metrics.counter("wilddetect_liveview_frames_sent_total", "Live-view frames sent to viewers")
+
+PAGE = """<!doctype html>
+<html><head><title>WildDetect live view</title></head>
+<body style="margin:0;background:#111"><img src="/stream" style="width:100%;height:auto"></body></html>
+"""
+
+class LiveView:
+    """Latest frame shared between the camera loop and any number of viewers"""
+    def __init__(self, size=SIZE, max_fps=MAX_FPS, quality=QUALITY):
+        self.size = size
+        self.max_fps = max_fps
+        self.quality = quality
+        self.condition = threading.Condition()
+        self.frame = np.zeros((size[1], size[0], 3), np.uint8)
+        self.sequence = 0
+        self.jpeg = None
+        self.jpeg_sequence = -1
+        self.viewers = 0
+
+    def wants_frames(self):
+        """True while someone is watching; lets the camera skip publishing raw frames"""
+        return self.viewers > 0
+
+    def publish(self, frame):
+        """Downscale a frame into the shared buffer and wake the viewers"""
+        with self.condition:
+            cv2.resize(frame, self.size, dst=self.frame)
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def latest_jpeg(self):
+        """(sequence, JPEG bytes) of the newest frame, encoding it only once"""
+        with self.condition:
+            if self.sequence == 0:
+                return 0, None
+            if self.jpeg_sequence != self.sequence:
+                ok, encoded = cv2.imencode('.jpg', self.frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if ok:
+                    self.jpeg, self.jpeg_sequence = encoded.tobytes(), self.sequence
+                    LIVEVIEW_ENCODES.inc()
+            return self.jpeg_sequence, self.jpeg
+
+    def wait_for_frame(self, after, timeout):
+        """Block until a frame newer than `after` is published or the timeout passes"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.sequence != after, timeout)
+
+    def viewer_joined(self, delta):
+        with self.condition:
+            self.viewers += delta
+            LIVEVIEW_VIEWERS.set(self.viewers)
+
+class LiveViewHandler(BaseHTTPRequestHandler):
+    """Serve the page, the MJPEG stream and single snapshots"""
+    view = None
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/":
+            self.send_body(PAGE.encode("utf-8"), "text/html; charset=utf-8")
+        elif path == "/snapshot.jpg":
+            _, jpeg = self.view.latest_jpeg()
+            if jpeg is None:
+                self.send_error(503, "No frame yet")
+            else:
+                self.send_body(jpeg, "image/jpeg")
+        elif path == "/stream":
+            self.stream()
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.view.viewer_joined(1)
+        interval = 1.0 / self.view.max_fps
+        last_sequence, last_sent = 0, 0.0  # Sequence 0 is "no frame yet": wait for the first one
+        try:
+            while True:
+                self.view.wait_for_frame(last_sequence, KEEPALIVE_SECONDS)
+                sequence, jpeg = self.view.latest_jpeg()
+                now = time.monotonic()
+                if jpeg is None or (sequence == last_sequence and now - last_sent < KEEPALIVE_SECONDS):
+                    continue
+                self.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode("ascii")
+                    + jpeg + b"\r\n"
+                )
+                self.wfile.flush()
+                LIVEVIEW_SENT.inc()
+                last_sequence, last_sent = sequence, now
+                # Frame rate cap: frames published in between are skipped, not queued
+                time.sleep(max(0.0, interval - (time.monotonic() - now)))
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            pass  # Viewer went away
+        finally:
+            self.view.viewer_joined(-1)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(view, port, host="0.0.0.0"):
+    """Serve the live view from a daemon thread and return the server"""
+    handler = type("BoundLiveViewHandler", (LiveViewHandler,), {"view": view})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="liveview-http", daemon=True).start()
+    print(f"Live view served on http://{host}:{port}/")
+    return server
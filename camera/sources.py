@@ -0,0 +1,163 @@
+import os
+import re
+import cv2
+import numpy as np
+
+# Frame sources for the detector and a fair scheduler that decides which
+# cameras get a slot in each shared inference batch.
+#
+# Sources are configured as a comma-separated list, each "[id=]kind:argument"
+# or "kind:argument[=id]":
+#   picam:0          first Raspberry Pi camera
+#   picam:1=north    second Pi camera, reported as camera "north"
+#   video:/dev/video0, video:rtsp://...   anything cv2.VideoCapture opens
+#   gate=video:rtsp://host/live?channel=1   URLs may contain "=", so name them with the prefix
+#   folder:../samples  cycles through the images in a folder (for testing)
+# Camera ids end up in file and metric names; other characters than
+# [A-Za-z0-9_.-] are replaced with "_".
+#
+# read(out=None) fills `out` when it is given and has the frame's shape, so a
+# FramePool buffer can be reused; otherwise it returns a newly allocated frame.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class PicameraSource:
+    """Raspberry Pi camera via Picamera2"""
+    def __init__(self, camera_num=0, camera_id=None):
+        from picamera2 import Picamera2
+        self.camera_id = camera_id or f"picam{camera_num}"
+        self.picam2 = Picamera2(camera_num)
+        self.picam2.configure(self.picam2.create_still_configuration())
+        self.picam2.start()
+
+    def read(self, out=None):
+        if out is None:
+            return self.picam2.capture_array()
+        from picamera2 import MappedArray
+        # Copy straight out of the camera's DMA buffer instead of making a new array
+        request = self.picam2.capture_request()
+        try:
+            with MappedArray(request, "main") as mapped:
+                frame = mapped.array[:out.shape[0], :out.shape[1]]
+                if frame.shape != out.shape or frame.dtype != out.dtype:
+                    return frame.copy()
+                np.copyto(out, frame)
+        finally:
+            request.release()
+        return out
+
+    def close(self):
+        self.picam2.stop()
+
+class VideoSource:
+    """USB/IP camera or video file via OpenCV"""
+    def __init__(self, location, camera_id=None):
+        self.camera_id = camera_id or os.path.basename(str(location)) or str(location)
+        self.capture = cv2.VideoCapture(int(location) if str(location).isdigit() else location)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open video source {location}")
+
+    def read(self, out=None):
+        ok, frame = self.capture.read(out) if out is not None else self.capture.read()
+        return frame if ok else None
+
+    def close(self):
+        self.capture.release()
+
+class FolderSource:
+    """Cycles through the images in a folder, for tests and benchmarks"""
+    def __init__(self, path, camera_id=None):
+        self.camera_id = camera_id or os.path.basename(os.path.normpath(path))
+        self.paths = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.paths:
+            raise RuntimeError(f"No images in {path}")
+        self.index = 0
+
+    def read(self, out=None):
+        path = self.paths[self.index % len(self.paths)]
+        self.index += 1
+        frame = cv2.imread(path)
+        if out is not None and frame is not None and frame.shape == out.shape:
+            np.copyto(out, frame)
+            return out
+        return frame
+
+    def close(self):
+        pass
+
+SOURCE_KINDS = {"picam": PicameraSource, "video": VideoSource, "folder": FolderSource}
+UNSAFE_ID = re.compile(r'[^A-Za-z0-9_.-]')  # Same rule as the bot's ingestion file names
+
+def safe_camera_id(camera_id):
+    return UNSAFE_ID.sub("_", camera_id)
+
+def parse_source_spec(spec):
+    """Split "[id=]kind:argument" or "kind:argument[=id]" into (kind, argument, camera_id)"""
+    head, _, argument = spec.strip().partition(":")
+    camera_id, _, kind = head.rpartition("=")
+    # A trailing "=id" can't be told apart from a URL query string, so URLs only take the prefix
+    if not camera_id and "=" in argument and "://" not in argument:
+        argument, _, camera_id = argument.rpartition("=")
+    return kind, argument, safe_camera_id(camera_id) if camera_id else None
+
+def open_sources(config):
+    """Open every source in a comma-separated config string"""
+    opened = []
+    for spec in config.split(","):
+        if not spec.strip():
+            continue
+        kind, argument, camera_id = parse_source_spec(spec)
+        if kind not in SOURCE_KINDS:
+            raise ValueError(f"Unknown camera source kind: {kind}")
+        if kind == "picam":
+            source = PicameraSource(int(argument or 0), camera_id)
+        else:
+            source = SOURCE_KINDS[kind](argument, camera_id)
+        source.camera_id = safe_camera_id(source.camera_id)  # Default ids come from paths and URLs
+        opened.append(source)
+        print(f"Opened camera source {source.camera_id} ({spec.strip()})")
+    ids = [source.camera_id for source in opened]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Camera ids must be unique: {ids}")
+    return opened
+
+class FairScheduler:
+    """
+    Choose which sources join each inference batch.
+
+    The batch shrinks when a batch takes longer than the latency budget (CPU
+    pressure) and grows back when there is headroom. Sources that waited the
+    longest are served first, so every camera gets a fair share of slots.
+    """
+    def __init__(self, camera_ids, max_batch=4, batch_budget=2.0):
+        self.camera_ids = list(camera_ids)
+        self.max_batch = max(1, min(max_batch, len(self.camera_ids)))
+        self.batch_size = self.max_batch
+        self.batch_budget = batch_budget
+        self.waiting = {camera_id: 0 for camera_id in self.camera_ids}
+        self.served = {camera_id: 0 for camera_id in self.camera_ids}
+
+    def next_batch(self):
+        """Return the camera ids to capture and infer on in this round"""
+        # Longest-waiting first; ties keep configuration order
+        ranked = sorted(self.camera_ids, key=lambda camera_id: -self.waiting[camera_id])
+        chosen = ranked[:self.batch_size]
+        for camera_id in self.camera_ids:
+            if camera_id in chosen:
+                self.waiting[camera_id] = 0
+                self.served[camera_id] += 1
+            else:
+                self.waiting[camera_id] += 1
+        return chosen
+
+    def report(self, batch_seconds):
+        """Adapt the batch size to the observed batch latency"""
+        if batch_seconds > self.batch_budget and self.batch_size > 1:
+            self.batch_size -= 1
+            print(f"Batch took {batch_seconds:.2f}s, reducing batch to {self.batch_size} cameras")
+        elif batch_seconds < self.batch_budget * 0.6 and self.batch_size < self.max_batch:
+            self.batch_size += 1
+            print(f"Batch took {batch_seconds:.2f}s, increasing batch to {self.batch_size} cameras")
@@ -0,0 +1,45 @@
+import os
+import socket
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import liveview
+
+def open_stream(port):
+    connection = socket.create_connection(("127.0.0.1", port), timeout=5)
+    connection.sendall(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    headers = b""
+    while b"\r\n\r\n" not in headers:
+        headers += connection.recv(1024)
+    return connection, headers.split(b"\r\n\r\n", 1)[1]
+
+def test_stream_waits_for_first_frame():
+    view = liveview.LiveView(size=(64, 36))
+    calls = []
+    latest_jpeg = view.latest_jpeg
+    view.latest_jpeg = lambda: calls.append(1) or latest_jpeg()
+    server = liveview.start_server(view, 0, host="127.0.0.1")
+    try:
+        connection, body = open_stream(server.server_address[1])
+        time.sleep(0.5)
+        # Blocked in wait_for_frame: nothing sent and no polling of the empty view
+        assert view.viewers == 1
+        assert calls == []
+        connection.settimeout(0.2)
+        try:
+            body += connection.recv(1024)
+        except socket.timeout:
+            pass
+        assert body == b""
+
+        view.publish(np.zeros((72, 128, 3), np.uint8))
+        connection.settimeout(5)
+        while b"\r\n\r\n" not in body:
+            body += connection.recv(4096)
+        assert body.startswith(f"--{liveview.BOUNDARY}\r\nContent-Type: image/jpeg".encode("ascii"))
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
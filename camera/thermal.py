@@ -0,0 +1,190 @@
+import os
+import sys
+
+# Shared helpers (metrics) live next to the bot
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import metrics
+
+# Thermal- and load-aware tuning of the detector. After every burst the
+# controller looks at the CPU temperature, the load average and the measured
+# inference latency, and moves one setting one step at a time within bounds:
+# under pressure it first lowers the YOLO input size, then shortens the burst,
+# then lengthens the pause between bursts; with headroom it undoes those steps
+# in reverse order. Every change is logged.
+#   python thermal.py        simulated hot afternoon with a throttling Pi
+
+IMGSZ_STEPS = (320, 384, 448, 512, 576, 640)  # Multiples of YOLO's 32-pixel stride
+BURST_BOUNDS = (2, 5)          # Frames per camera per burst
+INTERVAL_BOUNDS = (20, 60)     # Seconds between bursts
+INTERVAL_STEP = 10
+TARGET_LATENCY = 1.5           # Seconds per inference batch
+TEMP_HOT = 75.0                # The Pi starts throttling at 80°C
+TEMP_COOL = 65.0
+LOAD_HIGH = 0.9                # 1-minute load average per CPU
+COOLDOWN_BURSTS = 2            # Bursts to wait after a change before judging it
+SMOOTHING = 0.5                # Weight of the newest latency in the moving average
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+CPU_TEMPERATURE = metrics.gauge("wilddetect_cpu_temperature_celsius", "SoC temperature")
+CPU_LOAD = metrics.gauge("wilddetect_cpu_load_per_core", "1-minute load average per CPU")
+DETECTOR_SETTING = metrics.gauge("wilddetect_detector_setting", "Current adaptive detector settings")
+DETECTOR_ADJUSTMENTS = metrics.counter("wilddetect_detector_adjustments_total", "Adaptive detector changes by setting and direction")
+
+class SystemSensor:
+    """CPU temperature from sysfs and load average from the OS"""
+    def __init__(self, zone_path=THERMAL_ZONE):
+        self.zone_path = zone_path
+
+    def read(self):
+        """(temperature in °C or None, load average per CPU)"""
+        temperature = None
+        try:
+            with open(self.zone_path) as zone:
+                temperature = int(zone.read().strip()) / 1000
+        except (OSError, ValueError):
+            pass
+        return temperature, os.getloadavg()[0] / (os.cpu_count() or 1)
+
+    def record_work(self, busy_seconds, elapsed_seconds):
+        pass  # Real hardware heats up on its own
+
+class SimulatedSensor:
+    """
+    First-order thermal model of a Pi in an enclosure, for testing.
+
+    The temperature moves toward ambient plus heat proportional to how busy
+    the CPU was, so heavier settings heat it up and lighter ones let it cool.
+    """
+    def __init__(self, ambient=40.0, heat_at_full_load=50.0, time_constant=120.0):
+        self.ambient = ambient
+        self.heat_at_full_load = heat_at_full_load
+        self.time_constant = time_constant
+        self.temperature = ambient
+        self.load = 0.0
+
+    def record_work(self, busy_seconds, elapsed_seconds):
+        """Advance the model by one burst cycle"""
+        self.load = min(1.0, busy_seconds / max(elapsed_seconds, 1e-6))
+        target = self.ambient + self.heat_at_full_load * self.load
+        self.temperature += (target - self.temperature) * min(1.0, elapsed_seconds / self.time_constant)
+
+    def read(self):
+        return self.temperature, self.load
+
+class AdaptiveController:
+    """Keep inference latency near a target by trading resolution, burst length and interval"""
+    def __init__(self, sensor, target_latency=TARGET_LATENCY, imgsz_steps=IMGSZ_STEPS,
+                 burst_bounds=BURST_BOUNDS, interval_bounds=INTERVAL_BOUNDS, log=print):
+        self.sensor = sensor
+        self.target_latency = target_latency
+        self.imgsz_steps = tuple(sorted(imgsz_steps))
+        self.burst_bounds = burst_bounds
+        self.interval_bounds = interval_bounds
+        self.log = log
+        self.imgsz_index = len(self.imgsz_steps) - 1
+        self.burst_frames = burst_bounds[1]
+        self.interval = interval_bounds[0]
+        self.latency = None
+        self.samples = []
+        self.cooldown = 0
+        self.publish()
+
+    @property
+    def imgsz(self):
+        return self.imgsz_steps[self.imgsz_index]
+
+    def publish(self):
+        DETECTOR_SETTING.set(self.imgsz, setting="imgsz")
+        DETECTOR_SETTING.set(self.burst_frames, setting="burst_frames")
+        DETECTOR_SETTING.set(self.interval, setting="interval")
+
+    def observe(self, batch_latency):
+        """Record the latency of one inference batch of the current burst"""
+        self.samples.append(batch_latency)
+
+    def update(self, batch_latency=None):
+        """Judge the last burst (its mean observed latency by default); returns True if a setting changed"""
+        if batch_latency is None and self.samples:
+            batch_latency = sum(self.samples) / len(self.samples)
+        self.samples = []
+        if batch_latency is not None:
+            self.latency = batch_latency if self.latency is None else SMOOTHING * batch_latency + (1 - SMOOTHING) * self.latency
+        temperature, load = self.sensor.read()
+        if temperature is not None:
+            CPU_TEMPERATURE.set(temperature)
+        CPU_LOAD.set(load)
+
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+
+        reasons = []
+        if temperature is not None and temperature >= TEMP_HOT:
+            reasons.append(f"temperature {temperature:.1f}°C")
+        if self.latency is not None and self.latency > self.target_latency * 1.2:
+            reasons.append(f"latency {self.latency:.2f}s")
+        if load > LOAD_HIGH:
+            reasons.append(f"load {load:.2f}")
+        if reasons:
+            return self.degrade(", ".join(reasons))
+
+        cool = temperature is None or temperature <= TEMP_COOL
+        fast = self.latency is None or self.latency < self.target_latency * 0.7
+        if cool and fast and load < LOAD_HIGH * 0.7:
+            shown = f"{temperature:.1f}°C" if temperature is not None else "n/a"
+            return self.restore(f"temperature {shown}, latency {self.latency or 0:.2f}s, load {load:.2f}")
+        return False
+
+    def degrade(self, reason):
+        """One step lighter: input size, then burst length, then interval"""
+        if self.imgsz_index > 0:
+            return self.change("imgsz", self.imgsz, self.imgsz_steps[self.imgsz_index - 1], reason, "down")
+        if self.burst_frames > self.burst_bounds[0]:
+            return self.change("burst_frames", self.burst_frames, self.burst_frames - 1, reason, "down")
+        if self.interval < self.interval_bounds[1]:
+            return self.change("interval", self.interval, min(self.interval + INTERVAL_STEP, self.interval_bounds[1]), reason, "down")
+        return False
+
+    def restore(self, reason):
+        """One step heavier, undoing degradations in reverse order"""
+        if self.interval > self.interval_bounds[0]:
+            return self.change("interval", self.interval, max(self.interval - INTERVAL_STEP, self.interval_bounds[0]), reason, "up")
+        if self.burst_frames < self.burst_bounds[1]:
+            return self.change("burst_frames", self.burst_frames, self.burst_frames + 1, reason, "up")
+        if self.imgsz_index < len(self.imgsz_steps) - 1:
+            return self.change("imgsz", self.imgsz, self.imgsz_steps[self.imgsz_index + 1], reason, "up")
+        return False
+
+    def change(self, setting, old, new, reason, direction):
+        if setting == "imgsz":
+            self.imgsz_index = self.imgsz_steps.index(new)
+        else:
+            setattr(self, setting, new)
+        # A new input size makes the old latency average meaningless
+        self.latency = None if setting == "imgsz" else self.latency
+        self.cooldown = COOLDOWN_BURSTS
+        self.publish()
+        DETECTOR_ADJUSTMENTS.inc(setting=setting, direction=direction)
+        self.log(f"Adaptive detector: {setting} {old} -> {new} ({reason})")
+        return True
+
+if __name__ == "__main__":
+    # Simulated afternoon: the enclosure heats from 40°C to 55°C ambient and back.
+    # Latency grows with input size squared and doubles once the Pi throttles.
+    sensor = SimulatedSensor(ambient=40.0)
+    controller = AdaptiveController(sensor, log=lambda line: print(f"  [{clock:5.0f}s] {line}"))
+    clock = 0.0
+    latencies = []
+    for burst in range(120):
+        sensor.ambient = 40.0 + 15.0 * min(1.0, burst / 40) * (1 if burst < 80 else max(0.0, (120 - burst) / 40))
+        throttle = 2.0 if sensor.temperature >= 80.0 else 1.0
+        batch_latency = 1.2 * (controller.imgsz / 640) ** 2 * throttle
+        busy = batch_latency * controller.burst_frames
+        elapsed = controller.interval + busy
+        sensor.record_work(busy * 4, elapsed)  # Capture, encode and the bot add to the load
+        latencies.append(batch_latency)
+        controller.update(batch_latency)
+        clock += elapsed
+    temperature, load = sensor.read()
+    print(f"After {clock / 60:.0f} simulated minutes: imgsz {controller.imgsz}, burst {controller.burst_frames}, "
+          f"interval {controller.interval}s, {temperature:.1f}°C, max batch latency {max(latencies):.2f}s")
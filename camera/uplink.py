@@ -0,0 +1,44 @@
+import base64
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Client side of the bot's detection ingestion endpoint (src/ingest.py), used
+# by camera nodes that don't run a bot of their own. Retries reuse the same
+# event id, so the bot drops copies of a request that did arrive.
+
+RETRIES = 3
+RETRY_BACKOFF = 2.0  # Seconds, doubled on every retry
+TIMEOUT = 10
+
+def post_detection(url, node_id, meta, image_bytes, token=None, retries=RETRIES, timeout=TIMEOUT):
+    """POST one detection and return the bot's status ("queued", "duplicate", ...) or None"""
+    event = dict(meta, node_id=node_id, image=base64.b64encode(image_bytes).decode("ascii"))
+    event.setdefault("event_id", f"{meta.get('camera', 'cam')}-{time.time_ns()}")
+    body = json.dumps(event).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    for attempt in range(retries):
+        try:
+            request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read().decode("utf-8")).get("status")
+        except urllib.error.HTTPError as e:
+            # The bot rejected the event itself; sending it again won't help
+            print(f"Ingestion rejected {event['event_id']}: {e.code} {e.read().decode('utf-8', 'replace')}")
+            return None
+        except (urllib.error.URLError, OSError) as e:
+            if attempt == retries - 1:
+                print(f"Error posting detection {event['event_id']} to {url}: {e}")
+                return None
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+def post_in_background(url, node_id, meta, image_bytes, token=None):
+    """Post without holding up the capture loop"""
+    thread = threading.Thread(target=post_detection, args=(url, node_id, meta, image_bytes, token), daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,143 @@
+import collections
+import json
+import os
+import threading
+import time
+import cv2
+import metrics
+
+# Background JPEG encode/write stage so the capture loop never waits on the SD
+# card. Jobs go to a bounded queue served by a few threads (cv2.imencode
+# releases the GIL); when the queue is full the oldest pending job is dropped.
+# Files are written to a temporary name, fsynced and renamed into place, so the
+# bot never picks up a half-written photo.
+
+JPEG_QUALITY = 95   # cv2.imwrite's default
+WORKERS = 2
+QUEUE_SIZE = 4
+
+WRITER_QUEUE = metrics.gauge("wilddetect_writer_queue_depth", "Photos waiting to be encoded and written")
+WRITER_SECONDS = metrics.histogram("wilddetect_writer_seconds", "Photo encode and write time by stage")
+WRITER_OVERFLOWS = metrics.counter("wilddetect_writer_overflows_total", "Photos submitted while the write queue was full")
+WRITER_DROPPED = metrics.counter("wilddetect_writer_dropped_total", "Photos never written by reason")
+WRITER_BYTES = metrics.counter("wilddetect_writer_bytes_total", "JPEG bytes written")
+
+def write_atomic(path, data, fsync=True):
+    """Write to a hidden temporary file, fsync it and rename it over `path`"""
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.tmp")
+    with open(temp_path, "wb") as temp_file:
+        temp_file.write(data)
+        if fsync:
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+    os.replace(temp_path, path)
+    if fsync:
+        # Persist the rename itself
+        directory_fd = os.open(directory or ".", os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+class WriteJob:
+    def __init__(self, path, frame, meta, meta_path, on_done):
+        self.path = path
+        self.frame = frame
+        self.meta = meta
+        self.meta_path = meta_path
+        self.on_done = on_done
+        self.submitted_at = time.perf_counter()
+
+class JpegWriter:
+    """Bounded, threaded JPEG encoder and atomic file writer"""
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, quality=JPEG_QUALITY, fsync=True):
+        self.quality = quality
+        self.fsync = fsync
+        self.queue_size = queue_size
+        self.jobs = collections.deque()
+        self.condition = threading.Condition()
+        self.busy = 0
+        self.closed = False
+        self.threads = [threading.Thread(target=self._worker, name=f"jpeg-writer-{i}", daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, path, frame, meta=None, meta_path=None, on_done=None):
+        """
+        Queue a frame to be saved; the writer takes ownership of `frame`.
+
+        The sidecar `meta` (if any) is written before the photo. `on_done(path,
+        jpeg_bytes, meta)` runs on the writer thread after the photo is in place.
+        Returns False when the writer is closed.
+        """
+        with self.condition:
+            if self.closed:
+                WRITER_DROPPED.inc(reason="closed")
+                return False
+            if len(self.jobs) >= self.queue_size:
+                # Newer detections are more useful than older ones still waiting
+                WRITER_OVERFLOWS.inc()
+                dropped = self.jobs.popleft()
+                WRITER_DROPPED.inc(reason="overflow")
+                print(f"Write queue full, dropped {dropped.path}")
+            self.jobs.append(WriteJob(path, frame, meta, meta_path, on_done))
+            WRITER_QUEUE.set(len(self.jobs))
+            self.condition.notify()
+        return True
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.jobs and not self.closed:
+                    self.condition.wait()
+                if not self.jobs:
+                    return
+                job = self.jobs.popleft()
+                self.busy += 1
+                WRITER_QUEUE.set(len(self.jobs))
+            try:
+                self._write(job)
+            except Exception as e:
+                WRITER_DROPPED.inc(reason="error")
+                print(f"Error writing {job.path}: {e}")
+            finally:
+                with self.condition:
+                    self.busy -= 1
+                    self.condition.notify_all()
+
+    def _write(self, job):
+        with WRITER_SECONDS.time(stage="encode"):
+            ok, encoded = cv2.imencode('.jpg', job.frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        data = encoded.tobytes()
+        with WRITER_SECONDS.time(stage="write"):
+            if job.meta is not None:
+                meta_path = job.meta_path or os.path.splitext(job.path)[0] + ".json"
+                write_atomic(meta_path, json.dumps(job.meta).encode("utf-8"), fsync=False)
+            write_atomic(job.path, data, fsync=self.fsync)
+        WRITER_SECONDS.observe(time.perf_counter() - job.submitted_at, stage="total")
+        WRITER_BYTES.inc(len(data))
+        if job.on_done:
+            job.on_done(job.path, data, job.meta)
+
+    def flush(self, timeout=None):
+        """Wait until every queued photo has been written"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.jobs or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Finish pending writes and stop the threads"""
+        self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
@@ -0,0 +1,91 @@
+import io
+import json
+import os
+from PIL import Image
+
+# Alert encoding: the first notification gets a small, resized JPEG so it goes
+# through quickly on a slow link; the full-resolution original stays in backup.
+
+ALERT_MAX_BYTES = 120 * 1024   # Hard cap for the first notification photo
+ALERT_MAX_SIDE = 1280          # Longest side after resizing, in pixels
+ALERT_QUALITY_RANGE = (40, 85) # JPEG quality search bounds (min, max)
+CROP_PADDING = 0.6             # Extra context around the box, as a fraction of its size
+CROP_MIN_SIDE = 320            # Never crop tighter than this, in pixels
+
+def load_detection_meta(photo_path):
+    """Read the camera's sidecar JSON for a detection photo, if present"""
+    meta_path = os.path.splitext(photo_path)[0] + ".json"
+    if not os.path.exists(meta_path):
+        return {}
+    try:
+        with open(meta_path, "r") as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError) as e:
+        print(f"Error reading detection metadata {meta_path}: {e}")
+        return {}
+
+def crop_to_box(image, box):
+    """Crop a padded close-up around a detection box (x1, y1, x2, y2)"""
+    x1, y1, x2, y2 = box
+    pad_x = max((x2 - x1) * CROP_PADDING, (CROP_MIN_SIDE - (x2 - x1)) / 2, 0)
+    pad_y = max((y2 - y1) * CROP_PADDING, (CROP_MIN_SIDE - (y2 - y1)) / 2, 0)
+    left = max(0, int(x1 - pad_x))
+    top = max(0, int(y1 - pad_y))
+    right = min(image.width, int(x2 + pad_x))
+    bottom = min(image.height, int(y2 + pad_y))
+    if right <= left or bottom <= top:
+        return image
+    return image.crop((left, top, right, bottom))
+
+def encode_jpeg(image, quality):
+    """Encode a PIL image as JPEG bytes"""
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+def fit_to_size(image, max_bytes):
+    """Return the highest-quality JPEG encoding of the image that fits in max_bytes"""
+    low, high = ALERT_QUALITY_RANGE
+    while True:
+        # Binary search over quality; fall back to shrinking the image if even the floor is too big
+        best = None
+        lo, hi = low, high
+        while lo <= hi:
+            quality = (lo + hi) // 2
+            data = encode_jpeg(image, quality)
+            if len(data) <= max_bytes:
+                best = data
+                lo = quality + 1
+            else:
+                hi = quality - 1
+        if best is not None:
+            return best
+        if max(image.size) <= 160:
+            return encode_jpeg(image, low)
+        image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.LANCZOS)
+
+def encode_for_alert(photo_path, box=None, crop=False, max_bytes=ALERT_MAX_BYTES, max_side=ALERT_MAX_SIDE):
+    """
+    Produce a size-capped JPEG for the first detection notification.
+
+    Args:
+        photo_path (str): Full-resolution photo written by the camera
+        box (list): Detection box (x1, y1, x2, y2) in photo pixels, if known
+        crop (bool): Send a close-up around the box instead of the whole frame
+        max_bytes (int): Maximum encoded size
+        max_side (int): Maximum length of the longest side
+
+    Returns:
+        bytes: Encoded JPEG, or None if the photo couldn't be read
+    """
+    try:
+        with Image.open(photo_path) as original:
+            image = original.convert("RGB")
+    except (OSError, ValueError) as e:
+        print(f"Error opening photo for alert encoding {photo_path}: {e}")
+        return None
+
+    if crop and box and len(box) >= 4:
+        image = crop_to_box(image, box[:4])
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return fit_to_size(image, max_bytes)
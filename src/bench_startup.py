@@ -0,0 +1,73 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Startup benchmark: process start -> bot handlers registered -> hardware ready.
+# Runs bot.py's import in fresh interpreters without connecting to Telegram.
+#   python bench_startup.py [runs] [--hardware]
+# --hardware uses the real GPIO/DHT devices instead of the simulated backend.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Child process: import the bot exactly as `python bot.py` would, report timestamps
+CHILD_CODE = """
+import time
+import bot
+handlers = len(bot.client.list_event_handlers())
+print("HANDLERS", time.time(), handlers, flush=True)
+bot.hw.wait_ready()
+print("HARDWARE", time.time(), bot.hw.init_times, flush=True)
+"""
+
+def run_once(simulate=True):
+    """Start one bot process and return (seconds to handlers, seconds to hardware, handler count)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["WILDDETECT_SIMULATE"] = "1" if simulate else "0"
+    # The client is never connected, so placeholder credentials are enough
+    env.setdefault("WILDDETECT_API_ID", "1")
+    env.setdefault("WILDDETECT_API_HASH", "benchmark")
+
+    # Run in a scratch directory so the session file and data folders stay out of the tree
+    workdir = tempfile.mkdtemp(prefix="wilddetect_bench_")
+    try:
+        started = time.time()
+        result = subprocess.run([sys.executable, "-c", CHILD_CODE], cwd=workdir, env=env, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Bot import failed:\n{result.stderr}")
+
+    handlers_at = hardware_at = None
+    handler_count = 0
+    for line in result.stdout.splitlines():
+        parts = line.split(maxsplit=2)
+        if parts and parts[0] == "HANDLERS":
+            handlers_at = float(parts[1])
+            handler_count = int(parts[2])
+        elif parts and parts[0] == "HARDWARE":
+            hardware_at = float(parts[1])
+    return handlers_at - started, hardware_at - started, handler_count
+
+def summarize(label, values):
+    """Format min/mean/max for a list of seconds"""
+    return f"{label:<22} min {min(values) * 1000:7.1f} ms   mean {sum(values) / len(values) * 1000:7.1f} ms   max {max(values) * 1000:7.1f} ms"
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 5
+    simulate = "--hardware" not in sys.argv
+
+    handler_times, hardware_times = [], []
+    for i in range(runs):
+        to_handlers, to_hardware, handler_count = run_once(simulate)
+        handler_times.append(to_handlers)
+        hardware_times.append(to_hardware)
+        print(f"Run {i + 1}: handlers ready {to_handlers * 1000:.1f} ms ({handler_count} handlers), hardware ready {to_hardware * 1000:.1f} ms")
+
+    print(f"\nStartup benchmark ({runs} runs, {'simulated' if simulate else 'real'} hardware)")
+    print(summarize("Start -> handlers", handler_times))
+    print(summarize("Start -> hardware", hardware_times))
@@ -1,53 +1,97 @@
 from telethon import TelegramClient, events, Button
 import sqlite3
 import time
-from datetime import datetime
-import requests
+from datetime import datetime, timedelta
 import re
 import os
-import signal
 import asyncio
-import subprocess
-import adafruit_dht
-import board
-from gpiozero import LED, Buzzer, OutputDevice
 import shutil
+import threading
 import zipfile
-
-# Kill any libgpiod_pulsei process to avoid conflicts with DHT sensor in New version of Raspberry Pi OS
-try:
-    pid_output = subprocess.check_output("ps -A | grep libgpiod_pulsei | awk '{print $1}'", shell=True).strip()
-    if pid_output:
-        pid = int(pid_output)
-        os.kill(pid, signal.SIGTERM)
-        print(f"Process with PID {pid} has been killed.")
-    else:
-        print("Process libgpiod_pulsei not found.")
-except subprocess.CalledProcessError:
-    print("Error occurred while retrieving process.")
-
-# Telegram API credentials
-api_id = '' # Your API ID
-api_hash = '' # Your API Hash
-bot_token = '' # Your Bot Token from BotFather
+import rollup
+import alert_image
+import hardware
+import metrics
+import profiler
+import sender
+import ingest
+import outbox
+import feedback
+import subscriptions
+import history
+import urllib.request
+
+# Initialize sensor and GPIO devices in the background (WILDDETECT_SIMULATE=1 for no Pi)
+hw = hardware.Hardware()
+hw.start()
+
+# Telegram API credentials (environment variables override the values below)
+api_id = os.environ.get('WILDDETECT_API_ID', '') # Your API ID
+api_hash = os.environ.get('WILDDETECT_API_HASH', '') # Your API Hash
+bot_token = os.environ.get('WILDDETECT_BOT_TOKEN', '') # Your Bot Token from BotFather
 client = TelegramClient('VAR', api_id, api_hash)
 
+# All outbound sends go through one prioritized, rate-limited queue
+outbound = sender.OutboundScheduler(client)
+
 # Paths
 DB_PATH = "data/users.db"
 STATSDB_PATH = "data/stats.db"
 BACKUP_FOLDER = "./backup"
 PHOTO_PATH = "../ngl"
 
+# Metrics endpoints (bot serves its own, camera.py serves the detector's)
+METRICS_PORT = int(os.environ.get('WILDDETECT_METRICS_PORT', '9100'))
+CAMERA_METRICS_URL = os.environ.get('WILDDETECT_CAMERA_METRICS_URL', 'http://127.0.0.1:9101/metrics')
+
+# Detection ingestion from other camera nodes (0 disables). Without a token it only listens on loopback
+INGEST_PORT = int(os.environ.get('WILDDETECT_INGEST_PORT', '0'))
+INGEST_TOKEN = os.environ.get('WILDDETECT_INGEST_TOKEN', '')
+INGEST_HOST = os.environ.get('WILDDETECT_INGEST_HOST', '0.0.0.0' if INGEST_TOKEN else '127.0.0.1')
+
+DB_SECONDS = metrics.histogram("wilddetect_db_seconds", "SQLite query time by database")
+DB_ERRORS = metrics.counter("wilddetect_db_errors_total", "SQLite errors (e.g. database is locked) by database")
+PICKUP_SECONDS = metrics.histogram("wilddetect_pickup_seconds", "Photo written by camera to broadcast start")
+BROADCAST_SECONDS = metrics.histogram("wilddetect_broadcast_seconds", "Encode, upload and send of one alert to all users")
+TELEGRAM_SECONDS = sender.TELEGRAM_SECONDS
+TELEGRAM_ERRORS = metrics.counter("wilddetect_telegram_errors_total", "Failed Telegram API calls by operation")
+ALERTS_TOTAL = metrics.counter("wilddetect_alerts_total", "Detection alerts broadcast by class")
+ALERT_BYTES = metrics.counter("wilddetect_alert_bytes_total", "Bytes uploaded for detection alerts")
+ALERTS_IN_PROGRESS = metrics.gauge("wilddetect_alerts_in_progress", "Alerts broadcast and still inside the review window")
+CONFIRMATIONS_TOTAL = metrics.counter("wilddetect_confirmations_total", "Detection confirmations by status")
+
+# Alerts that can't be delivered while offline are kept and sent on reconnect
+alert_outbox = outbox.Outbox()
+OUTBOX_CHECK_SECONDS = 30
+
+# Classes farmers keep marking incorrect get a higher threshold or go to a periodic digest
+FEEDBACK_ENABLED = os.environ.get('WILDDETECT_FEEDBACK', '1') == '1'
+alert_feedback = feedback.FeedbackPolicy(STATSDB_PATH, enabled=FEEDBACK_ENABLED)
+
+# Per-user class subscriptions, quiet hours and digest mode (see subscriptions.py)
+subscription_index = subscriptions.SubscriptionIndex()
+
+# Detections not pushed right away (digest mode, quiet hours, held back by feedback) go out as one album per chat
+DIGEST_PATH = "data/digest.db"
+DIGEST_SECONDS = int(os.environ.get('WILDDETECT_DIGEST_SECONDS', '3600'))
+held_alerts = outbox.Outbox(DIGEST_PATH, store="digest")
+
+# Alert encoding settings
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+REVIEW_SECONDS = 60  # How long users have to confirm a detection
+CLIP_WAIT_SECONDS = 30  # How long to wait for the camera's clip of a detection
+ALERT_CROP = False  # Send a close-up of the detection box instead of the whole frame
+BACKUP_LOCK = threading.Lock()  # Entry numbers are allocated by backups running in executor threads
+
 # Ensure directories exist
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 os.makedirs(BACKUP_FOLDER, exist_ok=True)
 
-# Initialize sensor and GPIO devices
-dht_device = adafruit_dht.DHT11(board.D21)
-LED1_PIN = OutputDevice(17)
-LED2_PIN = OutputDevice(18)
-buzzer1 = Buzzer(22)
-buzzer2 = Buzzer(27)
+# GPIO devices; each waits for hardware initialization on first use
+LED1_PIN = hw.led1
+LED2_PIN = hw.led2
+buzzer1 = hw.buzzer1
+buzzer2 = hw.buzzer2
 
 # Current datetime
 current_datetime = datetime.now().strftime("%d/%m/%Y %H:%M")
@@ -61,13 +105,14 @@ password_pattern = re.compile(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$.!]).{5,1
 def db_query(query, params=(), fetchone=False, commit=False):
     """Execute a database query with parameters"""
     try:
-        with sqlite3.connect(DB_PATH) as connection:
+        with DB_SECONDS.time(db="users"), sqlite3.connect(DB_PATH) as connection:
             cursor = connection.cursor()
             cursor.execute(query, params)
             if commit:
                 connection.commit()
             return cursor.fetchone() if fetchone else cursor.fetchall()
     except sqlite3.Error as e:
+        DB_ERRORS.inc(db="users")
         print(f"Database error: {e}")
         # Return appropriate default values
         return None if fetchone else []
@@ -90,6 +135,14 @@ def ensure_tables_exist():
         )
     ''', commit=True)
     
+    # Subscription settings were added after the first release; migrate older user tables in place
+    try:
+        with sqlite3.connect(DB_PATH) as conn:
+            subscriptions.ensure_columns(conn.cursor())
+    except sqlite3.Error as e:
+        print(f"User DB migration error: {e}")
+    load_subscriptions()
+    
     # Create stats table in stats.db if not exists
     try:
         with sqlite3.connect(STATSDB_PATH) as conn:
@@ -124,7 +177,21 @@ def ensure_tables_exist():
                 cursor.execute("INSERT INTO stats (Name) VALUES ('Correct')")
                 cursor.execute("INSERT INTO stats (Name) VALUES ('Incorrect')")
                 cursor.execute("INSERT INTO stats (Name) VALUES ('None')")
-                conn.commit()
+            # Time-bucketed rollups are added alongside existing stats databases
+            rollup.ensure_rollup_tables(cursor)
+            # Backup index with thumbnails for /history
+            history.ensure_history_table(cursor)
+            # Bytes sent per alert versus the original photo size
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS alert_log (
+                    time TEXT,
+                    name TEXT,
+                    original_bytes INTEGER,
+                    sent_bytes INTEGER,
+                    recipients INTEGER
+                )
+            ''')
+            conn.commit()
     except sqlite3.Error as e:
         print(f"Stats DB error: {e}")
 
@@ -146,6 +213,22 @@ def get_user_column(user_id, column):
 def update_user_column(user_id, column, value):
     """Update a specific column for a user"""
     db_query(f"UPDATE user SET {column} = ? WHERE id = ?", (value, user_id), commit=True)
+    if column in subscriptions.INDEXED_COLUMNS:
+        refresh_subscription(user_id)
+
+def load_subscriptions():
+    """Build the in-memory subscription index from logged-in users"""
+    subscription_index.load(db_query(
+        "SELECT id, sub_classes, quiet_hours, alert_mode FROM user WHERE autologin = 'on'"
+    ))
+
+def refresh_subscription(user_id):
+    """Mirror one user's login state and settings into the subscription index"""
+    row = db_query("SELECT autologin, sub_classes, quiet_hours, alert_mode FROM user WHERE id = ?", (user_id,), fetchone=True)
+    if row and row[0] == "on":
+        subscription_index.set(int(user_id), subscriptions.Subscription(*row[1:]))
+    else:
+        subscription_index.remove(int(user_id))
 
 def all_farmer():
     """Get all user IDs with autologin enabled"""
@@ -160,7 +243,7 @@ def role(chat_id):
 def temp():
     """Read temperature from DHT sensor"""
     try:
-        temperature = dht_device.temperature
+        temperature = hw.read_dht("temperature")
         return temperature
     except Exception as error:
         print(f"Error reading temperature: {error}")
@@ -169,7 +252,7 @@ def temp():
 def humid():
     """Read humidity from DHT sensor"""
     try:
-        humidity = dht_device.humidity
+        humidity = hw.read_dht("humidity")
         return humidity
     except Exception as error:
         print(f"Error reading humidity: {error}")
@@ -196,31 +279,56 @@ def get_next_entry_number():
     return 1
 
 def backup_photo(photo_path, detected_name):
-    """Backup a detected photo with details"""
+    """Backup a detected photo with details and return its entry number (blocking: run it in an executor)"""
     if not os.path.exists(BACKUP_FOLDER):
         os.makedirs(BACKUP_FOLDER)
 
     try:
         temperature = temp()
-        formatted_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        entry_number = get_next_entry_number()
-        new_filename = f"{entry_number}_{detected_name}_{formatted_datetime}"
-        backup_file_path = os.path.join(BACKUP_FOLDER, new_filename)
-        
-        # Copy the file to the backup directory
-        shutil.copy(photo_path, backup_file_path)
-        
-        # Record details
-        details = f"[{entry_number}] Detected: {detected_name}, Time: {formatted_datetime}, Temperature: {temperature}\n"
-        details_file_path = os.path.join(BACKUP_FOLDER, "details.txt")
-        
-        with open(details_file_path, "a") as details_file:
-            details_file.write(details)
+        # Concurrent alerts back up in executor threads; the number comes from the last details line
+        with BACKUP_LOCK:
+            backed_up_at = datetime.now()
+            formatted_datetime = backed_up_at.strftime(history.DETAILS_TIME_FORMAT)
+            entry_number = get_next_entry_number()
+            new_filename = f"{entry_number}_{detected_name}_{formatted_datetime}"
+            backup_file_path = os.path.join(BACKUP_FOLDER, new_filename)
             
-        return True
+            # Copy the file to the backup directory
+            shutil.copy(photo_path, backup_file_path)
+            
+            # Record details
+            details = f"[{entry_number}] Detected: {detected_name}, Time: {formatted_datetime}, Temperature: {temperature}\n"
+            details_file_path = os.path.join(BACKUP_FOLDER, "details.txt")
+            
+            with open(details_file_path, "a") as details_file:
+                details_file.write(details)
+            
+        # Index it with a thumbnail so /history never has to open the full-size photos;
+        # the thumbnail is made first so the database is only held for the insert
+        thumb = history.make_thumbnail(backup_file_path)
+        try:
+            with DB_SECONDS.time(db="stats"), sqlite3.connect(STATSDB_PATH) as conn:
+                history.add(conn.cursor(), entry_number, detected_name, backed_up_at, temperature, backup_file_path, thumb)
+        except sqlite3.Error as e:
+            DB_ERRORS.inc(db="stats")
+            print(f"Database error while indexing backup: {e}")
+            
+        return entry_number
     except Exception as e:
         print(f"Error backing up photo: {e}")
-        return False
+        return None
+
+def find_backup_photo(entry_number):
+    """Find the backed-up full-resolution photo for an entry number"""
+    file_name = history.file_for(STATSDB_PATH, entry_number)
+    if file_name and os.path.exists(os.path.join(BACKUP_FOLDER, file_name)):
+        return os.path.join(BACKUP_FOLDER, file_name)
+    # Not indexed (yet): scan the folder
+    prefix = f"{entry_number}_"
+    for file_name in os.listdir(BACKUP_FOLDER):
+        if file_name.startswith(prefix):
+            return os.path.join(BACKUP_FOLDER, file_name)
+    return None
 
 def backup_folder_to_zip(zip_filename):
     """Create a zip backup of the backup folder"""
@@ -470,6 +578,8 @@ async def light_switch(event):
             [Button.inline("🔊 Buzzer", data="buzzerswitch"), Button.inline(get_user_column(chat_id, "buzzersen"), data="buzzerswitch")],
             [Button.inline("🔃 Refresh", data="refresh"), Button.inline("📩 Logout", data="logout")]
         ])
+    except hardware.DeviceNotReady:
+        await event.answer("⏳ Lights are still initializing, try again in a moment", alert=True)
     except Exception as e:
         print(f"Error toggling lights: {e}")
         await event.answer("❌ Error toggling lights!", alert=True)
@@ -498,6 +608,8 @@ async def buzzer_switch(event):
             [Button.inline("🔊 Buzzer", data="buzzerswitch"), Button.inline(get_user_column(chat_id, "buzzersen"), data="buzzerswitch")],
             [Button.inline("🔃 Refresh", data="refresh"), Button.inline("📩 Logout", data="logout")]
         ])
+    except hardware.DeviceNotReady:
+        await event.answer("⏳ Buzzer is still initializing, try again in a moment", alert=True)
     except Exception as e:
         print(f"Error toggling buzzer: {e}")
         await event.answer("❌ Error toggling buzzer!", alert=True)
@@ -539,34 +651,61 @@ def extract_filename(filepath):
     filename_without_extension = os.path.splitext(os.path.basename(filepath))[0]
     return filename_without_extension.split('\\')[-1]
 
-async def send_detection_photo_to_all(photo_path, chat_ids):
-    """Send detection notification to all users and handle responses"""
-    if not os.path.exists(photo_path):
-        print(f"Photo path doesn't exist: {photo_path}")
+def alert_photo_bytes(photo_path, box):
+    """Size-capped alert JPEG, or the original bytes if it can't be encoded (blocking: run in an executor)"""
+    alert_bytes = alert_image.encode_for_alert(photo_path, box=box, crop=ALERT_CROP)
+    if alert_bytes is None:
+        with open(photo_path, "rb") as photo_file:
+            alert_bytes = photo_file.read()
+    return alert_bytes
+
+def alert_buttons(detected_name, entry_number):
+    """Confirmation buttons, plus the full-image button when the original was backed up"""
+    buttons = [[
+        Button.inline("❌ No", data=f"incorrect_{detected_name}"),
+        Button.inline("✅ Yes", data=f"correct_{detected_name}")
+    ]]
+    if entry_number is not None:
+        buttons.append([Button.inline("🖼 Full image", data=f"full_{entry_number}")])
+    return buttons
+
+async def send_detection_clip(clip_path, message_info, not_before):
+    """Send a detection's video clip as a reply to each alert message"""
+    deadline = time.monotonic() + CLIP_WAIT_SECONDS
+    # An older clip with the same name may still be there; wait for one newer than the photo
+    while not (os.path.exists(clip_path) and os.path.getmtime(clip_path) >= not_before):
+        if time.monotonic() > deadline:
+            print(f"No clip arrived for {clip_path}")
+            return
+        await asyncio.sleep(1)
+
+    try:
+        # Clips are big: upload through the queue so live alerts go first
+        clip_file = await outbound.upload_file(clip_path, priority=sender.PRIORITY_EXPORT)
+    except Exception as e:
+        TELEGRAM_ERRORS.inc(op="upload")
+        print(f"Error uploading clip {clip_path}: {e}")
         return
-        
-    detected_name = extract_filename(photo_path)
-    formatted_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    message_info = {}
 
-    # Send to all users
-    for chat_id in chat_ids:
+    async def send_clip(message_id, chat_id):
         try:
-            message = await client.send_file(
-                chat_id, photo_path,
-                caption=f"🕵🏻‍♂️ Detected as: {detected_name} \n📆 Time and Date: {formatted_datetime} \n️⚠️ Is this information correct?",
-                buttons=[
-                    Button.inline("❌ No", data=f"incorrect_{detected_name}"),
-                    Button.inline("✅ Yes", data=f"correct_{detected_name}")
-                ]
+            await outbound.send_file(
+                chat_id, clip_file,
+                priority=sender.PRIORITY_CONFIRMATION,
+                caption="🎞 Clip of this detection",
+                reply_to=message_id,
+                supports_streaming=True
             )
-            message_info[message.id] = chat_id  # Track message_id and chat_id
         except Exception as e:
-            print(f"Error sending file to {chat_id}: {e}")
+            TELEGRAM_ERRORS.inc(op="clip")
+            print(f"Error sending clip to {chat_id}: {e}")
 
-    # Update detection stats
+    await asyncio.gather(*(send_clip(message_id, chat_id) for message_id, chat_id in message_info.items()))
+
+def record_detection_stats(detected_name, formatted_datetime, original_bytes, sent_bytes, recipients):
+    """Count a detection in the stats and rollups and log what its alert sent"""
     try:
-        with sqlite3.connect(STATSDB_PATH) as conn:
+        with DB_SECONDS.time(db="stats"), sqlite3.connect(STATSDB_PATH) as conn:
             cursor = conn.cursor()
             # Check if the column exists
             cursor.execute(f"PRAGMA table_info(stats)")
@@ -574,27 +713,144 @@ async def send_detection_photo_to_all(photo_path, chat_ids):
             
             if detected_name in columns:
                 cursor.execute(f"UPDATE stats SET {detected_name} = {detected_name} + 1 WHERE Name = 'Detected'")
+                rollup.record(cursor, detected_name, 'Detected')
             else:
                 print(f"Column {detected_name} doesn't exist in stats table")
+            cursor.execute(
+                "INSERT INTO alert_log (time, name, original_bytes, sent_bytes, recipients) VALUES (?, ?, ?, ?, ?)",
+                (formatted_datetime, detected_name, original_bytes, sent_bytes, recipients)
+            )
     except sqlite3.Error as e:
+        DB_ERRORS.inc(db="stats")
         print(f"Database error while updating stats: {e}")
-    
-    # Backup photo
-    backup_photo(photo_path, detected_name)
+
+async def send_detection_photo_to_all(photo_path, chat_ids):
+    """Send detection notification to all users and handle responses"""
+    if not os.path.exists(photo_path):
+        print(f"Photo path doesn't exist: {photo_path}")
+        return
+        
+    meta = alert_image.load_detection_meta(photo_path)
+    detected_name = meta.get("class") or extract_filename(photo_path)
+    camera_name = "/".join(str(meta[key]) for key in ("node", "camera") if meta.get(key))
+    camera_line = f"📷 Camera: {camera_name} \n" if camera_name else ""
+    formatted_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    message_info = {}
+    photo_mtime = os.path.getmtime(photo_path)
+    PICKUP_SECONDS.observe(max(0, time.time() - photo_mtime))
+    broadcast_started = time.perf_counter()
+
+    # Backup first so the full-resolution original can be fetched on demand
+    entry_number = await asyncio.get_event_loop().run_in_executor(None, backup_photo, photo_path, detected_name)
+
+    # Encode a small alert photo and upload it once for all recipients
+    original_bytes = os.path.getsize(photo_path)
+    # Resizing and the quality search take long enough to stall every handler, so keep them off the loop
+    alert_bytes = await asyncio.get_event_loop().run_in_executor(None, alert_photo_bytes, photo_path, meta.get("box"))
+    sent_bytes = len(alert_bytes)
+    caption = f"🕵🏻‍♂️ Detected as: {detected_name} \n{camera_line}📆 Time and Date: {formatted_datetime} \n️⚠️ Is this information correct?"
+
+    # Subscribers get it now or in their next digest; others not at all
+    chat_ids, digest_chats = subscription_index.route(detected_name, chat_ids)
+
+    # Classes with poor confirmation precision wait for the digest: no upload now, no review, no deterrents
+    route, reason = alert_feedback.decide(detected_name, meta.get("score"))
+    if route == "digest":
+        print(f"Alert for {detected_name} held for the digest ({reason})")
+        chat_ids, digest_chats = [], chat_ids + digest_chats
+    else:
+        tracker.record_alert(detected_name)  # This detection may trigger deterrents
+    if digest_chats:
+        try:
+            held_alerts.add(detected_name, caption, alert_bytes, digest_chats, entry=entry_number)
+        except sqlite3.Error as e:
+            print(f"Database error while holding alert for the digest: {e}")
+    if not chat_ids:
+        record_detection_stats(detected_name, formatted_datetime, original_bytes, 0, 0)
+        return
+
+    offline_chats = []
+    try:
+        with TELEGRAM_SECONDS.time(op="upload"):
+            alert_file = await client.upload_file(alert_bytes, file_name=f"{detected_name}.jpg")
+        ALERT_BYTES.inc(sent_bytes)
+    except Exception as e:
+        if not outbox.is_offline_error(e):
+            raise
+        # Offline: nobody gets the live alert, so everyone gets it from the outbox later
+        TELEGRAM_ERRORS.inc(op="upload")
+        print(f"Telegram unreachable, alert for {detected_name} queued in the outbox: {e}")
+        alert_file = None
+        offline_chats = list(chat_ids)
+
+    buttons = alert_buttons(detected_name, entry_number)
+
+    # Send to all users; the outbound queue paces them within Telegram's limits
+    async def send_alert(chat_id):
+        try:
+            message = await outbound.send_file(
+                chat_id, alert_file,
+                priority=sender.PRIORITY_ALERT,
+                caption=caption,
+                buttons=buttons
+            )
+            message_info[message.id] = chat_id  # Track message_id and chat_id
+        except Exception as e:
+            TELEGRAM_ERRORS.inc(op="send_file")
+            print(f"Error sending file to {chat_id}: {e}")
+            if outbox.is_offline_error(e):
+                offline_chats.append(chat_id)
+
+    if alert_file is not None:
+        await asyncio.gather(*(send_alert(chat_id) for chat_id in chat_ids))
+    if offline_chats:
+        try:
+            alert_outbox.add(detected_name, caption, alert_bytes, offline_chats, entry=entry_number)
+        except sqlite3.Error as e:
+            print(f"Database error while queueing alert in the outbox: {e}")
+
+    # The camera writes the clip after its post-roll; send it as a reply once it's there
+    if meta.get("clip") and message_info:
+        clip_path = os.path.join(os.path.dirname(photo_path), os.path.basename(meta["clip"]))
+        task = asyncio.ensure_future(send_detection_clip(clip_path, dict(message_info), photo_mtime))
+        alert_tasks.add(task)
+        task.add_done_callback(alert_tasks.discard)
+    BROADCAST_SECONDS.observe(time.perf_counter() - broadcast_started)
+    ALERTS_TOTAL.inc(name=detected_name)
+    print(f"Alert for {detected_name}: sent {sent_bytes} of {original_bytes} bytes to {len(message_info)} users")
+
+    # Update detection stats
+    record_detection_stats(detected_name, formatted_datetime, original_bytes, sent_bytes, len(message_info))
     
     # Wait for 60 seconds for responses
-    await asyncio.sleep(60)
+    ALERTS_IN_PROGRESS.inc()
+    try:
+        await asyncio.sleep(REVIEW_SECONDS)
+    finally:
+        ALERTS_IN_PROGRESS.dec()
     
+    # Notices to different chats are sent concurrently; each chat's delete+send stays in order
+    async def notify_no_response(chat_id, message_id):
+        try:
+            await outbound.delete_messages(chat_id, message_id, priority=sender.PRIORITY_CONFIRMATION)
+            await outbound.send_message(chat_id, "⚠️ We did a detection, but you didn't choose if it's correct or not.", priority=sender.PRIORITY_CONFIRMATION)
+        except Exception as e:
+            TELEGRAM_ERRORS.inc(op="review")
+            print(f"Error sending no-response notice to {chat_id}: {e}")
+
     # Handle responses and message deletion
+    notices = []
     for message_id, chat_id in message_info.items():
         try:
             # Fetch the message
-            message = await client.get_messages(chat_id, ids=message_id)
+            with TELEGRAM_SECONDS.time(op="get_messages"):
+                message = await client.get_messages(chat_id, ids=message_id)
                      
             # Check if the message has no responses (buttons clicked)
             if message and hasattr(message, 'button_count') and message.button_count > 0:
+                CONFIRMATIONS_TOTAL.inc(status="None")
                 try:
-                    with sqlite3.connect(STATSDB_PATH) as conn:
+                    with DB_SECONDS.time(db="stats"), sqlite3.connect(STATSDB_PATH) as conn:
                         cursor = conn.cursor()
                         # Check if the column exists
                         cursor.execute(f"PRAGMA table_info(stats)")
@@ -602,13 +858,16 @@ async def send_detection_photo_to_all(photo_path, chat_ids):
                         
                         if detected_name in columns:
                             cursor.execute(f"UPDATE stats SET {detected_name} = {detected_name} + 1 WHERE Name = 'None'")
+                            rollup.record(cursor, detected_name, 'None')
                 except sqlite3.Error as e:
+                    DB_ERRORS.inc(db="stats")
                     print(f"Database error while updating None stats: {e}")
 
-                await client.delete_messages(chat_id, message_id)
-                await client.send_message(chat_id, "⚠️ We did a detection, but you didn't choose if it's correct or not.")
+                notices.append(notify_no_response(chat_id, message_id))
         except Exception as e:
+            TELEGRAM_ERRORS.inc(op="review")
             print(f"Error handling message response for {chat_id}: {e}")
+    await asyncio.gather(*notices)
 
 @client.on(events.CallbackQuery(data=re.compile(b"(correct|incorrect)_")))
 async def detection_result(event):
@@ -618,7 +877,7 @@ async def detection_result(event):
         confirmation, detected_name = data.split("_", 1)
         
         # Update stats more efficiently with parameter substitution
-        with sqlite3.connect(STATSDB_PATH) as conn:
+        with DB_SECONDS.time(db="stats"), sqlite3.connect(STATSDB_PATH) as conn:
             cursor = conn.cursor()
             # Validate column exists before updating
             cursor.execute("PRAGMA table_info(stats)")
@@ -626,8 +885,11 @@ async def detection_result(event):
             
             if detected_name in columns:
                 status = 'Correct' if confirmation == "correct" else 'Incorrect'
+                CONFIRMATIONS_TOTAL.inc(status=status)
                 cursor.execute(f"UPDATE stats SET {detected_name} = {detected_name} + 1 WHERE Name = ?", (status,))
+                rollup.record(cursor, detected_name, status)
                 conn.commit()
+                alert_feedback.invalidate()
             else:
                 print(f"Warning: Column {detected_name} not found in stats table")
         
@@ -638,17 +900,38 @@ async def detection_result(event):
         print(f"Error in detection callback: {e}")
         await event.answer("An error occurred processing your response", alert=True)
 
+@client.on(events.CallbackQuery(data=re.compile(b"full_")))
+async def send_full_image(event):
+    """Send the full-resolution original of a detection on request"""
+    try:
+        entry_number = int(event.data.decode("utf-8").split("_", 1)[1])
+        backup_path = find_backup_photo(entry_number)
+        if not backup_path:
+            await event.answer("❌ Original image is no longer available", alert=True)
+            return
+            
+        await event.answer("📤 Sending full-resolution image...")
+        original = await outbound.upload_file(backup_path, priority=sender.PRIORITY_EXPORT, file_name=f"{os.path.basename(backup_path)}.jpg")
+        await outbound.send_file(event.chat_id, original, priority=sender.PRIORITY_CONFIRMATION, force_document=True, caption=f"🖼 Original of detection #{entry_number}")
+    except Exception as e:
+        print(f"Error sending full image: {e}")
+        await event.answer("An error occurred sending the full image", alert=True)
+
 # More efficient tracking with class-based approach
 class DetectionTracker:
     def __init__(self):
-        self.last_processed = {
-            "Bull": 0, "Nilgai": 0, "Pig": 0, "Peacock": 0,
-            "Squirrel": 0, "Jackal": 0, "Cat": 0, "Dog": 0,
-            "Goat": 0, "Mouse": 0, "Insect": 0, "Person": 0,
-            "Elephant": 0, "Monkey": 0, "Bird": 0, "Unknown": 0
-        }
+        self.last_processed = dict.fromkeys(subscriptions.CLASSES, 0)
         # Targeting animals that require action
         self.target_animals = {"Nilgai", "Pig", "Jackal", "Person"}
+        # Detections alerted (not held for the digest) since the action monitor last looked
+        self.alerted = {}
+
+    def record_alert(self, name):
+        self.alerted[name] = self.alerted.get(name, 0) + 1
+
+    def take_alerted(self, name):
+        """True if any detection of the class was alerted since the last call"""
+        return self.alerted.pop(name, 0) > 0
 
 tracker = DetectionTracker()
 
@@ -687,6 +970,14 @@ async def action_per_detection():
                     # Update the tracking counter first to prevent duplicate actions
                     tracker.last_processed[animal_name] = animal_count
                     
+                    # No deterrents when every new detection was held back because the class is often wrong
+                    if not tracker.take_alerted(animal_name):
+                        print(f"Skipping action for {animal_name}: held for the digest")
+                        continue
+                    if not hw.gpio_ready():
+                        print(f"Skipping action for {animal_name}: actuators still initializing")
+                        continue
+                    
                     # Take action based on detected animal
                     if animal_name in ("Nilgai", "Pig", "Jackal"):
                         print(f"Taking deterrent action for {animal_name}")
@@ -712,6 +1003,91 @@ async def action_per_detection():
             print(f"Error in action monitoring: {e}")
             await asyncio.sleep(30)  # Longer sleep on error to prevent rapid retries
 
+# Notification settings for logged-in users
+SUBSCRIPTION_HELP = (
+    "/subscribe - Show your notification settings\n"
+    "/subscribe all | <class> ... | +<class> -<class> - Choose which classes alert you\n"
+    "/quiet 22-6 | off - No pushes during these hours; detections wait for the digest\n"
+    "/mode instant | digest - Digest bundles non-urgent detections into one album per "
+    f"{DIGEST_SECONDS // 60} minutes"
+)
+
+def logged_in(chat_id):
+    return get_user_column(chat_id, "autologin") == "on"
+
+@client.on(events.NewMessage(incoming=True, pattern=r"/subscribe\b"))
+async def subscribe_command(event):
+    """Show or change which detection classes a user is alerted about"""
+    chat_id = event.chat_id
+    if not logged_in(chat_id):
+        await event.reply("🔑 Please log in first.")
+        return
+        
+    args = event.message.text.split()[1:]
+    current = subscription_index.get(chat_id)
+    if args:
+        if len(args) == 1 and args[0].lower() == "all":
+            classes = []
+        else:
+            adding = [arg.lstrip("+") for arg in args if not arg.startswith("-")]
+            removing = [arg[1:] for arg in args if arg.startswith("-")]
+            added, unknown_added = subscriptions.parse_classes(adding)
+            removed, unknown_removed = subscriptions.parse_classes(removing)
+            if unknown_added or unknown_removed:
+                await event.reply(f"❌ Unknown class: {', '.join(unknown_added + unknown_removed)}\n"
+                                  f"Classes: {', '.join(subscriptions.CLASSES)}")
+                return
+            # "+X"/"-X" edit the current list; plain names replace it
+            relative = all(arg[0] in "+-" for arg in args)
+            base = set(current.classes or subscriptions.CLASSES) if relative else set()
+            classes = sorted((base | set(added)) - set(removed))
+            if not classes:
+                await event.reply("❌ That would leave no classes; use /subscribe all or name at least one.")
+                return
+            if set(classes) == set(subscriptions.CLASSES):
+                classes = []
+        update_user_column(chat_id, "sub_classes", ",".join(classes))
+        await event.reply("✅ Saved.\n" + subscription_index.get(chat_id).describe())
+    else:
+        await event.reply(current.describe() + "\n\n" + SUBSCRIPTION_HELP)
+
+@client.on(events.NewMessage(incoming=True, pattern=r"/quiet\b"))
+async def quiet_command(event):
+    """Set or clear a user's quiet hours"""
+    chat_id = event.chat_id
+    if not logged_in(chat_id):
+        await event.reply("🔑 Please log in first.")
+        return
+        
+    args = event.message.text.split()[1:]
+    if not args:
+        await event.reply(subscription_index.get(chat_id).describe() + "\n\nUsage: /quiet 22-6 or /quiet off")
+        return
+    if args[0].lower() == "off":
+        update_user_column(chat_id, "quiet_hours", "")
+    elif subscriptions.parse_quiet_hours(args[0]):
+        update_user_column(chat_id, "quiet_hours", args[0])
+    else:
+        await event.reply("❌ Use whole hours from 0 to 23, e.g. /quiet 22-6")
+        return
+    await event.reply("✅ Saved.\n" + subscription_index.get(chat_id).describe())
+
+@client.on(events.NewMessage(incoming=True, pattern=r"/mode\b"))
+async def mode_command(event):
+    """Switch a user between instant alerts and the periodic digest"""
+    chat_id = event.chat_id
+    if not logged_in(chat_id):
+        await event.reply("🔑 Please log in first.")
+        return
+        
+    args = event.message.text.split()[1:]
+    if not args or args[0].lower() not in subscriptions.MODES:
+        await event.reply(subscription_index.get(chat_id).describe() + "\n\nUsage: /mode instant or /mode digest\n"
+                          f"Urgent classes ({', '.join(sorted(subscriptions.URGENT_CLASSES))}) are always sent right away.")
+        return
+    update_user_column(chat_id, "alert_mode", args[0].lower())
+    await event.reply("✅ Saved.\n" + subscription_index.get(chat_id).describe())
+
 # Admin command handlers optimized for better error handling and performance
 @client.on(events.NewMessage(incoming=True, pattern="/help"))
 async def admin_help(event):
@@ -722,11 +1098,79 @@ async def admin_help(event):
             " /user_db - Export users database\n"
             " /stats_db - Export detection statistics database\n"
             " /export - Export photo backups with detection details\n"
+            " /history [class] [days|YYYY-MM-DD[..YYYY-MM-DD]] - Browse backed-up detections\n"
+            " /alert_stats - Bytes sent per alert over the last 24 hours\n"
             " /analysis - Export statistical charts and analysis\n"
-            " /backup - Create and send a backup of all system data"
+            " /trend <class> [hour|day|night] [periods] [status] - Detection trend from rollups\n"
+            " /feedback - Per-class precision from confirmations and alert modes\n"
+            " /backup - Create and send a backup of all system data\n"
+            " /metrics - Summary of bot and camera metrics\n"
+            " /profile [bot|camera] [seconds] - Capture a CPU/asyncio/memory profile report"
         )
         await event.reply(help_text)
 
+def fetch_camera_metrics():
+    """Scrape the camera's local metrics endpoint"""
+    with urllib.request.urlopen(CAMERA_METRICS_URL, timeout=2) as response:
+        return response.read().decode("utf-8")
+
+@client.on(events.NewMessage(incoming=True, pattern="/metrics"))
+async def metrics_summary(event):
+    """Send a summary of the bot and camera metrics for admin"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    sections = [("🤖 Bot", metrics.parse_text(metrics.REGISTRY.render()))]
+    try:
+        camera_text = await asyncio.get_event_loop().run_in_executor(None, fetch_camera_metrics)
+        sections.append(("📷 Camera", metrics.parse_text(camera_text)))
+    except Exception as e:
+        sections.append(("📷 Camera", None))
+        print(f"Error fetching camera metrics: {e}")
+        
+    lines = []
+    for title, samples in sections:
+        lines.append(f"{title}:")
+        if samples is None:
+            lines.append("  unreachable")
+        else:
+            lines.extend(f"  {line}" for line in metrics.summarize(samples) or ["no data yet"])
+    await event.reply("📈 Metrics\n" + "\n".join(lines)[:4000])
+
+@client.on(events.NewMessage(incoming=True, pattern="/profile"))
+async def profile_command(event):
+    """Capture a time-boxed profile of the bot or camera and send the report"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    args = event.message.text.split()[1:]
+    target = args[0].lower() if args and not args[0].isdigit() else "bot"
+    numbers = [arg for arg in args if arg.isdigit()]
+    seconds = min(int(numbers[0]), profiler.MAX_SECONDS) if numbers else profiler.DEFAULT_SECONDS
+    if target not in ("bot", "camera") or seconds < 1:
+        await event.reply("Usage: /profile [bot|camera] [seconds]")
+        return
+        
+    processing_msg = await event.reply(f"⏱ Profiling {target} for {seconds}s... Please wait.")
+    try:
+        if target == "bot":
+            report_path = await profiler.profile_event_loop(seconds)
+        else:
+            report_path = await profiler.profile_camera(seconds)
+            
+        if report_path:
+            await outbound.send_file(
+                event.chat_id,
+                report_path,
+                priority=sender.PRIORITY_EXPORT,
+                caption=f"⏱ {target.capitalize()} profile ({seconds}s)\n📆 {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+            )
+        else:
+            await event.reply("❌ No profile report: is camera.py running?")
+        await processing_msg.delete()
+    except Exception as e:
+        await event.reply(f"❌ Error profiling {target}: {e}")
+
 @client.on(events.NewMessage(incoming=True, pattern="/user_db"))
 async def export_user_db(event):
     """Export user database for admin"""
@@ -734,9 +1178,10 @@ async def export_user_db(event):
         return
         
     try:
-        await client.send_file(
+        await outbound.send_file(
             event.chat_id, 
             DB_PATH,
+            priority=sender.PRIORITY_EXPORT,
             caption=f"🕵🏻‍♂️ Users Database\n📆 {datetime.now().strftime('%d/%m/%Y %H:%M')}"
         )
     except Exception as e:
@@ -749,14 +1194,53 @@ async def export_stats_db(event):
         return
         
     try:
-        await client.send_file(
+        await outbound.send_file(
             event.chat_id, 
             STATSDB_PATH,
+            priority=sender.PRIORITY_EXPORT,
             caption=f"🕵🏻‍♂️ Detection Statistics Database\n📆 {datetime.now().strftime('%d/%m/%Y %H:%M')}"
         )
     except Exception as e:
         await event.reply(f"❌ Error exporting stats database: {e}")
 
+@client.on(events.NewMessage(incoming=True, pattern="/alert_stats"))
+async def alert_stats(event):
+    """Report how many bytes detection alerts have been sending"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    since = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with sqlite3.connect(STATSDB_PATH) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*), AVG(original_bytes), AVG(sent_bytes), SUM(sent_bytes * recipients) FROM alert_log WHERE time >= ?",
+                (since,)
+            )
+            count, avg_original, avg_sent, total_sent = cursor.fetchone()
+    except sqlite3.Error as e:
+        await event.reply(f"❌ Error reading alert stats: {e}")
+        return
+        
+    if not count:
+        await event.reply("📭 No alerts in the last 24 hours.")
+        return
+        
+    await event.reply(
+        f"📶 Alerts in the last 24 hours: {count}\n"
+        f"Average original: {avg_original / 1024:.0f} KB\n"
+        f"Average sent: {avg_sent / 1024:.0f} KB ({100 * avg_sent / avg_original:.0f}%)\n"
+        f"Uploaded: {avg_sent * count / 1024:.0f} KB, delivered: {(total_sent or 0) / 1024:.0f} KB"
+    )
+
+async def run_data_script(*args):
+    """Run data.py without blocking the loop; returns (returncode, stderr)"""
+    process = await asyncio.create_subprocess_exec(
+        'python', "data.py", *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    return process.returncode, stderr.decode(errors="replace")
+
 @client.on(events.NewMessage(incoming=True, pattern="/analysis"))
 async def generate_analysis(event):
     """Generate and send statistical analysis charts for admin"""
@@ -768,10 +1252,10 @@ async def generate_analysis(event):
         processing_msg = await event.reply("📊 Generating analysis charts... Please wait.")
         
         # Run the data analysis script
-        result = subprocess.run(['python', "data.py"], capture_output=True, text=True)
+        returncode, stderr = await run_data_script()
         
-        if result.returncode != 0:
-            await processing_msg.edit(f"❌ Error generating charts: {result.stderr}")
+        if returncode != 0:
+            await processing_msg.edit(f"❌ Error generating charts: {stderr}")
             return
             
         # Current timestamp for all captions
@@ -788,9 +1272,10 @@ async def generate_analysis(event):
         
         for file_path, caption in chart_files:
             if os.path.exists(file_path):
-                await client.send_file(
+                await outbound.send_file(
                     event.chat_id,
                     file_path,
+                    priority=sender.PRIORITY_EXPORT,
                     caption=f"{caption}\n📆 {timestamp}"
                 )
             else:
@@ -800,6 +1285,158 @@ async def generate_analysis(event):
     except Exception as e:
         await event.reply(f"❌ Error in analysis: {e}")
 
+@client.on(events.NewMessage(incoming=True, pattern="/trend"))
+async def trend_analysis(event):
+    """Send a per-hour/day/night trend for one class from the rollup tables"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    args = event.message.text.split()[1:]
+    if not args:
+        await event.reply("Usage: /trend <class> [hour|day|night] [periods] [status]\nExample: /trend Pig night 90")
+        return
+        
+    name = args[0].capitalize()
+    granularity = args[1].lower() if len(args) > 1 else "day"
+    status = args[3].capitalize() if len(args) > 3 else "Detected"
+    try:
+        periods = int(args[2]) if len(args) > 2 else 30
+    except ValueError:
+        await event.reply("❌ Periods must be a number.")
+        return
+        
+    if not 1 <= periods <= 1000:
+        await event.reply("❌ Periods must be between 1 and 1000.")
+        return
+        
+    if name not in tracker.last_processed or granularity not in rollup.GRANULARITIES or status not in rollup.STATUSES:
+        await event.reply("❌ Unknown class, granularity or status.")
+        return
+        
+    try:
+        points = rollup.series(STATSDB_PATH, name, status, granularity, periods)
+        counts = [count for _, count in points]
+        busiest = max(points, key=lambda point: point[1])
+        summary = (
+            f"📈 {name} ({status}) per {granularity}, last {periods}\n"
+            f"Total: {sum(counts)}\n"
+            f"Average: {sum(counts) / len(counts):.2f}\n"
+            f"Busiest: {busiest[0]} ({busiest[1]})\n"
+            f"Latest: {points[-1][0]} ({points[-1][1]})"
+        )
+        await event.reply(summary)
+        
+        returncode, stderr = await run_data_script("trend", name, granularity, str(periods), status)
+        chart_path = f"data/{name}_{status}_{granularity}_trend.png"
+        if returncode == 0 and os.path.exists(chart_path):
+            await outbound.send_file(event.chat_id, chart_path, priority=sender.PRIORITY_EXPORT, caption=f"📊 {name} trend\n📆 {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+        else:
+            await event.reply(f"⚠️ Trend chart not generated: {stderr}")
+    except Exception as e:
+        await event.reply(f"❌ Error in trend: {e}")
+
+@client.on(events.NewMessage(incoming=True, pattern="/feedback"))
+async def feedback_report(event):
+    """Report per-class confirmation precision and how each class is alerted"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    alert_feedback.refresh()
+    lines = alert_feedback.describe()
+    if not lines:
+        await event.reply(f"📭 No confirmations in the last {feedback.WINDOW_DAYS} days.")
+        return
+    state = "" if FEEDBACK_ENABLED else " (suppression disabled)"
+    await event.reply(
+        f"🎯 Confirmation precision, last {feedback.WINDOW_DAYS} days{state}\n" + "\n".join(lines)
+        + f"\n\n🔕 Held for the digest: {held_alerts.update_gauges()}"
+    )
+
+HISTORY_RANGE_FORMAT = "%Y%m%d%H%M"  # Compact range in the page buttons' callback data
+
+async def send_history_page(chat_id, start, end, name=None, before=None, after=None):
+    """Send one page of backed-up detections as a thumbnail album plus a navigation message"""
+    rows, has_newer, has_older = history.page(STATSDB_PATH, start, end, name, before, after)
+    scope = f"{name or 'all classes'}, {start.strftime('%Y-%m-%d')} – {end.strftime('%Y-%m-%d')}"
+    if not rows:
+        await outbound.send_message(chat_id, f"📭 No backed-up detections for {scope}.", priority=sender.PRIORITY_CONFIRMATION)
+        return
+        
+    # Thumbnails are small and precomputed; the outbound queue uploads them behind live alerts
+    with_thumbs = [row for row in rows if row[4]]
+    files = await asyncio.gather(*(
+        outbound.upload_file(thumb, priority=sender.PRIORITY_CONFIRMATION, file_name=f"history_{entry}.jpg")
+        for entry, _, _, _, thumb in with_thumbs
+    ))
+    if files:
+        await outbound.send_file(
+            chat_id, list(files), priority=sender.PRIORITY_CONFIRMATION,
+            caption=[f"#{entry} {detected} {when}" for entry, when, detected, _, _ in with_thumbs]
+        )
+        
+    lines = [
+        f"#{entry} {detected} · {when}" + (f" · {temperature}°C" if temperature not in (None, "None") else "")
+        for entry, when, detected, temperature, _ in rows
+    ]
+    buttons = [
+        [Button.inline(f"🖼 #{entry}", data=f"full_{entry}") for entry, *_ in rows[i:i + 4]]
+        for i in range(0, len(rows), 4)
+    ]
+    range_data = f"{name or '-'}_{start.strftime(HISTORY_RANGE_FORMAT)}_{end.strftime(HISTORY_RANGE_FORMAT)}"
+    navigation = []
+    if has_newer:
+        navigation.append(Button.inline("⬅️ Newer", data=f"hist_n_{rows[0][0]}_{range_data}"))
+    if has_older:
+        navigation.append(Button.inline("Older ➡️", data=f"hist_o_{rows[-1][0]}_{range_data}"))
+    if navigation:
+        buttons.append(navigation)
+    await outbound.send_message(
+        chat_id, f"📚 History: {scope}\n" + "\n".join(lines), priority=sender.PRIORITY_CONFIRMATION, buttons=buttons
+    )
+
+@client.on(events.NewMessage(incoming=True, pattern=r"/history\b"))
+async def history_command(event):
+    """Browse backed-up detections by class and time range for admin"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    name, time_range = None, None
+    for arg in event.message.text.split()[1:]:
+        classes, _ = subscriptions.parse_classes([arg])
+        if classes:
+            name = classes[0]
+        elif history.parse_range(arg):
+            time_range = history.parse_range(arg)
+        else:
+            await event.reply("Usage: /history [class] [days|YYYY-MM-DD[..YYYY-MM-DD]]\nExample: /history Pig 30")
+            return
+    start, end = time_range or (datetime.now() - timedelta(days=history.DEFAULT_DAYS), datetime.now())
+    try:
+        await send_history_page(event.chat_id, start, end, name)
+    except Exception as e:
+        await event.reply(f"❌ Error reading history: {e}")
+
+@client.on(events.CallbackQuery(data=re.compile(b"hist_")))
+async def history_navigation(event):
+    """Show the newer or older page of a history listing"""
+    if role(event.chat_id) != "admin":
+        return
+        
+    try:
+        _, direction, entry, name, start, end = event.data.decode("utf-8").split("_")
+        start = datetime.strptime(start, HISTORY_RANGE_FORMAT)
+        end = datetime.strptime(end, HISTORY_RANGE_FORMAT)
+        await event.answer()
+        await event.delete()
+        await send_history_page(
+            event.chat_id, start, end, None if name == "-" else name,
+            before=int(entry) if direction == "o" else None,
+            after=int(entry) if direction == "n" else None
+        )
+    except Exception as e:
+        print(f"Error in history navigation: {e}")
+        await event.answer("An error occurred loading the page", alert=True)
+
 @client.on(events.NewMessage(incoming=True, pattern="/export"))
 async def export_backup(event):
     """Export photo backups and detection data for admin"""
@@ -815,9 +1452,10 @@ async def export_backup(event):
         zip_filename = f'backup_{timestamp}.zip'
         
         if backup_folder_to_zip(zip_filename):
-            await client.send_file(
+            await outbound.send_file(
                 event.chat_id,
                 zip_filename,
+                priority=sender.PRIORITY_EXPORT,
                 caption=f"🕵🏻‍♂️ Photo and detection backup\n📆 {datetime.now().strftime('%d/%m/%Y %H:%M')}"
             )
             # Clean up the zip file after sending
@@ -832,22 +1470,35 @@ async def export_backup(event):
     except Exception as e:
         await event.reply(f"❌ Error creating backup: {e}")
 
+async def process_detection_photo(photo_path, chat_ids):
+    """Broadcast one detection photo, logging instead of raising"""
+    try:
+        await send_detection_photo_to_all(photo_path, chat_ids)
+    except Exception as e:
+        print(f"Error processing photo {photo_path}: {e}")
+
+# Alerts run concurrently so one alert's review window doesn't hold up the next camera's
+alert_tasks = set()
+
 async def monitor_task():
     """Monitor directory for new detection photos and notify users"""
     while True:
         try:
-            # Fetch chat IDs periodically to ensure we have the current list
-            chat_ids = all_farmer()
-            
-            # No need to continue if no users to notify
-            if not chat_ids:
+            # No need to continue if no users to notify; the subscription index tracks logins
+            if not subscription_index.chats():
                 await asyncio.sleep(10)
                 continue
                 
             async for photo_path in monitor_directory(PHOTO_PATH):
+                # Sidecar metadata and other files are read alongside their photo
+                if not photo_path.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
                 try:
                     if os.path.exists(photo_path) and os.path.getsize(photo_path) > 0:
-                        await send_detection_photo_to_all(photo_path, chat_ids)
+                        # Logged-in users from the subscription index, so users who logged in since startup get alerts
+                        task = asyncio.ensure_future(process_detection_photo(photo_path, subscription_index.chats()))
+                        alert_tasks.add(task)
+                        task.add_done_callback(alert_tasks.discard)
                     else:
                         print(f"Skipping invalid file: {photo_path}")
                 except Exception as e:
@@ -857,15 +1508,77 @@ async def monitor_task():
             print(f"Error in monitor task: {e}")
             await asyncio.sleep(30)  # Back off on errors
 
+async def outbox_task():
+    """Deliver alerts held in the outbox once Telegram is reachable again"""
+    while True:
+        await asyncio.sleep(OUTBOX_CHECK_SECONDS)
+        try:
+            if not alert_outbox.update_gauges() or not client.is_connected():
+                continue
+            failed = await alert_outbox.drain(
+                client, outbound, sender.PRIORITY_ALERT,
+                buttons_for=lambda item: alert_buttons(item["name"], item["entry"])
+            )
+            if failed:
+                print(f"Outbox delivery failed for {failed} chats, retrying later")
+        except Exception as e:
+            print(f"Error in outbox task: {e}")
+
+async def digest_task():
+    """Send held detections as one album per chat, once the chat's quiet hours are over"""
+    while True:
+        await asyncio.sleep(DIGEST_SECONDS)
+        try:
+            if not held_alerts.update_gauges() or not client.is_connected():
+                continue
+            failed = await held_alerts.drain(
+                client, outbound, sender.PRIORITY_CONFIRMATION,
+                plan=outbox.digest_everything, caption_for=subscriptions.digest_caption,
+                chat_filter=lambda chat_id: not subscription_index.quiet_now(chat_id)
+            )
+            if failed:
+                print(f"Digest delivery failed for {failed} chats, retrying later")
+        except Exception as e:
+            print(f"Error in digest task: {e}")
+
 async def main():
     """Main function to run the bot and monitoring tasks"""
     try:
         # Ensure database tables exist
         ensure_tables_exist()
         
-        # Start the monitoring and action tasks
+        # Serve metrics locally for Prometheus or curl
+        try:
+            metrics.start_http_server(METRICS_PORT)
+        except OSError as e:
+            print(f"Metrics endpoint not started: {e}")
+        
+        # Index backups made before the history index existed, off the event loop
+        def migration_done(done):
+            if done.exception():
+                print(f"History index migration failed: {done.exception()}")
+            elif done.result():
+                print(f"History index: {done.result()} older backups indexed")
+        migration = asyncio.get_event_loop().run_in_executor(None, history.migrate, STATSDB_PATH, BACKUP_FOLDER)
+        migration.add_done_callback(migration_done)
+        
+        # Start the outbound send queue, monitoring and action tasks
+        outbound.start()
         monitor = asyncio.create_task(monitor_task())
         action = asyncio.create_task(action_per_detection())
+        catch_up = asyncio.create_task(outbox_task())
+        digest = asyncio.create_task(digest_task())
+        
+        # Accept detections posted by other camera nodes
+        if INGEST_PORT:
+            ingestion = ingest.IngestService(
+                lambda photo_path: process_detection_photo(photo_path, subscription_index.chats()),
+                token=INGEST_TOKEN or None
+            )
+            try:
+                await ingestion.start(INGEST_HOST, INGEST_PORT)
+            except ValueError as e:
+                print(f"Detection ingestion disabled: {e}; set WILDDETECT_INGEST_TOKEN")
         
         # Run the bot until disconnected
         await client.run_until_disconnected()
@@ -875,10 +1588,7 @@ async def main():
         print(f"Fatal error: {e}")
     finally:
         # Clean up resources
-        LED1_PIN.off()
-        LED2_PIN.off()
-        buzzer1.off()
-        buzzer2.off()
+        hw.all_off()
         print("Resources cleaned up")
 
 if __name__ == '__main__':
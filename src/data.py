@@ -5,6 +5,8 @@ import seaborn as sns
 import os
 from pathlib import Path
 import numpy as np
+import sys
+import rollup
 
 def generate_charts(db_path="data/stats.db", output_dir="data"):
     """
@@ -168,6 +170,66 @@ def generate_charts(db_path="data/stats.db", output_dir="data"):
     print("All charts have been saved as high-quality PNG images with improved text readability.")
     return {"success": True, "charts": generated_charts}
 
+def generate_trend_chart(name, status="Detected", granularity="day", periods=30, db_path="data/stats.db", output_dir="data"):
+    """
+    Generate a trend chart for one class from the precomputed rollup tables.
+    
+    Args:
+        name (str): Detection class, e.g. "Pig"
+        status (str): Detected, Correct, Incorrect or None
+        granularity (str): "hour", "day" or "night"
+        periods (int): Number of most recent buckets to plot
+        db_path (str): Path to the SQLite database
+        output_dir (str): Directory to save the generated chart
+    
+    Returns:
+        dict: Information about the generated chart
+    """
+    Path(output_dir).mkdir(exist_ok=True, parents=True)
+    
+    try:
+        points = rollup.series(db_path, name, status, granularity, periods)
+    except ValueError as e:
+        return {"error": str(e)}
+    
+    buckets = [bucket for bucket, _ in points]
+    counts = [count for _, count in points]
+    
+    try:
+        fig, ax = plt.subplots(figsize=(16, 6))
+        ax.bar(range(len(buckets)), counts, color='steelblue')
+        ax.set_title(f'{name} - {status} per {granularity} (last {periods})')
+        ax.set_xlabel(granularity.capitalize())
+        ax.set_ylabel('Count')
+        # Keep roughly 30 tick labels regardless of the number of buckets
+        step = max(1, len(buckets) // 30)
+        ax.set_xticks(range(0, len(buckets), step))
+        ax.set_xticklabels(buckets[::step], rotation=90)
+        
+        plt.tight_layout()
+        chart_path = os.path.join(output_dir, f"{name}_{status}_{granularity}_trend.png")
+        plt.savefig(chart_path)
+        plt.close()
+    except Exception as e:
+        print(f"Error generating trend chart for {name}: {e}")
+        plt.close()
+        return {"error": f"Error: {e}"}
+    
+    print(f"Generated trend chart for {name}: {chart_path}")
+    return {"success": True, "chart": chart_path, "total": sum(counts)}
+
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "trend":
+        # python data.py trend <name> [granularity] [periods] [status]
+        args = sys.argv[2:]
+        result = generate_trend_chart(
+            args[0],
+            status=args[3] if len(args) > 3 else "Detected",
+            granularity=args[1] if len(args) > 1 else "day",
+            periods=int(args[2]) if len(args) > 2 else 30
+        )
+        print(f"Trend chart complete: {result}")
+        sys.exit(0 if result.get("success") else 1)
+    
     result = generate_charts()
     print(f"Chart generation complete: {result}")
\ No newline at end of file
@@ -0,0 +1,77 @@
+import asyncio
+import itertools
+import random
+import time
+
+# In-process stand-in for the parts of TelegramClient the bot calls, used to
+# exercise the outbound scheduler and the load-test harness without a network.
+
+class FakeFloodWaitError(Exception):
+    """Mimics telethon.errors.FloodWaitError (exposes `seconds`)"""
+    def __init__(self, seconds):
+        super().__init__(f"A wait of {seconds} seconds is required")
+        self.seconds = seconds
+
+class FakeMessage:
+    """Sent message with the attributes the bot reads back"""
+    def __init__(self, message_id, chat_id, text=None, file=None, buttons=None):
+        self.id = message_id
+        self.chat_id = chat_id
+        self.text = text
+        self.file = file
+        self.buttons = buttons
+        self.button_count = sum(len(row) if isinstance(row, list) else 1 for row in buttons or [])
+
+class FakeTelegramClient:
+    """Records every call and simulates network latency and flood waits"""
+    def __init__(self, latency=0.02, jitter=0.01, flood_every=0, flood_seconds=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_every = flood_every  # Raise a flood wait on every Nth call (0 = never)
+        self.flood_seconds = flood_seconds
+        self.calls = []
+        self.messages = {}
+        self.ids = itertools.count(1)
+        self.call_count = 0
+        self.connected = True
+
+    async def _call(self, method, chat_id=None, **details):
+        self.call_count += 1
+        if self.flood_every and self.call_count % self.flood_every == 0:
+            raise FakeFloodWaitError(self.flood_seconds)
+        if not self.connected:
+            raise ConnectionError("Fake client is offline")
+        await asyncio.sleep(max(0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        self.calls.append((time.perf_counter(), method, chat_id, details))
+
+    def is_connected(self):
+        return self.connected
+
+    async def upload_file(self, file, file_name=None, **kwargs):
+        await self._call("upload_file", file_name=file_name)
+        return file
+
+    async def send_file(self, chat_id, file, caption=None, buttons=None, **kwargs):
+        await self._call("send_file", chat_id, caption=caption)
+        message = FakeMessage(next(self.ids), chat_id, caption, file, buttons)
+        self.messages[(chat_id, message.id)] = message
+        return message
+
+    async def send_message(self, chat_id, text, buttons=None, **kwargs):
+        await self._call("send_message", chat_id, text=text)
+        message = FakeMessage(next(self.ids), chat_id, text, buttons=buttons)
+        self.messages[(chat_id, message.id)] = message
+        return message
+
+    async def get_messages(self, chat_id, ids=None, **kwargs):
+        await self._call("get_messages", chat_id)
+        return self.messages.get((chat_id, ids))
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self._call("delete_messages", chat_id)
+        for message_id in message_ids if isinstance(message_ids, list) else [message_ids]:
+            self.messages.pop((chat_id, message_id), None)
+
+    def sent(self, method=None):
+        """Return recorded calls, optionally filtered by method"""
+        return [call for call in self.calls if method is None or call[1] == method]
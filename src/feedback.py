@@ -0,0 +1,150 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+import metrics
+
+# Feedback loop from the farmers' Correct/Incorrect confirmations. Rolling
+# per-class precision over the last WINDOW_DAYS of daily rollups decides how a
+# class is alerted:
+#   alert   normal broadcast, buttons and deterrents
+#   raised  only detections scoring at least a higher threshold are broadcast
+#   digest  never broadcast; photos wait for the periodic digest album
+# Detections that are held back go to the digest and trigger no actuators.
+# A digest-only class gets no new confirmations, so as its old ones leave the
+# window it falls below MIN_CONFIRMATIONS and is alerted normally again, on
+# probation.
+
+WINDOW_DAYS = 14
+MIN_CONFIRMATIONS = 8      # Fewer than this in the window: not enough evidence, alert normally
+RAISE_BELOW = 0.7          # Precision under which the threshold goes up
+DIGEST_BELOW = 0.4         # Precision under which the class is digest-only
+HYSTERESIS = 0.05          # Extra precision needed to move back to a lighter mode
+BASE_THRESHOLD = 0.5       # camera.py's default confidence threshold
+MAX_THRESHOLD = 0.9        # Threshold at DIGEST_BELOW precision
+REFRESH_SECONDS = 60
+MODES = ("alert", "raised", "digest")
+
+CLASS_PRECISION = metrics.gauge("wilddetect_class_precision", "Rolling precision from confirmations by class")
+CLASS_MODE = metrics.gauge("wilddetect_class_alert_mode", "Alert mode by class (0 alert, 1 raised threshold, 2 digest only)")
+ALERTS_HELD = metrics.counter("wilddetect_alerts_held_total", "Detections sent to the digest instead of alerted by class and reason")
+
+def confirmation_counts(db_path, window_days=WINDOW_DAYS, until=None):
+    """
+    Sum Correct and Incorrect confirmations per class over the last days.
+
+    Args:
+        db_path (str): Path to the stats SQLite database
+        window_days (int): Number of daily rollup buckets to include
+        until (datetime): End of the window, defaults to now
+
+    Returns:
+        dict: name -> (correct, incorrect)
+    """
+    first = ((until or datetime.now()) - timedelta(days=window_days - 1)).strftime("%Y-%m-%d")
+    counts = {}
+    try:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute('''
+                SELECT name, status, SUM(count) FROM rollup_daily
+                WHERE status IN ('Correct', 'Incorrect') AND bucket >= ?
+                GROUP BY name, status
+            ''', (first,)).fetchall()
+    except sqlite3.Error as e:
+        print(f"Feedback query error: {e}")
+        return counts
+    for name, status, total in rows:
+        correct, incorrect = counts.get(name, (0, 0))
+        counts[name] = (correct + total, incorrect) if status == "Correct" else (correct, incorrect + total)
+    return counts
+
+def next_mode(current, precision):
+    """Mode for a class given its precision, moving back to lighter modes only past the hysteresis"""
+    if precision is None:
+        return "alert"
+    if precision < DIGEST_BELOW:
+        return "digest"
+    if current == "digest" and precision < DIGEST_BELOW + HYSTERESIS:
+        return "digest"
+    if precision < RAISE_BELOW:
+        return "raised"
+    if current != "alert" and precision < RAISE_BELOW + HYSTERESIS:
+        return "raised"
+    return "alert"
+
+def raised_threshold(precision):
+    """Score a detection needs while its class is in "raised" mode; higher the worse the precision"""
+    shortfall = (RAISE_BELOW - precision) / (RAISE_BELOW - DIGEST_BELOW)
+    return round(BASE_THRESHOLD + min(1.0, max(0.0, shortfall)) * (MAX_THRESHOLD - BASE_THRESHOLD), 2)
+
+class ClassPolicy:
+    def __init__(self, mode="alert", precision=None, confirmations=0):
+        self.mode = mode
+        self.precision = precision
+        self.confirmations = confirmations
+
+    @property
+    def threshold(self):
+        return raised_threshold(self.precision) if self.mode == "raised" else None
+
+class FeedbackPolicy:
+    """Per-class alert modes derived from confirmations, refreshed every REFRESH_SECONDS"""
+    def __init__(self, db_path, enabled=True, log=print):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.log = log
+        self.policies = {}
+        self.refreshed_at = 0.0
+
+    def refresh(self, now=None):
+        """Recompute precision and modes from the rollups, logging every mode change"""
+        self.refreshed_at = now or time.monotonic()
+        counts = confirmation_counts(self.db_path)
+        for name in set(counts) | set(self.policies):
+            correct, incorrect = counts.get(name, (0, 0))
+            total = correct + incorrect
+            precision = correct / total if total >= MIN_CONFIRMATIONS else None
+            policy = self.policies.setdefault(name, ClassPolicy())
+            mode = next_mode(policy.mode, precision) if self.enabled else "alert"
+            if mode != policy.mode:
+                shown = f"{precision:.0%} of {total}" if precision is not None else f"{total} confirmations"
+                self.log(f"Feedback: {name} {policy.mode} -> {mode} (precision {shown})")
+            policy.mode, policy.precision, policy.confirmations = mode, precision, total
+            if precision is not None:
+                CLASS_PRECISION.set(round(precision, 3), name=name)
+            CLASS_MODE.set(MODES.index(mode), name=name)
+
+    def invalidate(self):
+        """Recompute on the next decision, e.g. after a confirmation"""
+        self.refreshed_at = 0.0
+
+    def decide(self, name, score=None):
+        """
+        Route one detection.
+
+        Args:
+            name (str): Detection class
+            score (float): Detector confidence from the camera's sidecar, if known
+
+        Returns:
+            ("alert" or "digest", reason)
+        """
+        if time.monotonic() - self.refreshed_at > REFRESH_SECONDS:
+            self.refresh()
+        policy = self.policies.get(name, ClassPolicy())
+        route, reason = "alert", ""
+        if policy.mode == "digest":
+            route, reason = "digest", f"precision {policy.precision:.0%}"
+        elif policy.mode == "raised" and score is not None and score < policy.threshold:
+            route, reason = "digest", f"score {score:.2f} below {policy.threshold:.2f}"
+        if route == "digest":
+            ALERTS_HELD.inc(name=name, reason=policy.mode)
+        return route, reason
+
+    def describe(self):
+        """One line per class with confirmations, for the admin report"""
+        lines = []
+        for name, policy in sorted(self.policies.items(), key=lambda item: (item[1].precision or 1.0, item[0])):
+            precision = f"{policy.precision:.0%}" if policy.precision is not None else "n/a"
+            threshold = f" (score ≥ {policy.threshold:.2f})" if policy.mode == "raised" else ""
+            lines.append(f"{name}: {policy.mode}{threshold}, precision {precision} of {policy.confirmations}")
+        return lines
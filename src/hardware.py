@@ -0,0 +1,176 @@
+import os
+import signal
+import threading
+import time
+import metrics
+
+# Sensor and actuator access for the bot. Devices are created in background
+# threads so importing the bot (and connecting to Telegram) never waits on GPIO.
+# Set WILDDETECT_SIMULATE=1 to run without a Raspberry Pi.
+
+SIMULATE = os.environ.get("WILDDETECT_SIMULATE", "0") == "1"
+
+DHT_PIN = "D21"
+LED1_GPIO = 17
+LED2_GPIO = 18
+BUZZER1_GPIO = 22
+BUZZER2_GPIO = 27
+INIT_TIMEOUT = 10  # Seconds wait_ready() waits for initialization
+
+ACTUATOR_ACTIVATIONS = metrics.counter("wilddetect_actuator_activations_total", "Light and buzzer switch-ons by device")
+
+def kill_process_by_name(name):
+    """Terminate processes whose name starts with `name`, read directly from /proc"""
+    killed = []
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError as e:
+        print(f"Error listing processes: {e}")
+        return killed
+
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/comm", "r") as comm_file:
+                # The kernel truncates comm to 15 characters, as shown by `ps -A`
+                comm = comm_file.read().strip()
+        except OSError:
+            continue  # Process exited or isn't readable
+        if comm.startswith(name[:15]) and int(pid) != os.getpid():
+            try:
+                os.kill(int(pid), signal.SIGTERM)
+                killed.append(int(pid))
+                print(f"Process with PID {pid} has been killed.")
+            except OSError as e:
+                print(f"Error killing process {pid}: {e}")
+    if not killed:
+        print(f"Process {name} not found.")
+    return killed
+
+class SimulatedDevice:
+    """Stand-in for a gpiozero output device that just records its state"""
+    def __init__(self, name):
+        self.name = name
+        self.is_active = False
+        self.activations = 0
+
+    def on(self):
+        if not self.is_active:
+            self.activations += 1
+        self.is_active = True
+
+    def off(self):
+        self.is_active = False
+
+class SimulatedDHT:
+    """Stand-in for the DHT11 sensor with fixed readings"""
+    temperature = 25
+    humidity = 60
+
+class DeviceNotReady(RuntimeError):
+    """A device was used before its background initialization finished"""
+
+class LazyDevice:
+    """Proxy for a device that is still being initialized in the background"""
+    def __init__(self, hardware, name):
+        self._hardware = hardware
+        self._name = name
+
+    def _device(self):
+        # Never wait here: callers run on the bot's event loop
+        if not self._hardware.gpio_ready():
+            raise DeviceNotReady(f"{self._name} is still initializing")
+        device = self._hardware.devices.get(self._name)
+        if device is None:
+            raise RuntimeError(f"{self._name} not initialized")
+        return device
+
+    def on(self):
+        device = self._device()
+        if not device.is_active:
+            ACTUATOR_ACTIVATIONS.inc(device=self._name)
+        device.on()
+
+    def off(self):
+        device = self._hardware.devices.get(self._name)
+        if device is not None:  # Nothing to switch off if it was never initialized
+            device.off()
+
+    @property
+    def is_active(self):
+        device = self._hardware.devices.get(self._name)
+        return bool(device and device.is_active)
+
+class Hardware:
+    """Sensor and GPIO devices, initialized in parallel background threads"""
+    def __init__(self, simulate=SIMULATE):
+        self.simulate = simulate
+        self.devices = {}
+        self.dht = None
+        self.init_times = {}
+        self._gpio_ready = threading.Event()
+        self._dht_ready = threading.Event()
+        self.led1 = LazyDevice(self, "led1")
+        self.led2 = LazyDevice(self, "led2")
+        self.buzzer1 = LazyDevice(self, "buzzer1")
+        self.buzzer2 = LazyDevice(self, "buzzer2")
+
+    def start(self):
+        """Begin initializing devices without blocking the caller"""
+        self.started_at = time.perf_counter()
+        threading.Thread(target=self._init_gpio, name="gpio-init", daemon=True).start()
+        threading.Thread(target=self._init_dht, name="dht-init", daemon=True).start()
+
+    def _init_gpio(self):
+        try:
+            if self.simulate:
+                devices = {name: SimulatedDevice(name) for name in ("led1", "led2", "buzzer1", "buzzer2")}
+            else:
+                from gpiozero import Buzzer, OutputDevice
+                devices = {
+                    "led1": OutputDevice(LED1_GPIO),
+                    "led2": OutputDevice(LED2_GPIO),
+                    "buzzer1": Buzzer(BUZZER1_GPIO),
+                    "buzzer2": Buzzer(BUZZER2_GPIO),
+                }
+            self.devices.update(devices)
+        except Exception as e:
+            print(f"Error initializing GPIO devices: {e}")
+        finally:
+            self.init_times["gpio"] = time.perf_counter() - self.started_at
+            self._gpio_ready.set()
+
+    def _init_dht(self):
+        try:
+            if self.simulate:
+                self.dht = SimulatedDHT()
+            else:
+                # Kill any libgpiod_pulsei process to avoid conflicts with DHT sensor in New version of Raspberry Pi OS
+                kill_process_by_name("libgpiod_pulsein")
+                import adafruit_dht
+                import board
+                self.dht = adafruit_dht.DHT11(getattr(board, DHT_PIN))
+        except Exception as e:
+            print(f"Error initializing DHT sensor: {e}")
+        finally:
+            self.init_times["dht"] = time.perf_counter() - self.started_at
+            self._dht_ready.set()
+
+    def gpio_ready(self):
+        return self._gpio_ready.is_set()
+
+    def wait_ready(self, timeout=INIT_TIMEOUT):
+        """Block until all devices are initialized; return False on timeout"""
+        return self._gpio_ready.wait(timeout) and self._dht_ready.wait(timeout)
+
+    def read_dht(self, attribute):
+        """Read temperature or humidity, raising if the sensor isn't available (yet)"""
+        if not self._dht_ready.is_set():
+            raise DeviceNotReady("DHT sensor is still initializing")
+        if self.dht is None:
+            raise RuntimeError("DHT sensor not initialized")
+        return getattr(self.dht, attribute)
+
+    def all_off(self):
+        """Switch off every actuator that was initialized"""
+        for device in (self.led1, self.led2, self.buzzer1, self.buzzer2):
+            device.off()
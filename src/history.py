@@ -0,0 +1,185 @@
+import io
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from PIL import Image
+
+# Index of backed-up detections for the /history browser. Every backup gets a
+# row in stats.db with its class, time, file name and a small precomputed JPEG
+# thumbnail, so a page of history is one indexed query and never touches the
+# full-size photos. Entries that only exist in backup/details.txt (backups
+# made before the index) are added by migrate().
+# Pages are keyed on the entry number (newest first) rather than an offset, so
+# paging deep into a large archive costs the same as the first page.
+
+PAGE_SIZE = 8          # Thumbnails per page (Telegram albums hold up to 10)
+THUMB_SIDE = 320       # Longest side of a thumbnail, in pixels
+THUMB_QUALITY = 70
+DEFAULT_DAYS = 7
+DETAILS_PATTERN = re.compile(r'^\[(\d+)\] Detected: (.*?), Time: (\S+), Temperature: (.*)$')
+DETAILS_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S"  # As written by bot.backup_photo
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def ensure_history_table(cursor):
+    """Create the backup index and its lookup indexes if they don't exist"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS backup_index (
+            entry INTEGER PRIMARY KEY,
+            time TEXT NOT NULL,
+            name TEXT NOT NULL,
+            temperature TEXT,
+            file TEXT,
+            thumb BLOB
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS backup_index_time ON backup_index (time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS backup_index_name_time ON backup_index (name, time)")
+
+def make_thumbnail(photo_path):
+    """Small JPEG bytes of a photo, or None if it can't be read"""
+    try:
+        with Image.open(photo_path) as image:
+            image.draft("RGB", (THUMB_SIDE * 2, THUMB_SIDE * 2))  # Let the JPEG decoder downscale first
+            image = image.convert("RGB")
+            image.thumbnail((THUMB_SIDE, THUMB_SIDE))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=THUMB_QUALITY)
+            return buffer.getvalue()
+    except (OSError, ValueError) as e:
+        print(f"Error making thumbnail of {photo_path}: {e}")
+        return None
+
+def add(cursor, entry, name, when, temperature, photo_path, thumb=None):
+    """Index one backed-up photo, thumbnail included (pass thumb to make it before the write)"""
+    if thumb is None:
+        thumb = make_thumbnail(photo_path)
+    cursor.execute(
+        "INSERT OR REPLACE INTO backup_index (entry, time, name, temperature, file, thumb) VALUES (?, ?, ?, ?, ?, ?)",
+        (entry, when.strftime(TIME_FORMAT), name, str(temperature), os.path.basename(photo_path),
+         thumb)
+    )
+
+def parse_details_line(line):
+    """(entry, name, datetime, temperature) from a details.txt line, or None"""
+    match = DETAILS_PATTERN.match(line.strip())
+    if not match:
+        return None
+    try:
+        when = datetime.strptime(match.group(3), DETAILS_TIME_FORMAT)
+    except ValueError:
+        return None
+    return int(match.group(1)), match.group(2), when, match.group(4)
+
+def migrate(db_path, backup_folder):
+    """
+    Index backups listed in details.txt that are not in the index yet.
+
+    Args:
+        db_path (str): Path to the stats SQLite database
+        backup_folder (str): Folder holding details.txt and the backed-up photos
+
+    Returns:
+        int: Number of entries added
+    """
+    details_path = os.path.join(backup_folder, "details.txt")
+    if not os.path.exists(details_path):
+        return 0
+    # One directory listing for all entries instead of one per entry
+    files = {}
+    for file_name in os.listdir(backup_folder):
+        number = file_name.split("_", 1)[0]
+        if number.isdigit():
+            files[int(number)] = file_name
+    added = 0
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        ensure_history_table(cursor)
+        indexed = {row[0] for row in cursor.execute("SELECT entry FROM backup_index")}
+        with open(details_path, "r") as details_file:
+            for line in details_file:
+                parsed = parse_details_line(line)
+                if not parsed or parsed[0] in indexed or parsed[0] not in files:
+                    continue
+                entry, name, when, temperature = parsed
+                photo_path = os.path.join(backup_folder, files[entry])
+                # One short transaction per entry, thumbnail made outside it, so new
+                # backups indexed by the bot meanwhile never wait on the migration
+                thumb = make_thumbnail(photo_path)
+                add(cursor, entry, name, when, temperature, photo_path, thumb)
+                conn.commit()
+                added += 1
+    return added
+
+def parse_range(text, now=None):
+    """
+    Read a time range typed by a user.
+
+    Args:
+        text (str): "7" (last 7 days), "2026-10-01" (that day) or "2026-10-01..2026-10-10"
+        now (datetime): Current time, for tests
+
+    Returns:
+        (start, end) datetimes, or None when the text is not a range
+    """
+    now = now or datetime.now()
+    try:
+        if text.isdigit():
+            return now - timedelta(days=int(text)), now
+        first, _, last = text.partition("..")
+        start = datetime.strptime(first, "%Y-%m-%d")
+        end = datetime.strptime(last or first, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
+    except ValueError:
+        return None
+    return (start, end) if start <= end else None
+
+def page(db_path, start, end, name=None, before=None, after=None, size=PAGE_SIZE):
+    """
+    One page of indexed backups, newest first.
+
+    Args:
+        db_path (str): Path to the stats SQLite database
+        start, end (datetime): Time range
+        name (str): Only this class, or None for every class
+        before (int): Entries older than this entry number (next page)
+        after (int): Entries newer than this entry number (previous page)
+        size (int): Entries per page
+
+    Returns:
+        (rows, has_newer, has_older) where rows are (entry, time, name, temperature, thumb)
+    """
+    conditions = ["time BETWEEN ? AND ?"]
+    params = [start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT)]
+    if name:
+        conditions.append("name = ?")
+        params.append(name)
+    where = " AND ".join(conditions)
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        if after is not None:
+            # Walk forward from the cursor, then show the page newest first like the others
+            rows = cursor.execute(
+                f"SELECT entry, time, name, temperature, thumb FROM backup_index WHERE {where} AND entry > ? ORDER BY entry LIMIT ?",
+                params + [after, size]
+            ).fetchall()[::-1]
+        else:
+            rows = cursor.execute(
+                f"SELECT entry, time, name, temperature, thumb FROM backup_index WHERE {where} AND entry < ? ORDER BY entry DESC LIMIT ?",
+                params + [before if before is not None else 2 ** 62, size]
+            ).fetchall()
+        if not rows:
+            return [], False, False
+        exists = f"SELECT EXISTS (SELECT 1 FROM backup_index WHERE {where} AND entry {{}} ?)"
+        has_newer = bool(cursor.execute(exists.format(">"), params + [rows[0][0]]).fetchone()[0])
+        has_older = bool(cursor.execute(exists.format("<"), params + [rows[-1][0]]).fetchone()[0])
+    return rows, has_newer, has_older
+
+def file_for(db_path, entry):
+    """File name of a backed-up entry from the index, or None"""
+    try:
+        with sqlite3.connect(db_path) as conn:
+            row = conn.execute("SELECT file FROM backup_index WHERE entry = ?", (entry,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"History lookup error: {e}")
+        return None
+    return row[0] if row else None
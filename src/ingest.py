@@ -0,0 +1,286 @@
+import asyncio
+import base64
+import binascii
+import hmac
+import ipaddress
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+import metrics
+import subscriptions
+
+# Detection ingestion for farms with several camera nodes. Edge nodes POST
+# detection events (JSON with a base64 JPEG) to /detections; events are
+# deduplicated by (node, event id), coalesced per node/camera/class within a
+# short batch window, written with a sidecar JSON and handed to the bot, and
+# deleted once the bot is done with them (it keeps its own backup).
+# Events trigger farmer alerts and deterrents, so only known classes are
+# accepted and the listener refuses to leave loopback without a token.
+
+INGEST_DIR = "data/ingest"
+BATCH_SECONDS = 2.0            # Coalescing window
+MAX_BODY_BYTES = 8 * 1024 * 1024
+REQUEST_TIMEOUT = 10           # Seconds to receive the headers, and again the body
+SEEN_EVENTS = 10000            # Event ids remembered for deduplication
+SAFE_NAME = re.compile(r'[^A-Za-z0-9_.-]')
+MAX_ID_LENGTH = 64             # node_id, event_id and camera
+
+INGEST_EVENTS = metrics.counter("wilddetect_ingest_events_total", "Ingested detection events by result")
+INGEST_BATCH = metrics.gauge("wilddetect_ingest_batch_events", "Events handed to the bot in the last batch")
+INGEST_SECONDS = metrics.histogram("wilddetect_ingest_request_seconds", "Time to parse and queue one request")
+
+class IngestError(Exception):
+    """Request that can't be accepted, with the HTTP status to answer"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # Any other host name may resolve to a LAN address
+
+def parse_event(body, classes=subscriptions.CLASSES):
+    """Validate a JSON detection event against the known classes and decode its image"""
+    try:
+        event = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        raise IngestError(400, "Body must be JSON")
+    if not isinstance(event, dict):
+        raise IngestError(400, "Body must be a JSON object")
+    for field in ("node_id", "event_id", "class", "image"):
+        if not event.get(field):
+            raise IngestError(400, f"Missing field: {field}")
+    if not isinstance(event["class"], str) or event["class"] not in classes:
+        raise IngestError(400, "Unknown class")
+    for field in ("node_id", "event_id", "camera"):
+        value = event.get(field)
+        if value is not None and not (isinstance(value, str) and 0 < len(value) <= MAX_ID_LENGTH and value.isprintable()):
+            raise IngestError(400, f"{field} must be text of up to {MAX_ID_LENGTH} characters")
+    try:
+        image = base64.b64decode(event.pop("image"), validate=True)
+    except (binascii.Error, ValueError):
+        raise IngestError(400, "Image must be base64")
+    if not image.startswith(b"\xff\xd8"):
+        raise IngestError(400, "Image must be a JPEG")
+    try:
+        event["score"] = float(event.get("score", 0))
+    except (TypeError, ValueError):
+        raise IngestError(400, "Score must be a number")
+    return event, image
+
+class IngestService:
+    """HTTP endpoint that batches detection events from many nodes"""
+    def __init__(self, on_detection, token=None, output_dir=INGEST_DIR, batch_seconds=BATCH_SECONDS,
+                 classes=subscriptions.CLASSES):
+        self.on_detection = on_detection  # async callable(photo_path)
+        self.token = token
+        self.classes = frozenset(classes)
+        self.output_dir = output_dir
+        self.batch_seconds = batch_seconds
+        self.seen = OrderedDict()
+        self.pending = {}
+        self.server = None
+        self.flusher = None
+        self.tasks = set()
+
+    async def start(self, host, port):
+        """Start listening and flushing batches; raises ValueError for a LAN address without a token"""
+        if not self.token and not is_loopback(host):
+            raise ValueError(f"refusing to listen on {host} without a token")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        self.flusher = asyncio.ensure_future(self.flush_forever())
+        print(f"Detection ingestion listening on http://{host}:{port}/detections")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.flusher:
+            self.flusher.cancel()
+        await self.flush()
+
+    def is_duplicate(self, event):
+        """Remember (node, event id) and report whether it was seen before"""
+        key = (str(event["node_id"]), str(event["event_id"]))
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            return True
+        self.seen[key] = True
+        if len(self.seen) > SEEN_EVENTS:
+            self.seen.popitem(last=False)
+        return False
+
+    def accept(self, event, image):
+        """Queue an event, keeping only the best one per node/camera/class in the window"""
+        if self.is_duplicate(event):
+            INGEST_EVENTS.inc(result="duplicate")
+            return "duplicate"
+        INGEST_EVENTS.inc(result="accepted")
+        key = (str(event["node_id"]), str(event.get("camera", "")), str(event["class"]))
+        queued = self.pending.get(key)
+        if queued:
+            # One of the two is dropped in favour of the higher score
+            INGEST_EVENTS.inc(result="coalesced")
+            if queued[0]["score"] >= event["score"]:
+                return "coalesced"
+        self.pending[key] = (event, image)
+        return "queued"
+
+    async def flush_forever(self):
+        while True:
+            await asyncio.sleep(self.batch_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing ingested detections: {e}")
+
+    async def flush(self):
+        """Write the pending events to disk and hand them to the bot"""
+        batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        INGEST_BATCH.set(len(batch))
+        for event, image in batch.values():
+            photo_path = self.write_event(event, image)
+            task = asyncio.ensure_future(self.deliver(photo_path))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def deliver(self, photo_path):
+        """Hand one event to the bot, then delete its files (the bot keeps its own backup)"""
+        try:
+            await self.on_detection(photo_path)
+        finally:
+            for path in (photo_path, os.path.splitext(photo_path)[0] + ".json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def write_event(self, event, image):
+        """Save the image and its sidecar metadata, image last"""
+        # One file per event, so a new batch never overwrites one the bot is still reading
+        parts = [event["class"], event["node_id"], event.get("camera"), event["event_id"]]
+        name = SAFE_NAME.sub("_", "_".join(str(part) for part in parts if part))
+        photo_path = os.path.join(self.output_dir, f"{name}.jpg")
+        meta = {
+            "class": event["class"],
+            "node": event["node_id"],
+            "camera": event.get("camera"),
+            "score": event["score"],
+            "box": event.get("box"),
+            "time": event.get("time"),
+        }
+        with open(os.path.join(self.output_dir, f"{name}.json"), "w") as meta_file:
+            json.dump(meta, meta_file)
+        temp_path = photo_path + ".tmp"
+        with open(temp_path, "wb") as photo_file:
+            photo_file.write(image)
+        os.replace(temp_path, photo_path)
+        return photo_path
+
+    async def read_head(self, reader):
+        """Request line words and lower-cased headers"""
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    def authorized(self, headers):
+        expected = f"Bearer {self.token}".encode("utf-8")
+        return hmac.compare_digest(headers.get("authorization", "").encode("utf-8"), expected)
+
+    async def handle_connection(self, reader, writer):
+        """Serve one HTTP/1.1 request and close the connection"""
+        status, payload = 500, {"error": "Internal error"}
+        started = time.perf_counter()
+        try:
+            # Idle or slow clients must not hold a connection forever
+            request_line, headers = await asyncio.wait_for(self.read_head(reader), REQUEST_TIMEOUT)
+            if len(request_line) < 2 or request_line[0] != "POST" or request_line[1].split("?")[0] != "/detections":
+                raise IngestError(404, "POST /detections only")
+            if self.token and not self.authorized(headers):
+                raise IngestError(401, "Invalid token")
+            length = int(headers.get("content-length", "0") or 0)
+            if length <= 0 or length > MAX_BODY_BYTES:
+                raise IngestError(413 if length > MAX_BODY_BYTES else 411, "Bad content length")
+
+            body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT)
+            event, image = parse_event(body, self.classes)
+            status, payload = 202, {"status": self.accept(event, image)}
+        except IngestError as e:
+            INGEST_EVENTS.inc(result="rejected")
+            status, payload = e.status, {"error": str(e)}
+        except asyncio.TimeoutError:
+            INGEST_EVENTS.inc(result="rejected")
+            status, payload = 408, {"error": "Request timed out"}
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            INGEST_EVENTS.inc(result="rejected")
+            status, payload = 400, {"error": f"Malformed request: {e}"}
+        except Exception as e:
+            print(f"Error handling ingestion request: {e}")
+        finally:
+            INGEST_SECONDS.observe(time.perf_counter() - started)
+
+        body = json.dumps(payload).encode("utf-8")
+        reason = {202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                  408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large"}.get(status, "Error")
+        try:
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+if __name__ == "__main__":
+    # Local stand-in run: several fake nodes post events (with retries and bursts)
+    # to a real listener; prints what reaches the bot callback.
+    import sys
+    import tempfile
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "camera"))
+    import uplink
+
+    async def demo():
+        delivered = []
+
+        async def on_detection(photo_path):
+            delivered.append(photo_path)
+
+        service = IngestService(on_detection, token="demo", output_dir=tempfile.mkdtemp(), batch_seconds=0.5)
+        await service.start("127.0.0.1", 18088)
+        image = b"\xff\xd8" + os.urandom(2048)
+        loop = asyncio.get_running_loop()
+
+        def post_all():
+            results = []
+            for node in range(5):
+                for burst in range(4):
+                    meta = {"class": "Pig", "camera": "picam0", "score": 0.5 + burst / 10, "event_id": f"n{node}-e{burst}"}
+                    for attempt in range(2):  # Every event is sent twice, like a retry after a timeout
+                        results.append(uplink.post_detection("http://127.0.0.1:18088/detections", f"node{node}", meta, image, token="demo"))
+            return results
+
+        results = await loop.run_in_executor(None, post_all)
+        await asyncio.sleep(1)
+        await service.stop()
+        print(f"Posted {len(results)} requests: {sum(1 for r in results if r == 'duplicate')} duplicates, "
+              f"{sum(1 for r in results if r == 'coalesced')} coalesced, {len(delivered)} detections delivered")
+        for line in metrics.summarize(metrics.parse_text(metrics.REGISTRY.render())):
+            print(f"  {line}")
+
+    asyncio.run(demo())
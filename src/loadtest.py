@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Load-test harness: drives bot.py's registered handlers with synthetic
+# NewMessage/CallbackQuery events from N simulated users against the fake
+# Telegram client, then broadcasts detections and has users confirm them.
+#   python loadtest.py --users 200 --rounds 3 --alerts 3
+# Runs in a scratch directory so the real databases are never touched.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class FakeReply:
+    """Message returned by event.reply(), editable like a Telethon message"""
+    def __init__(self, chat):
+        self.chat = chat
+
+    async def edit(self, text=None, buttons=None, **kwargs):
+        await self.chat.network()
+
+    async def delete(self):
+        await self.chat.network()
+
+class FakeEventMessage:
+    """The event.message of an incoming text message"""
+    def __init__(self, text):
+        self.text = text
+        self.message = text
+
+class SimulatedChat:
+    """Network behaviour shared by all events of one simulated user"""
+    def __init__(self, chat_id, latency):
+        self.chat_id = chat_id
+        self.latency = latency
+
+    async def network(self):
+        await asyncio.sleep(self.latency)
+
+class FakeNewMessage:
+    """Stand-in for events.NewMessage.Event with the attributes the handlers use"""
+    def __init__(self, chat, text):
+        self.chat = chat
+        self.chat_id = chat.chat_id
+        self.message = FakeEventMessage(text)
+        self.pattern_match = None
+
+    async def reply(self, text=None, buttons=None, **kwargs):
+        await self.chat.network()
+        return FakeReply(self.chat)
+
+    async def delete(self):
+        await self.chat.network()
+
+class FakeCallbackQuery:
+    """Stand-in for events.CallbackQuery.Event"""
+    def __init__(self, chat, data, client=None, message_id=None):
+        self.chat = chat
+        self.chat_id = chat.chat_id
+        self.data = data
+        self.data_match = self.pattern_match = None
+        self.client = client
+        self.message_id = message_id
+
+    async def edit(self, text=None, buttons=None, **kwargs):
+        await self.chat.network()
+
+    async def answer(self, message=None, alert=False, **kwargs):
+        await self.chat.network()
+
+    async def delete(self):
+        # Deleting the alert is how the bot marks it as answered
+        if self.client is not None:
+            await self.client.delete_messages(self.chat_id, self.message_id)
+        else:
+            await self.chat.network()
+
+class HandlerRouter:
+    """Match synthetic events against the bot's registered event builders"""
+    def __init__(self, handlers):
+        from telethon import events
+        self.message_handlers = [(callback, builder) for callback, builder in handlers if isinstance(builder, events.NewMessage)]
+        self.callback_handlers = [(callback, builder) for callback, builder in handlers if isinstance(builder, events.CallbackQuery)]
+        self.latencies = {}
+        self.errors = 0
+
+    def matching(self, event):
+        """Return the handlers that Telethon would run for this event, in order"""
+        if isinstance(event, FakeNewMessage):
+            matched = []
+            for callback, builder in self.message_handlers:
+                if builder.pattern:
+                    match = builder.pattern(event.message.text)
+                    if not match:
+                        continue
+                    event.pattern_match = match
+                matched.append(callback)
+            return matched
+
+        matched = []
+        for callback, builder in self.callback_handlers:
+            if callable(builder.match):
+                event.data_match = event.pattern_match = builder.match(event.data)
+                if not event.data_match:
+                    continue
+            elif builder.match and builder.match != event.data:
+                continue
+            matched.append(callback)
+        return matched
+
+    async def dispatch(self, event):
+        """Run every matching handler like Telethon does and record latencies"""
+        for callback in self.matching(event):
+            started = time.perf_counter()
+            try:
+                await callback(event)
+            except Exception as e:
+                self.errors += 1
+                print(f"Handler {callback.__name__} raised: {e}")
+            self.latencies.setdefault(callback.__name__, []).append(time.perf_counter() - started)
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+async def simulate_user(router, chat, rounds, think_time):
+    """Sign up, then use the panel for a number of rounds"""
+    user_number = chat.chat_id % 10 ** 9
+    script = [
+        FakeNewMessage(chat, "/start"),
+        FakeCallbackQuery(chat, b"sign_login_btn"),
+        FakeCallbackQuery(chat, b"sign_up"),
+        FakeNewMessage(chat, f"9{user_number:09d}"),
+        FakeNewMessage(chat, "Farmer"),
+        FakeNewMessage(chat, "Field1@"),
+    ]
+    for _ in range(rounds):
+        script += [
+            FakeCallbackQuery(chat, b"info"),
+            FakeCallbackQuery(chat, b"back_panel"),
+            FakeCallbackQuery(chat, b"lightswitch"),
+            FakeCallbackQuery(chat, b"buzzerswitch"),
+            FakeCallbackQuery(chat, b"refresh"),
+        ]
+    for event in script:
+        await router.dispatch(event)
+        await asyncio.sleep(random.uniform(0, think_time))
+
+async def confirm_alerts(router, bot, fake, chats, detected_name, answer_rate):
+    """Have a share of users press Yes/No on the alert during the review window"""
+    async def confirm(chat):
+        await asyncio.sleep(random.uniform(0, bot.REVIEW_SECONDS * 0.8))
+        # Wait for this user's alert to arrive before answering it
+        while True:
+            alerts = [message.id for (chat_id, _), message in fake.messages.items() if chat_id == chat.chat_id and message.file]
+            if alerts:
+                break
+            await asyncio.sleep(0.05)
+        data = random.choice([b"correct_", b"incorrect_"]) + detected_name.encode()
+        await router.dispatch(FakeCallbackQuery(chat, data, fake, alerts[-1]))
+    await asyncio.gather(*(confirm(chat) for chat in chats if random.random() < answer_rate))
+
+async def measure_loop_lag(samples, stop):
+    """Record how late the event loop wakes up; high values mean blocking calls"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - started - 0.01)
+
+def make_test_photo(path):
+    """Write a synthetic full-resolution JPEG like the camera's"""
+    from PIL import Image
+    image = Image.effect_noise((2304, 1296), 64).convert("RGB")
+    image.save(path, quality=90)
+
+async def run(args):
+    import bot
+    import metrics
+    from fake_client import FakeTelegramClient
+
+    fake = FakeTelegramClient(latency=args.latency, jitter=args.latency / 2)
+    router = HandlerRouter(bot.client.list_event_handlers())
+    # Handlers look up `client` at call time, so swapping the module globals is enough
+    bot.client = fake
+    bot.outbound.client = fake
+    bot.REVIEW_SECONDS = args.review
+    bot.ensure_tables_exist()
+
+    chats = [SimulatedChat(1000000 + i, args.latency) for i in range(args.users)]
+    lag_samples, stop = [], asyncio.Event()
+    lag_task = asyncio.ensure_future(measure_loop_lag(lag_samples, stop))
+
+    print(f"Simulating {args.users} users, {args.rounds} panel rounds each...")
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate_user(router, chat, args.rounds, args.think_time) for chat in chats))
+    signup_seconds = time.perf_counter() - started
+    print(f"Logged in farmers: {len(bot.subscription_index.chats())}")
+
+    os.makedirs(bot.PHOTO_PATH, exist_ok=True)
+    photo_path = os.path.join(bot.PHOTO_PATH, "Pig.jpg")
+    make_test_photo(photo_path)
+
+    print(f"Broadcasting {args.alerts} alerts with a {args.review}s review window...")
+    broadcast_started = time.perf_counter()
+    for _ in range(args.alerts):
+        await asyncio.gather(
+            bot.send_detection_photo_to_all(photo_path, bot.subscription_index.chats()),
+            confirm_alerts(router, bot, fake, chats, "Pig", args.answer_rate),
+        )
+    broadcast_seconds = time.perf_counter() - broadcast_started
+
+    stop.set()
+    await lag_task
+    await bot.outbound.stop()
+
+    events_handled = sum(len(values) for values in router.latencies.values())
+    print(f"\n=== Handler latency ({events_handled} handler runs in {signup_seconds:.1f}s, "
+          f"{events_handled / signup_seconds:.0f}/s, {router.errors} errors) ===")
+    print(f"{'handler':<24}{'runs':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, values in sorted(router.latencies.items()):
+        print(f"{name:<24}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+
+    print(f"\n=== Broadcast ===")
+    print(f"{args.alerts} alerts to {args.users} users in {broadcast_seconds:.1f}s "
+          f"(includes {args.review}s review window each), {len(fake.sent('send_file'))} photos sent")
+
+    print(f"\n=== Contention ===")
+    if lag_samples:
+        print(f"Event loop lag: p50 {percentile(lag_samples, 0.5) * 1000:.1f} ms, "
+              f"p99 {percentile(lag_samples, 0.99) * 1000:.1f} ms, max {max(lag_samples) * 1000:.1f} ms")
+    for line in metrics.summarize(metrics.parse_text(metrics.REGISTRY.render())):
+        if line.startswith(("wilddetect_db", "wilddetect_outbound", "wilddetect_broadcast", "wilddetect_flood")):
+            print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the bot's handlers with simulated users")
+    parser.add_argument("--users", type=int, default=100, help="Number of simulated farmers")
+    parser.add_argument("--rounds", type=int, default=3, help="Panel interaction rounds per user")
+    parser.add_argument("--alerts", type=int, default=2, help="Detection broadcasts after sign-up")
+    parser.add_argument("--review", type=float, default=3, help="Review window in seconds (bot default is 60)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated Telegram latency in seconds")
+    parser.add_argument("--think-time", type=float, default=0.05, help="Max pause between a user's actions")
+    parser.add_argument("--answer-rate", type=float, default=0.7, help="Share of users confirming each alert")
+    args = parser.parse_args()
+
+    # Simulated hardware, placeholder credentials and a scratch working directory
+    os.environ["WILDDETECT_SIMULATE"] = "1"
+    os.environ.setdefault("WILDDETECT_API_ID", "1")
+    os.environ.setdefault("WILDDETECT_API_HASH", "loadtest")
+    sys.path.insert(0, SRC_DIR)
+    workdir = tempfile.mkdtemp(prefix="wilddetect_load_")
+    os.makedirs(os.path.join(workdir, "src"))
+    os.chdir(os.path.join(workdir, "src"))
+    print(f"Working directory: {os.getcwd()}")
+
+    asyncio.run(run(args))
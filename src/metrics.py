@@ -0,0 +1,245 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal in-process metrics (counters, gauges, latency histograms) rendered in
+# the Prometheus text format and served on a local HTTP endpoint.
+# Shared by the bot and the camera; each process has its own registry.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def escape_label_value(value):
+    """Escape backslash, double quote and newline as the text format requires"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def unescape_label_value(value):
+    return re.sub(r'\\(.)', lambda match: "\n" if match.group(1) == "n" else match.group(1), value)
+
+def format_labels(labels):
+    """Render a label dict as {key="value",...}"""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{escape_label_value(value)}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+class Metric:
+    """Base class holding one value per label combination"""
+    kind = "untyped"
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down, e.g. a queue depth"""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Timer:
+    """Context manager observing the elapsed time into a histogram"""
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+class Histogram(Metric):
+    """Latency distribution with cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def time(self, **labels):
+        return Timer(self, labels)
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, state in self.values.items():
+                labels = dict(key)
+                for bound, count in zip(self.buckets, state["counts"]):
+                    samples.append((f"{self.name}_bucket", dict(labels, le=repr(float(bound))), count))
+                samples.append((f"{self.name}_bucket", dict(labels, le="+Inf"), state["count"]))
+                samples.append((f"{self.name}_sum", labels, state["sum"]))
+                samples.append((f"{self.name}_count", labels, state["count"]))
+        return samples
+
+class Registry:
+    """Collection of named metrics; metrics are created on first request"""
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, **kwargs)
+            return metric
+
+    def counter(self, name, documentation=""):
+        return self._get(Counter, name, documentation)
+
+    def gauge(self, name, documentation=""):
+        return self._get(Gauge, name, documentation)
+
+    def histogram(self, name, documentation="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, documentation, buckets=buckets)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the registry on GET /metrics"""
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are too frequent to print
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve /metrics from a daemon thread and return the server"""
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics served on http://{host}:{port}/metrics")
+    return server
+
+SAMPLE_PATTERN = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$')
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def parse_text(text):
+    """Parse Prometheus text into (name, labels, value) samples"""
+    samples = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_PATTERN.match(line.strip())
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        try:
+            parsed = {key: unescape_label_value(raw) for key, raw in LABEL_PATTERN.findall(labels or "")}
+            samples.append((name, parsed, float(value)))
+        except ValueError:
+            continue
+    return samples
+
+def histogram_quantile(quantile, buckets):
+    """Estimate a quantile from cumulative (upper bound, count) buckets"""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return None
+    rank = quantile * total
+    previous_bound, previous_count = 0.0, 0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return previous_bound
+            # Linear interpolation inside the bucket, as Prometheus does
+            in_bucket = count - previous_count
+            fraction = (rank - previous_count) / in_bucket if in_bucket else 0
+            return previous_bound + (bound - previous_bound) * fraction
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+def summarize(samples):
+    """Turn parsed samples into short human-readable lines for the bot"""
+    lines = []
+    histograms = {}
+    for name, labels, value in samples:
+        if name.endswith("_bucket"):
+            base = name[:-len("_bucket")]
+            bound = float("inf") if labels.get("le") == "+Inf" else float(labels.get("le", 0))
+            key = (base, tuple(sorted((k, v) for k, v in labels.items() if k != "le")))
+            histograms.setdefault(key, {"buckets": [], "sum": 0.0, "count": 0})["buckets"].append((bound, value))
+        elif name.endswith(("_sum", "_count")) and (name.rsplit("_", 1)[0], tuple(sorted(labels.items()))) in histograms:
+            base, field = name.rsplit("_", 1)
+            histograms[(base, tuple(sorted(labels.items())))][field] = value
+        else:
+            lines.append(f"{name}{format_labels(labels)} = {value:g}")
+
+    for (base, labels), state in histograms.items():
+        if not state["count"]:
+            continue
+        p95 = histogram_quantile(0.95, state["buckets"])
+        p95_text = f", p95 {p95 * 1000:.0f} ms" if p95 is not None else ""
+        lines.append(
+            f"{base}{format_labels(dict(labels))}: n={state['count']:g}, "
+            f"avg {state['sum'] / state['count'] * 1000:.0f} ms{p95_text}"
+        )
+    return sorted(lines)
@@ -0,0 +1,258 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime
+import metrics
+
+# Disk-backed outbox for alerts that couldn't be delivered (internet down).
+# Each alert image is stored once with one recipient row per chat. On reconnect
+# recent alerts are replayed individually, while stale or numerous ones are
+# folded into a single digest per chat. Total image bytes are capped and the
+# oldest alerts are evicted first.
+
+OUTBOX_PATH = "data/outbox.db"
+MAX_BYTES = 50 * 1024 * 1024   # Image bytes kept on disk
+STALE_SECONDS = 15 * 60        # Older alerts only appear in the digest
+MAX_REPLAYS = 3                # More fresh alerts than this are digested too
+DIGEST_PHOTOS = 10             # Telegram album limit
+
+OUTBOX_ALERTS = metrics.gauge("wilddetect_outbox_alerts", "Undelivered alerts stored by store")
+OUTBOX_BYTES = metrics.gauge("wilddetect_outbox_bytes", "Image bytes stored by store")
+OUTBOX_EVICTED = metrics.counter("wilddetect_outbox_evicted_total", "Alerts dropped to stay within the size limit by store")
+OUTBOX_DELIVERED = metrics.counter("wilddetect_outbox_delivered_total", "Deliveries by store and kind (replay or digest)")
+
+def is_offline_error(error):
+    """True for errors that mean Telegram is unreachable rather than a bad request"""
+    return isinstance(error, (ConnectionError, OSError, asyncio.TimeoutError))
+
+def plan_delivery(items, now, stale_seconds=STALE_SECONDS, max_replays=MAX_REPLAYS):
+    """
+    Split one chat's pending alerts into individual replays and a digest.
+
+    Args:
+        items: Pending alerts as dicts with at least a "created" timestamp
+        now: Current time (seconds since the epoch)
+        stale_seconds: Age after which an alert is only summarized
+        max_replays: Largest number of fresh alerts sent one by one
+
+    Returns:
+        (replay, digest) lists; a digest of a single alert is replayed instead
+    """
+    fresh = [item for item in items if now - item["created"] <= stale_seconds]
+    stale = [item for item in items if now - item["created"] > stale_seconds]
+    if len(fresh) > max_replays:
+        stale, fresh = items, []
+    if len(stale) == 1:
+        fresh, stale = sorted(fresh + stale, key=lambda item: item["created"]), []
+    return fresh, stale
+
+def digest_everything(items, now):
+    """Delivery plan for stores that only ever send digests"""
+    return [], list(items)
+
+def digest_caption(items):
+    """Summary text for alerts that arrived while the bot was offline"""
+    counts = Counter(item["name"] for item in items)
+    first = datetime.fromtimestamp(min(item["created"] for item in items)).strftime("%Y-%m-%d %H:%M")
+    last = datetime.fromtimestamp(max(item["created"] for item in items)).strftime("%Y-%m-%d %H:%M")
+    lines = [f"📴 {len(items)} detections while the bot was offline ({first} – {last}):"]
+    lines += [f"• {name}: {count}" for name, count in counts.most_common()]
+    return "\n".join(lines)
+
+class Outbox:
+    """SQLite store of undelivered alerts and their recipients"""
+    def __init__(self, db_path=OUTBOX_PATH, max_bytes=MAX_BYTES, store="outbox"):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.store = store  # Metrics label, for other stores built on this one
+        self.draining = False
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox_alert (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created REAL,
+                    name TEXT,
+                    caption TEXT,
+                    entry INTEGER,
+                    image BLOB,
+                    size INTEGER
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox_recipient (
+                    alert_id INTEGER,
+                    chat_id INTEGER,
+                    PRIMARY KEY (alert_id, chat_id)
+                ) WITHOUT ROWID
+            ''')
+        self.update_gauges()
+
+    def add(self, name, caption, image_bytes, chat_ids, entry=None, created=None):
+        """Store one alert for the given chats and evict old alerts past the size limit"""
+        if not chat_ids:
+            return None
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO outbox_alert (created, name, caption, entry, image, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (created or time.time(), name, caption, entry, sqlite3.Binary(image_bytes), len(image_bytes))
+            )
+            alert_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT OR IGNORE INTO outbox_recipient (alert_id, chat_id) VALUES (?, ?)",
+                [(alert_id, chat_id) for chat_id in chat_ids]
+            )
+            self._evict(cursor)
+        self.update_gauges()
+        return alert_id
+
+    def _evict(self, cursor):
+        total = cursor.execute("SELECT COALESCE(SUM(size), 0) FROM outbox_alert").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = cursor.execute("SELECT id, size FROM outbox_alert ORDER BY created, id LIMIT 1").fetchone()
+            if not oldest:
+                break
+            cursor.execute("DELETE FROM outbox_recipient WHERE alert_id = ?", (oldest[0],))
+            cursor.execute("DELETE FROM outbox_alert WHERE id = ?", (oldest[0],))
+            total -= oldest[1]
+            OUTBOX_EVICTED.inc(store=self.store)
+
+    def pending(self):
+        """Pending alerts grouped by chat, oldest first"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT r.chat_id, a.id, a.created, a.name, a.caption, a.entry
+                FROM outbox_recipient r JOIN outbox_alert a ON a.id = r.alert_id
+                ORDER BY a.created, a.id
+            ''').fetchall()
+        by_chat = {}
+        for chat_id, alert_id, created, name, caption, entry in rows:
+            by_chat.setdefault(chat_id, []).append(
+                {"id": alert_id, "created": created, "name": name, "caption": caption, "entry": entry}
+            )
+        return by_chat
+
+    def image(self, alert_id):
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT image FROM outbox_alert WHERE id = ?", (alert_id,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def delivered(self, chat_id, alert_ids):
+        """Forget delivered alerts for a chat and drop alerts nobody is waiting for"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                "DELETE FROM outbox_recipient WHERE alert_id = ? AND chat_id = ?",
+                [(alert_id, chat_id) for alert_id in alert_ids]
+            )
+            conn.execute("DELETE FROM outbox_alert WHERE id NOT IN (SELECT alert_id FROM outbox_recipient)")
+        self.update_gauges()
+
+    def update_gauges(self):
+        with sqlite3.connect(self.db_path) as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outbox_alert").fetchone()
+        OUTBOX_ALERTS.set(count, store=self.store)
+        OUTBOX_BYTES.set(size, store=self.store)
+        return count
+
+    async def drain(self, client, outbound, priority, buttons_for=None, now=None,
+                    plan=plan_delivery, caption_for=digest_caption, chat_filter=None):
+        """
+        Deliver everything pending: fresh alerts one by one, the rest as one digest album per chat.
+
+        Args:
+            client: Telegram client used to upload each stored image once
+            outbound: OutboundScheduler the sends are queued on
+            priority: Outbound priority for the catch-up messages
+            buttons_for: Optional callable(item) returning buttons for a replayed alert
+            now: Override of the current time, for tests
+            plan: Callable(items, now) splitting a chat's items into (replay, digest)
+            caption_for: Callable(items) giving the digest album's caption
+            chat_filter: Optional callable(chat_id); chats it rejects keep their alerts for later
+
+        Returns:
+            Number of chats that still have undelivered alerts
+        """
+        if self.draining:
+            return None
+        self.draining = True
+        try:
+            now = now or time.time()
+            by_chat = self.pending()
+            if chat_filter:
+                by_chat = {chat_id: items for chat_id, items in by_chat.items() if chat_filter(chat_id)}
+            uploads = {}
+
+            async def uploaded(alert_id):
+                # Each stored image is uploaded once and the handle reused for every chat
+                if alert_id not in uploads:
+                    uploads[alert_id] = asyncio.ensure_future(
+                        client.upload_file(self.image(alert_id), file_name=f"alert_{alert_id}.jpg")
+                    )
+                return await uploads[alert_id]
+
+            async def deliver(chat_id, items):
+                replay, digest = plan(items, now)
+                try:
+                    for item in replay:
+                        await outbound.send_file(
+                            chat_id, await uploaded(item["id"]), priority=priority,
+                            caption=f"⏱ Delayed alert\n{item['caption']}",
+                            buttons=buttons_for(item) if buttons_for else None
+                        )
+                        self.delivered(chat_id, [item["id"]])
+                        OUTBOX_DELIVERED.inc(store=self.store, kind="replay")
+                    if digest:
+                        # Latest photo of each class, newest classes first
+                        latest = {}
+                        for item in digest:
+                            latest[item["name"]] = item
+                        photos = sorted(latest.values(), key=lambda item: -item["created"])[:DIGEST_PHOTOS]
+                        files = [await uploaded(item["id"]) for item in photos]
+                        captions = [caption_for(digest)] + [""] * (len(files) - 1)
+                        await outbound.send_file(chat_id, files, priority=priority, caption=captions)
+                        self.delivered(chat_id, [item["id"] for item in digest])
+                        OUTBOX_DELIVERED.inc(store=self.store, kind="digest")
+                    return True
+                except Exception as e:
+                    print(f"Error delivering outbox to {chat_id}: {e}")
+                    return False
+
+            results = await asyncio.gather(*(deliver(chat_id, items) for chat_id, items in by_chat.items()))
+            return sum(1 for ok in results if not ok)
+        finally:
+            self.draining = False
+
+if __name__ == "__main__":
+    # Self-check against the fake client: fill the outbox while "offline",
+    # then drain it and show what each chat receives.
+    import tempfile
+    import sender
+    from fake_client import FakeTelegramClient
+
+    async def demo():
+        client = FakeTelegramClient(latency=0.05)
+        outbound = sender.OutboundScheduler(client, per_chat_interval=0.2)
+        outbox = Outbox(os.path.join(tempfile.mkdtemp(), "outbox.db"), max_bytes=2 * 1024 * 1024)
+        now = time.time()
+        chats = list(range(1, 21))
+        for minute in range(120, 0, -2):  # Two hours offline, an alert every two minutes
+            name = ["Pig", "Nilgai", "Jackal"][minute % 3]
+            outbox.add(name, f"🕵🏻‍♂️ Detected as: {name}", os.urandom(60 * 1024), chats, created=now - minute * 60)
+        print(f"Outbox holds {outbox.update_gauges()} alerts for {len(chats)} chats")
+
+        started = time.perf_counter()
+        failed = await outbox.drain(client, outbound, sender.PRIORITY_ALERT)
+        print(f"Drained in {time.perf_counter() - started:.2f}s, {failed} chats failed, "
+              f"{len(client.sent('upload_file'))} uploads, {len(client.sent('send_file'))} messages sent")
+        print(f"Alerts left: {outbox.update_gauges()}")
+        for line in metrics.summarize(metrics.parse_text(metrics.REGISTRY.render())):
+            if line.startswith("wilddetect_outbox"):
+                print(f"  {line}")
+        await outbound.stop()
+
+    asyncio.run(demo())
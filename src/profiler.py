@@ -0,0 +1,253 @@
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from datetime import datetime
+
+# On-demand profiling for the bot (asyncio) and the camera (signal-triggered).
+# Reports go to a folder shared by both processes so the bot can send them.
+
+PROFILE_DIR = "../profiles"
+DEFAULT_SECONDS = 15
+MAX_SECONDS = 120
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+SLOW_CALLBACK_SECONDS = 0.1
+CAMERA_REQUEST_FILE = "camera_request.json"  # Duration requested by the bot for the camera
+
+def format_cpu_profile(profiler, limit=TOP_FUNCTIONS):
+    """Render the top functions of a cProfile run by cumulative time"""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+def format_allocations(snapshot, limit=TOP_ALLOCATIONS):
+    """Render the top allocation sites of a tracemalloc snapshot"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.statistics("lineno")
+    total = sum(stat.size for stat in stats)
+    lines = [f"Total traced: {total / 1024:.1f} KiB in {len(stats)} sites"]
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines)
+
+def format_thread_stacks():
+    """Render the current stack of every thread"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = []
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"--- Thread {names.get(ident, ident)} ---")
+        lines.extend(line.rstrip() for line in traceback.format_stack(frame))
+    return "\n".join(lines)
+
+def format_tasks():
+    """Render every pending asyncio task with its current coroutine frame"""
+    lines = []
+    tasks = sorted(asyncio.all_tasks(), key=lambda task: task.get_name())
+    for task in tasks:
+        coro = task.get_coro()
+        frames = task.get_stack(limit=1)
+        where = f"{frames[0].f_code.co_filename}:{frames[0].f_lineno}" if frames else "not started"
+        lines.append(f"{task.get_name()}: {getattr(coro, '__qualname__', coro)} at {where}")
+    return f"{len(tasks)} tasks\n" + "\n".join(lines)
+
+def write_report(prefix, sections, output_dir=PROFILE_DIR):
+    """Write report sections to a timestamped text file and return its path"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    with open(path, "w") as report:
+        for title, body in sections:
+            report.write(f"===== {title} =====\n{body}\n\n")
+    return path
+
+class SlowCallbackCollector(logging.Handler):
+    """Collect asyncio's debug-mode 'Executing ... took N seconds' warnings"""
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.records = []
+
+    def emit(self, record):
+        message = record.getMessage()
+        if "took" in message:
+            self.records.append(message)
+
+async def profile_event_loop(seconds=DEFAULT_SECONDS, output_dir=PROFILE_DIR):
+    """
+    Profile the running bot for a fixed time window.
+
+    Captures a CPU profile of the event loop thread, asyncio callbacks slower
+    than SLOW_CALLBACK_SECONDS, pending tasks and top memory allocations.
+
+    Args:
+        seconds (int): Length of the profiling window
+        output_dir (str): Folder for the report
+
+    Returns:
+        str: Path of the written report
+    """
+    loop = asyncio.get_running_loop()
+    previous_debug = loop.get_debug()
+    previous_slow = loop.slow_callback_duration
+    collector = SlowCallbackCollector()
+    asyncio_logger = logging.getLogger("asyncio")
+    started_tracing = not tracemalloc.is_tracing()
+
+    asyncio_logger.addHandler(collector)
+    loop.set_debug(True)
+    loop.slow_callback_duration = SLOW_CALLBACK_SECONDS
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        loop.set_debug(previous_debug)
+        loop.slow_callback_duration = previous_slow
+        asyncio_logger.removeHandler(collector)
+
+    slow = "\n".join(collector.records) or f"No callbacks slower than {SLOW_CALLBACK_SECONDS}s"
+    return write_report("bot", [
+        ("Summary", f"Bot profile over {time.perf_counter() - started:.1f}s, pid {os.getpid()}"),
+        ("CPU (event loop thread)", format_cpu_profile(profiler)),
+        ("Slow callbacks", slow),
+        ("Asyncio tasks", format_tasks()),
+        ("Top allocations", format_allocations(snapshot)),
+        ("Thread stacks", format_thread_stacks()),
+    ], output_dir)
+
+class SignalProfiler:
+    """Profile a synchronous process for a time window when it receives a signal"""
+    def __init__(self, prefix, output_dir=PROFILE_DIR, default_seconds=DEFAULT_SECONDS):
+        self.prefix = prefix
+        self.output_dir = output_dir
+        self.default_seconds = default_seconds
+        self.profiler = None
+
+    def install(self, signum=signal.SIGUSR1):
+        """Start a profile on `signum`; SIGALRM ends it"""
+        signal.signal(signum, self._start)
+        signal.signal(signal.SIGALRM, self._stop)
+
+    def requested_seconds(self):
+        """Read the duration the bot asked for, if any"""
+        try:
+            with open(os.path.join(self.output_dir, CAMERA_REQUEST_FILE), "r") as request:
+                seconds = int(json.load(request).get("seconds", self.default_seconds))
+        except (OSError, ValueError, AttributeError):
+            return self.default_seconds
+        return max(1, min(MAX_SECONDS, seconds))
+
+    def _start(self, signum, frame):
+        if self.profiler is not None:
+            return  # Already profiling
+        seconds = self.requested_seconds()
+        print(f"Profiling for {seconds}s...")
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+        # Signal handlers run in the main thread, which is the one being profiled
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        signal.alarm(seconds)
+
+    def _stop(self, signum, frame):
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if self.started_tracing:
+            tracemalloc.stop()
+        try:
+            path = write_report(self.prefix, [
+                ("Summary", f"{self.prefix} profile over {time.perf_counter() - self.started:.1f}s, pid {os.getpid()}"),
+                ("CPU (main thread)", format_cpu_profile(self.profiler)),
+                ("Top allocations", format_allocations(snapshot)),
+                ("Thread stacks", format_thread_stacks()),
+            ], self.output_dir)
+            print(f"Profile report saved: {path}")
+        except Exception as e:
+            print(f"Error writing profile report: {e}")
+        self.profiler = None
+
+def parent_pid(pid):
+    """Parent of a process from /proc/<pid>/stat, or None"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as stat_file:
+            # The command name may contain spaces; the fields after it don't
+            return int(stat_file.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+def find_pids(script_name):
+    """
+    Find processes whose command line runs `script_name`.
+
+    Forked children (the camera's inference workers) share their parent's
+    command line, so processes whose parent also matches are left out.
+    """
+    pids = []
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as cmdline_file:
+                args = cmdline_file.read().split(b"\0")
+        except OSError:
+            continue
+        if any(os.path.basename(arg.decode(errors="ignore")) == script_name for arg in args[1:3]):
+            pids.append(int(pid))
+    return [pid for pid in pids if parent_pid(pid) not in pids]
+
+async def profile_camera(seconds=DEFAULT_SECONDS, output_dir=PROFILE_DIR, script_name="camera.py"):
+    """
+    Ask the running camera process for a profile and wait for its report.
+
+    Returns:
+        str: Path of the report, or None if the camera isn't running or didn't answer
+    """
+    pids = find_pids(script_name)
+    if not pids:
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, CAMERA_REQUEST_FILE), "w") as request:
+        json.dump({"seconds": seconds}, request)
+
+    requested_at = time.time()
+    os.kill(pids[0], signal.SIGUSR1)
+    await asyncio.sleep(seconds)
+
+    # Give the camera time to finish writing the report
+    deadline = time.time() + 15
+    pattern = re.compile(r"^camera_\d{8}_\d{6}\.txt$")
+    while time.time() < deadline:
+        reports = [
+            os.path.join(output_dir, name) for name in os.listdir(output_dir)
+            if pattern.match(name) and os.path.getmtime(os.path.join(output_dir, name)) >= requested_at
+        ]
+        if reports:
+            return max(reports, key=os.path.getmtime)
+        await asyncio.sleep(1)
+    return None
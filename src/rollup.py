@@ -0,0 +1,105 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+# Time-bucketed detection rollups kept next to the all-time `stats` table.
+# Every detection/confirmation bumps one row per granularity, so trend queries
+# read at most one row per bucket instead of rescanning raw history.
+
+STATUSES = ("Detected", "Correct", "Incorrect", "None")
+
+# A "night" runs from NIGHT_START_HOUR until NIGHT_END_HOUR the next morning
+# and is keyed by the date on which it started.
+NIGHT_START_HOUR = 18
+NIGHT_END_HOUR = 6
+
+GRANULARITIES = {
+    "hour": "rollup_hourly",
+    "day": "rollup_daily",
+    "night": "rollup_nightly",
+}
+
+def ensure_rollup_tables(cursor):
+    """Create the rollup tables if they don't exist"""
+    for table in GRANULARITIES.values():
+        # The primary key doubles as the (name, status, bucket) range index
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (name, status, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+def bucket_key(granularity, when):
+    """Return the bucket key for a timestamp, or None if it falls outside the granularity"""
+    if granularity == "hour":
+        return when.strftime("%Y-%m-%d %H:00")
+    if granularity == "day":
+        return when.strftime("%Y-%m-%d")
+    if granularity == "night":
+        if when.hour >= NIGHT_START_HOUR:
+            return when.strftime("%Y-%m-%d")
+        if when.hour < NIGHT_END_HOUR:
+            return (when - timedelta(days=1)).strftime("%Y-%m-%d")
+        return None
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+def record(cursor, name, status, when=None, amount=1):
+    """Add a detection/confirmation to every rollup granularity"""
+    when = when or datetime.now()
+    for granularity, table in GRANULARITIES.items():
+        bucket = bucket_key(granularity, when)
+        if bucket is None:
+            continue
+        cursor.execute(f'''
+            INSERT INTO {table} (name, status, bucket, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name, status, bucket) DO UPDATE SET count = count + excluded.count
+        ''', (name, status, bucket, amount))
+
+def bucket_range(granularity, periods, until=None):
+    """List the bucket keys of the last `periods` buckets, oldest first"""
+    until = until or datetime.now()
+    if granularity == "hour":
+        step = timedelta(hours=1)
+    else:
+        step = timedelta(days=1)
+    if granularity == "night":
+        # During the day the current night hasn't started; anchor on the last one that has
+        latest = bucket_key("night", until) or (until - step).strftime("%Y-%m-%d")
+        until = datetime.strptime(latest, "%Y-%m-%d").replace(hour=NIGHT_START_HOUR)
+    keys = [bucket_key(granularity, until - step * i) for i in range(periods)]
+    return list(reversed(keys))
+
+def series(db_path, name, status="Detected", granularity="day", periods=30, until=None):
+    """
+    Read a per-bucket count series from the rollup tables.
+
+    Args:
+        db_path (str): Path to the stats SQLite database
+        name (str): Detection class, e.g. "Pig"
+        status (str): One of STATUSES
+        granularity (str): "hour", "day" or "night"
+        periods (int): Number of most recent buckets to return
+        until (datetime): End of the range, defaults to now
+
+    Returns:
+        list: (bucket, count) tuples oldest first, zero-filled
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    keys = bucket_range(granularity, periods, until)
+    table = GRANULARITIES[granularity]
+    try:
+        with sqlite3.connect(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT bucket, count FROM {table} WHERE name = ? AND status = ? AND bucket BETWEEN ? AND ?",
+                (name, status, keys[0], keys[-1])
+            )
+            counts = dict(cursor.fetchall())
+    except sqlite3.Error as e:
+        print(f"Rollup query error: {e}")
+        counts = {}
+    return [(key, counts.get(key, 0)) for key in keys]
@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import itertools
+import time
+import metrics
+
+# Central outbound queue for Telegram sends. Jobs run in priority order
+# (alerts before confirmations before exports) under a global rate limit and a
+# per-chat minimum interval, and flood waits pause sending instead of failing.
+
+PRIORITY_ALERT = 0
+PRIORITY_CONFIRMATION = 1
+PRIORITY_EXPORT = 2
+PRIORITY_NAMES = {PRIORITY_ALERT: "alert", PRIORITY_CONFIRMATION: "confirmation", PRIORITY_EXPORT: "export"}
+
+GLOBAL_RATE = 25          # Messages per second across all chats (Telegram allows ~30)
+PER_CHAT_INTERVAL = 1.0   # Seconds between messages to the same chat
+WORKERS = 4               # Concurrent Telegram calls
+MAX_EXPORTS_IN_FLIGHT = 1 # Big uploads never occupy more than one worker
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2.0       # Seconds, doubled on every retry
+
+QUEUE_DEPTH = metrics.gauge("wilddetect_outbound_queue_depth", "Queued outbound Telegram jobs by priority")
+QUEUE_WAIT_SECONDS = metrics.histogram("wilddetect_outbound_wait_seconds", "Time from enqueue to send start by priority")
+OUTBOUND_SENT = metrics.counter("wilddetect_outbound_sent_total", "Completed outbound jobs by priority")
+OUTBOUND_FAILED = metrics.counter("wilddetect_outbound_failed_total", "Outbound jobs given up on by priority")
+TELEGRAM_SECONDS = metrics.histogram("wilddetect_telegram_seconds", "Telegram API call latency by operation")
+FLOOD_WAITS = metrics.counter("wilddetect_flood_waits_total", "Flood waits returned by Telegram")
+FLOOD_WAIT_SECONDS = metrics.counter("wilddetect_flood_wait_seconds_total", "Seconds paused because of flood waits")
+
+def flood_wait_seconds(error):
+    """Return the wait requested by a FloodWaitError-like exception, else None"""
+    seconds = getattr(error, "seconds", None)
+    if isinstance(seconds, (int, float)) and "FloodWait" in type(error).__name__:
+        return seconds
+    return None
+
+class OutboundJob:
+    """One queued Telegram call and the future its caller awaits"""
+    def __init__(self, priority, chat_id, method, args, kwargs, future):
+        self.priority = priority
+        self.chat_id = chat_id
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.started = False
+        self.attempts = 0
+
+class OutboundScheduler:
+    """Priority queue with global/per-chat rate limiting in front of a Telegram client"""
+    def __init__(self, client, global_rate=GLOBAL_RATE, per_chat_interval=PER_CHAT_INTERVAL,
+                 workers=WORKERS, max_retries=MAX_RETRIES):
+        self.client = client
+        self.global_interval = 1.0 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self.worker_count = workers
+        self.max_retries = max_retries
+        self.heap = []
+        self.sequence = itertools.count()
+        self.chat_ready_at = {}
+        self.next_global_at = 0.0
+        self.paused_until = 0.0
+        self.exports_in_flight = 0
+        self.workers = []
+        self.wakeup = None
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self.workers:
+            return
+        self.wakeup = asyncio.Event()
+        self.workers = [asyncio.ensure_future(self._worker()) for _ in range(self.worker_count)]
+
+    async def stop(self):
+        """Cancel the workers and every queued job"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        while self.heap:
+            _, _, job = heapq.heappop(self.heap)
+            QUEUE_DEPTH.dec(priority=PRIORITY_NAMES[job.priority])
+            if not job.future.done():
+                job.future.cancel()
+
+    def depth(self, priority=None):
+        """Number of queued jobs, optionally for one priority"""
+        return sum(1 for _, _, job in self.heap if priority is None or job.priority == priority)
+
+    def _push(self, job):
+        heapq.heappush(self.heap, (job.priority, next(self.sequence), job))
+        QUEUE_DEPTH.inc(priority=PRIORITY_NAMES[job.priority])
+        self.wakeup.set()
+
+    async def submit(self, priority, chat_id, method, *args, **kwargs):
+        """Queue client.<method>(*args, **kwargs) and wait for its result"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._push(OutboundJob(priority, chat_id, method, args, kwargs, future))
+        return await future
+
+    async def send_file(self, chat_id, file, priority=PRIORITY_ALERT, **kwargs):
+        return await self.submit(priority, chat_id, "send_file", chat_id, file, **kwargs)
+
+    async def send_message(self, chat_id, text, priority=PRIORITY_CONFIRMATION, **kwargs):
+        return await self.submit(priority, chat_id, "send_message", chat_id, text, **kwargs)
+
+    async def upload_file(self, file, priority=PRIORITY_EXPORT, **kwargs):
+        """Upload once for several sends; not tied to a chat, so no per-chat interval applies"""
+        return await self.submit(priority, None, "upload_file", file, **kwargs)
+
+    async def delete_messages(self, chat_id, message_ids, priority=PRIORITY_CONFIRMATION, **kwargs):
+        return await self.submit(priority, chat_id, "delete_messages", chat_id, message_ids, **kwargs)
+
+    def _next_job(self, now):
+        """Pop the highest-priority job that may run now, or return the time to wait"""
+        earliest = None
+        # The queue stays small, so a sorted scan is cheap and lets busy chats be skipped
+        for entry in sorted(self.heap):
+            job = entry[2]
+            if job.priority == PRIORITY_EXPORT and self.exports_in_flight >= MAX_EXPORTS_IN_FLIGHT:
+                continue
+            ready_at = self.chat_ready_at.get(job.chat_id, 0.0)
+            if ready_at <= now:
+                self.heap.remove(entry)
+                heapq.heapify(self.heap)
+                return job, None
+            earliest = ready_at if earliest is None else min(earliest, ready_at)
+        return None, earliest
+
+    async def _worker(self):
+        while True:
+            now = time.monotonic()
+            wait = max(self.paused_until, self.next_global_at) - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            job, ready_at = self._next_job(now) if self.heap else (None, None)
+            if job is None:
+                self.wakeup.clear()
+                timeout = ready_at - now if ready_at is not None else None
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Reserve the rate-limit slots before awaiting so other workers see them
+            self.next_global_at = now + self.global_interval
+            if job.chat_id is not None:
+                self.chat_ready_at[job.chat_id] = now + self.per_chat_interval
+            QUEUE_DEPTH.dec(priority=PRIORITY_NAMES[job.priority])
+            await self._run(job)
+
+    async def _run(self, job):
+        priority = PRIORITY_NAMES[job.priority]
+        job.attempts += 1
+        if not job.started:
+            job.started = True
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - job.enqueued_at, priority=priority)
+        if job.priority == PRIORITY_EXPORT:
+            self.exports_in_flight += 1
+        try:
+            with TELEGRAM_SECONDS.time(op=job.method):
+                result = await getattr(self.client, job.method)(*job.args, **job.kwargs)
+        except asyncio.CancelledError:
+            job.future.cancel()  # Stopped mid-send; the caller must not wait forever
+            raise
+        except Exception as e:
+            seconds = flood_wait_seconds(e)
+            if seconds is not None:
+                # Flood waits apply to the whole bot: pause everything, then retry
+                FLOOD_WAITS.inc()
+                FLOOD_WAIT_SECONDS.inc(seconds)
+                print(f"Flood wait of {seconds}s on {job.method} to {job.chat_id}")
+                self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+                job.attempts -= 1  # Flood waits don't count against the retry budget
+                self._push(job)
+            elif isinstance(e, (ConnectionError, OSError, asyncio.TimeoutError)) and job.attempts < self.max_retries:
+                delay = RETRY_BACKOFF * 2 ** (job.attempts - 1)
+                print(f"Retrying {job.method} to {job.chat_id} in {delay}s: {e}")
+                self.chat_ready_at[job.chat_id] = time.monotonic() + delay
+                self._push(job)
+            else:
+                OUTBOUND_FAILED.inc(priority=priority)
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            OUTBOUND_SENT.inc(priority=priority)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            if job.priority == PRIORITY_EXPORT:
+                self.exports_in_flight -= 1
+                self.wakeup.set()  # Another export may start now
+
+if __name__ == "__main__":
+    # Self-check against the fake client: a live alert overtakes queued exports
+    # and a flood wait delays, but doesn't lose, the affected job.
+    from fake_client import FakeTelegramClient
+
+    async def demo():
+        client = FakeTelegramClient(latency=0.2, flood_every=7, flood_seconds=1)
+        scheduler = OutboundScheduler(client, per_chat_interval=0.1)
+        started = time.perf_counter()
+        exports = [asyncio.ensure_future(scheduler.send_file(1, f"backup_{i}.zip", priority=PRIORITY_EXPORT)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        alerts = [asyncio.ensure_future(scheduler.send_file(chat_id, "Pig.jpg", priority=PRIORITY_ALERT)) for chat_id in range(2, 12)]
+        await asyncio.gather(*alerts)
+        alerts_done = time.perf_counter() - started
+        await asyncio.gather(*exports)
+        print(f"10 alerts delivered after {alerts_done:.2f}s, 5 exports after {time.perf_counter() - started:.2f}s")
+        print("Outbound metrics:")
+        for line in metrics.summarize(metrics.parse_text(metrics.REGISTRY.render())):
+            print(f"  {line}")
+        await scheduler.stop()
+
+    asyncio.run(demo())
@@ -0,0 +1,178 @@
+import os
+from collections import Counter
+from datetime import datetime
+
+# Per-user notification settings, stored as extra columns of the user table:
+#   sub_classes   "" for every class, else a comma-separated list ("Pig,Elephant")
+#   quiet_hours   "" or "start-end" in whole hours, may wrap midnight ("22-6")
+#   alert_mode    "instant" or "digest"
+# The bot keeps a SubscriptionIndex of logged-in users in memory and asks it
+# who gets each detection now and who gets it in the next digest. Urgent
+# classes skip digest mode, but nothing is pushed during quiet hours.
+
+# The detector's labels (camera/obj.names) plus "Unknown"; bot and ingest use these too
+NAMES_PATH = os.environ.get('WILDDETECT_CLASS_NAMES',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'camera', 'obj.names'))
+
+def load_classes(path=NAMES_PATH):
+    with open(path) as names_file:
+        names = [line.strip() for line in names_file if line.strip()]
+    return tuple(names) + ('Unknown',)
+
+CLASSES = load_classes()
+URGENT_CLASSES = {"Elephant", "Nilgai", "Pig", "Jackal", "Person"}  # Crop raiders and intruders
+MODES = ("instant", "digest")
+
+# Columns added to existing user tables by ensure_columns()
+COLUMNS = {
+    "sub_classes": "TEXT DEFAULT ''",
+    "quiet_hours": "TEXT DEFAULT ''",
+    "alert_mode": "TEXT DEFAULT 'instant'",
+}
+# User columns whose changes must be mirrored in the index
+INDEXED_COLUMNS = ("autologin",) + tuple(COLUMNS)
+
+def ensure_columns(cursor):
+    """Add the subscription columns to the user table if they are missing"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(user)").fetchall()}
+    for column, definition in COLUMNS.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE user ADD COLUMN {column} {definition}")
+
+def parse_classes(words):
+    """
+    Resolve class names typed by a user.
+
+    Args:
+        words (list): Class names in any case, e.g. ["pig", "ELEPHANT"]
+
+    Returns:
+        (classes, unknown) lists; classes keep the canonical spelling
+    """
+    by_lower = {name.lower(): name for name in CLASSES}
+    classes, unknown = [], []
+    for word in words:
+        name = by_lower.get(word.lower())
+        if name is None:
+            unknown.append(word)
+        elif name not in classes:
+            classes.append(name)
+    return classes, unknown
+
+def parse_quiet_hours(text):
+    """(start, end) hours from "22-6", or None when the text is not a valid range"""
+    try:
+        start, end = (int(part) for part in text.split("-"))
+    except ValueError:
+        return None
+    if not (0 <= start <= 23 and 0 <= end <= 23) or start == end:
+        return None
+    return start, end
+
+def in_quiet_hours(quiet, when):
+    if quiet is None:
+        return False
+    start, end = quiet
+    if start < end:
+        return start <= when.hour < end
+    return when.hour >= start or when.hour < end
+
+def digest_caption(items):
+    """Summary text for one chat's digest album"""
+    counts = Counter(item["name"] for item in items)
+    first = datetime.fromtimestamp(min(item["created"] for item in items)).strftime("%Y-%m-%d %H:%M")
+    last = datetime.fromtimestamp(max(item["created"] for item in items)).strftime("%Y-%m-%d %H:%M")
+    lines = [f"🗂 {len(items)} detections ({first} – {last}):"]
+    lines += [f"• {name}: {count}" for name, count in counts.most_common()]
+    return "\n".join(lines)
+
+class Subscription:
+    """One user's settings, parsed from their user row"""
+    def __init__(self, sub_classes="", quiet_hours="", alert_mode="instant"):
+        self.classes = frozenset(filter(None, (sub_classes or "").split(","))) or None  # None: every class
+        self.quiet = parse_quiet_hours(quiet_hours) if quiet_hours else None
+        self.mode = alert_mode if alert_mode in MODES else "instant"
+
+    def wants(self, name):
+        return self.classes is None or name in self.classes
+
+    def describe(self):
+        classes = ", ".join(sorted(self.classes)) if self.classes else "all classes"
+        quiet = f"{self.quiet[0]:02d}:00–{self.quiet[1]:02d}:00" if self.quiet else "none"
+        return f"🔔 Classes: {classes}\n🌙 Quiet hours: {quiet}\n📬 Mode: {self.mode}"
+
+class SubscriptionIndex:
+    """Logged-in users' subscriptions, indexed by class for per-detection routing"""
+    def __init__(self):
+        self.subscriptions = {}  # chat_id -> Subscription
+        self.by_class = {}       # class -> chat_ids subscribed to it explicitly
+        self.everything = set()  # chat_ids subscribed to every class
+
+    def load(self, rows):
+        """Rebuild from (chat_id, sub_classes, quiet_hours, alert_mode) rows of logged-in users"""
+        self.subscriptions, self.by_class, self.everything = {}, {}, set()
+        for chat_id, *settings in rows:
+            self.set(int(chat_id), Subscription(*settings))
+
+    def set(self, chat_id, subscription):
+        self.remove(chat_id)
+        self.subscriptions[chat_id] = subscription
+        if subscription.classes is None:
+            self.everything.add(chat_id)
+        else:
+            for name in subscription.classes:
+                self.by_class.setdefault(name, set()).add(chat_id)
+
+    def remove(self, chat_id):
+        subscription = self.subscriptions.pop(chat_id, None)
+        if subscription is None:
+            return
+        self.everything.discard(chat_id)
+        for name in subscription.classes or ():
+            self.by_class.get(name, set()).discard(chat_id)
+
+    def get(self, chat_id):
+        return self.subscriptions.get(chat_id, Subscription())
+
+    def chats(self):
+        """Every logged-in chat"""
+        return list(self.subscriptions)
+
+    def route(self, name, chat_ids=None, when=None):
+        """
+        Split the recipients of one detection.
+
+        Args:
+            name (str): Detection class
+            chat_ids (list): Candidate chats, defaults to every logged-in chat; chats
+                without settings in the index get every class instantly
+            when (datetime): Detection time, defaults to now
+
+        Returns:
+            (instant, digest) lists of chat ids
+        """
+        when = when or datetime.now()
+        subscribed = self.everything | self.by_class.get(name, set())
+        if chat_ids is None:
+            recipients = subscribed
+        else:
+            # Only the subscribed and the unknown candidates are looked at, not every chat
+            candidates = set(chat_ids)
+            recipients = (subscribed & candidates) | (candidates - self.subscriptions.keys())
+        instant, digest = [], []
+        for chat_id in recipients:
+            subscription = self.subscriptions.get(chat_id)
+            if subscription is None:
+                instant.append(chat_id)
+            elif in_quiet_hours(subscription.quiet, when):
+                digest.append(chat_id)
+            elif subscription.mode == "digest" and name not in URGENT_CLASSES:
+                digest.append(chat_id)
+            else:
+                instant.append(chat_id)
+        return instant, digest
+
+    def quiet_now(self, chat_id, when=None):
+        """True while a chat's quiet hours last; digests wait until they end"""
+        subscription = self.subscriptions.get(chat_id)
+        return subscription is not None and in_quiet_hours(subscription.quiet, when or datetime.now())
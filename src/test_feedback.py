@@ -0,0 +1,61 @@
+import sqlite3
+from datetime import datetime, timedelta
+import feedback
+import rollup
+
+def test_modes_follow_precision_thresholds():
+    assert feedback.next_mode("alert", None) == "alert"
+    assert feedback.next_mode("alert", 0.69) == "raised"
+    assert feedback.next_mode("alert", 0.39) == "digest"
+    assert feedback.next_mode("raised", 0.39) == "digest"
+
+def test_lighter_modes_need_the_hysteresis_margin():
+    # Just past the threshold is not enough to move back...
+    assert feedback.next_mode("raised", feedback.RAISE_BELOW + 0.02) == "raised"
+    assert feedback.next_mode("digest", feedback.DIGEST_BELOW + 0.02) == "digest"
+    # ...but a class already alerted normally stays there
+    assert feedback.next_mode("alert", feedback.RAISE_BELOW + 0.02) == "alert"
+    # Past the margin it moves back, one mode at a time from digest
+    assert feedback.next_mode("raised", feedback.RAISE_BELOW + feedback.HYSTERESIS) == "alert"
+    assert feedback.next_mode("digest", feedback.DIGEST_BELOW + feedback.HYSTERESIS) == "raised"
+
+def test_raised_threshold_grows_as_precision_falls():
+    assert feedback.raised_threshold(feedback.RAISE_BELOW) == feedback.BASE_THRESHOLD
+    assert feedback.raised_threshold(feedback.DIGEST_BELOW) == feedback.MAX_THRESHOLD
+    assert feedback.raised_threshold(0.1) == feedback.MAX_THRESHOLD
+
+def record(db_path, name, correct, incorrect, when):
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        rollup.ensure_rollup_tables(cursor)
+        rollup.record(cursor, name, "Correct", when, correct)
+        rollup.record(cursor, name, "Incorrect", when, incorrect)
+
+def test_counts_only_cover_the_window(tmp_path):
+    db_path = str(tmp_path / "stats.db")
+    now = datetime(2026, 10, 19, 12)
+    record(db_path, "Pig", 2, 8, now)
+    record(db_path, "Pig", 5, 0, now - timedelta(days=feedback.WINDOW_DAYS))
+    assert feedback.confirmation_counts(db_path, until=now) == {"Pig": (2, 8)}
+
+def test_policy_routes_by_mode_and_score(tmp_path):
+    db_path = str(tmp_path / "stats.db")
+    now = datetime.now()
+    record(db_path, "Pig", 2, 8, now)       # 20%: digest only
+    record(db_path, "Jackal", 6, 4, now)    # 60%: raised threshold
+    record(db_path, "Nilgai", 9, 1, now)    # 90%: alert
+    record(db_path, "Dog", 0, 3, now)       # Too few confirmations to judge
+    policy = feedback.FeedbackPolicy(db_path, log=lambda message: None)
+    threshold = feedback.raised_threshold(0.6)
+    assert policy.decide("Pig", 0.99)[0] == "digest"
+    assert policy.decide("Jackal", threshold - 0.01)[0] == "digest"
+    assert policy.decide("Jackal", threshold)[0] == "alert"
+    assert policy.decide("Jackal", None)[0] == "alert"  # No score in the sidecar: don't hold it
+    assert policy.decide("Nilgai", 0.1)[0] == "alert"
+    assert policy.decide("Dog", 0.1)[0] == "alert"
+
+def test_disabled_policy_always_alerts(tmp_path):
+    db_path = str(tmp_path / "stats.db")
+    record(db_path, "Pig", 0, 10, datetime.now())
+    policy = feedback.FeedbackPolicy(db_path, enabled=False, log=lambda message: None)
+    assert policy.decide("Pig", 0.99)[0] == "alert"
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import outbox
+import sender
+from fake_client import FakeTelegramClient
+
+NOW = 1_800_000_000.0
+
+def item(age, name="Pig", item_id=None):
+    return {"id": item_id or age, "created": NOW - age, "name": name}
+
+def test_alerts_at_the_stale_boundary_are_replayed():
+    fresh = item(outbox.STALE_SECONDS)
+    replay, digest = outbox.plan_delivery([fresh, item(60)], NOW)
+    assert replay == [fresh, item(60)] and digest == []
+
+def test_alerts_past_the_stale_boundary_are_digested():
+    stale = [item(outbox.STALE_SECONDS + 1), item(outbox.STALE_SECONDS + 600)]
+    replay, digest = outbox.plan_delivery(stale + [item(60)], NOW)
+    assert replay == [item(60)]
+    assert digest == stale
+
+def test_single_stale_alert_is_replayed_in_order():
+    stale = item(outbox.STALE_SECONDS + 1)
+    replay, digest = outbox.plan_delivery([item(60), stale], NOW)
+    assert replay == [stale, item(60)] and digest == []
+
+def test_too_many_fresh_alerts_become_one_digest():
+    items = [item(age) for age in range(10, 10 * (outbox.MAX_REPLAYS + 2), 10)]
+    replay, digest = outbox.plan_delivery(items, NOW)
+    assert replay == [] and digest == items
+
+def test_oldest_alerts_are_evicted_past_the_size_limit(tmp_path):
+    store = outbox.Outbox(str(tmp_path / "outbox.db"), max_bytes=250)
+    for age in (300, 200, 100):
+        store.add("Pig", f"{age}", os.urandom(100), [1], created=NOW - age)
+    assert [entry["caption"] for entry in store.pending()[1]] == ["200", "100"]
+
+def test_drain_replays_fresh_and_digests_stale(tmp_path):
+    store = outbox.Outbox(str(tmp_path / "outbox.db"))
+    for age, name in ((3600, "Pig"), (1800, "Nilgai"), (60, "Jackal")):
+        store.add(name, name, os.urandom(100), [1, 2], created=NOW - age)
+
+    async def scenario():
+        client = FakeTelegramClient(latency=0, jitter=0)
+        scheduler = sender.OutboundScheduler(client, per_chat_interval=0)
+        failed = await store.drain(client, scheduler, sender.PRIORITY_ALERT, now=NOW)
+        await scheduler.stop()
+        return client, failed
+
+    client, failed = asyncio.run(scenario())
+    assert failed == 0
+    # Per chat: one replayed Jackal and one album for the two stale alerts
+    captions = sorted(str(details["caption"]) for _, _, _, details in client.sent("send_file"))
+    assert len(captions) == 4
+    assert sum(caption.startswith("⏱ Delayed alert") for caption in captions) == 2
+    # Each stored image is uploaded once however many chats get it
+    assert len(client.sent("upload_file")) == 3
+    assert store.update_gauges() == 0
@@ -0,0 +1,79 @@
+import asyncio
+import time
+import sender
+from fake_client import FakeTelegramClient
+
+class TrackingClient(FakeTelegramClient):
+    """Fake client that also records how many send_file calls overlap"""
+    def __init__(self, **kwargs):
+        super().__init__(jitter=0, **kwargs)
+        self.in_flight = 0
+        self.peak = 0
+        self.finished = []
+
+    async def send_file(self, chat_id, file, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super().send_file(chat_id, file, **kwargs)
+        finally:
+            self.in_flight -= 1
+            self.finished.append(file)
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_flood_wait_pauses_and_requeues():
+    async def scenario():
+        client = FakeTelegramClient(latency=0, jitter=0, flood_every=2, flood_seconds=0.3)
+        scheduler = sender.OutboundScheduler(client, per_chat_interval=0)
+        started = time.perf_counter()
+        messages = await asyncio.gather(*(scheduler.send_message(chat_id, "hi") for chat_id in range(3)))
+        elapsed = time.perf_counter() - started
+        await scheduler.stop()
+        return client, messages, elapsed
+
+    client, messages, elapsed = run(scenario())
+    # The flooded job is retried rather than failed, after the whole queue paused
+    assert len(messages) == 3 and all(messages)
+    assert sorted(chat_id for _, _, chat_id, _ in client.sent("send_message")) == [0, 1, 2]
+    assert elapsed >= 0.3
+
+def test_flood_wait_does_not_use_retry_budget():
+    async def scenario():
+        client = FakeTelegramClient(latency=0, jitter=0, flood_every=2, flood_seconds=0.05)
+        scheduler = sender.OutboundScheduler(client, per_chat_interval=0, max_retries=1, workers=1)
+        results = await asyncio.gather(*(scheduler.send_message(1, str(n)) for n in range(4)),
+                                       return_exceptions=True)
+        await scheduler.stop()
+        return results
+
+    assert not any(isinstance(result, Exception) for result in run(scenario()))
+
+def test_exports_are_gated_and_alerts_overtake_them():
+    async def scenario():
+        client = TrackingClient(latency=0.05)
+        scheduler = sender.OutboundScheduler(client, per_chat_interval=0, workers=4)
+        exports = [asyncio.ensure_future(scheduler.send_file(1, f"backup_{n}.zip", priority=sender.PRIORITY_EXPORT))
+                   for n in range(4)]
+        await asyncio.sleep(0.01)
+        await scheduler.send_file(2, "Pig.jpg", priority=sender.PRIORITY_ALERT)
+        await asyncio.gather(*exports)
+        await scheduler.stop()
+        return client
+
+    client = run(scenario())
+    # Four workers, but never more than MAX_EXPORTS_IN_FLIGHT exports plus the alert at once
+    assert client.peak <= sender.MAX_EXPORTS_IN_FLIGHT + 1
+    assert client.finished.index("Pig.jpg") < client.finished.index("backup_1.zip")
+
+def test_stop_cancels_queued_and_running_jobs():
+    async def scenario():
+        client = FakeTelegramClient(latency=10, jitter=0)
+        scheduler = sender.OutboundScheduler(client, per_chat_interval=0, workers=1)
+        jobs = [asyncio.ensure_future(scheduler.send_message(chat_id, "hi")) for chat_id in range(3)]
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in run(scenario()))